@@ -26,10 +26,40 @@ class BulldozerDtmProviderSettings:
     """
     # Checkbox to enable/disable bulldozer provider (bool).
     ACTIVATE = "BULLDOZER_ACTIVATE"
+    # Checkbox to run Bulldozer in a worker subprocess instead of the QGIS process (bool).
+    SUBPROCESS = "BULLDOZER_SUBPROCESS"
+    # Checkbox to enable/disable the result cache (bool).
+    CACHE_ACTIVATE = "BULLDOZER_CACHE_ACTIVATE"
+    # Folder of the result cache (str, empty = folder in the QGIS profile).
+    CACHE_FOLDER = "BULLDOZER_CACHE_FOLDER"
+    # Maximum size of the result cache in MB (int).
+    CACHE_MAX_SIZE = "BULLDOZER_CACHE_MAX_SIZE"
+    # Checkbox to enable/disable the reuse of the pipeline stage products (bool).
+    STAGES_ACTIVATE = "BULLDOZER_STAGES_ACTIVATE"
+    # Folder of the persistent job queue (str, empty = folder in the QGIS profile).
+    QUEUE_FOLDER = "BULLDOZER_QUEUE_FOLDER"
+    # Folder of the intermediate files, e.g. on a fast local disk (str, empty = output directory).
+    SCRATCH_FOLDER = "BULLDOZER_SCRATCH_FOLDER"
+    # JSON lines file of the run metrics (str, empty = no file).
+    METRICS_FILE = "BULLDOZER_METRICS_FILE"
+    # Prometheus textfile collector file of the run metrics (str, empty = no file).
+    PROMETHEUS_FILE = "BULLDOZER_PROMETHEUS_FILE"
+    # Checkbox to purge the result cache when the settings are applied (bool).
+    CACHE_PURGE = "BULLDOZER_CACHE_PURGE"
 
     @staticmethod
     def keys():
         """ Return the list of settings defined in this class """
         return [
-            BulldozerDtmProviderSettings.ACTIVATE
+            BulldozerDtmProviderSettings.ACTIVATE,
+            BulldozerDtmProviderSettings.SUBPROCESS,
+            BulldozerDtmProviderSettings.CACHE_ACTIVATE,
+            BulldozerDtmProviderSettings.CACHE_FOLDER,
+            BulldozerDtmProviderSettings.CACHE_MAX_SIZE,
+            BulldozerDtmProviderSettings.STAGES_ACTIVATE,
+            BulldozerDtmProviderSettings.QUEUE_FOLDER,
+            BulldozerDtmProviderSettings.SCRATCH_FOLDER,
+            BulldozerDtmProviderSettings.METRICS_FILE,
+            BulldozerDtmProviderSettings.PROMETHEUS_FILE,
+            BulldozerDtmProviderSettings.CACHE_PURGE
         ]
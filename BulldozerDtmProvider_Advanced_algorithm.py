@@ -20,20 +20,55 @@
 # more details.
 
 
+import hashlib
+import json
 import os
-from qgis.core import (QgsProcessingParameterNumber,
+from qgis.core import (QgsCoordinateTransform,
+                       QgsFeatureRequest,
+                       QgsProcessing,
+                       QgsProcessingParameterExtent,
+                       QgsProcessingParameterFeatureSource,
+                       QgsProcessingParameterNumber,
                        QgsProcessingParameterBoolean,
+                       QgsProcessingParameterEnum,
                        QgsProcessingParameterFolderDestination,
                        QgsProcessingException,
                        QgsProcessingParameterDefinition,
-                       QgsProcessingParameterRasterLayer)
-
-from .import_bulldozer import dsm_to_dtm
-#TODO: remove suppress_stdout_if_none and suppress_stderr_if_none imports when tqdm bug on windows gui is fixed
-from .BulldozerDtmProvider_algorithm import BulldozerDtmProviderAlgorithm, suppress_stdout_if_none, suppress_stderr_if_none
+                       QgsProcessingParameterRasterLayer,
+                       QgsRectangle)
+
+from .BulldozerDtmProvider_algorithm import BulldozerDtmProviderAlgorithm
+from .BulldozerDtmProvider_AutoTune import auto_tune_for_dsm
+from .BulldozerDtmProvider_Cache import get_cache_key, get_result_cache
+from .BulldozerDtmProvider_Engine import run_dsm_to_dtm
+from .BulldozerDtmProvider_Footprint import run_footprint_dsm_to_dtm
+from .BulldozerDtmProvider_GroundMask import (get_cached_ground_mask,
+                                              get_ground_mask_cache,
+                                              get_ground_mask_key,
+                                              write_ground_mask,
+                                              RUN_GROUND_MASK_FILE)
+from .BulldozerDtmProvider_Incremental import run_incremental_dsm_to_dtm
+from .BulldozerDtmProvider_Metrics import (record_cache,
+                                           record_input,
+                                           record_run_metrics,
+                                           record_workers)
+from .BulldozerDtmProvider_Output import (convert_products_to_cog,
+                                          COG_COMPRESSIONS,
+                                          DEFAULT_COG_COMPRESSION)
+from .BulldozerDtmProvider_Profiling import profile_run, set_profile_dir
+from .BulldozerDtmProvider_Pyramid import run_pyramid_dsm_to_dtm, MAX_PYRAMID_LEVELS
+from .BulldozerDtmProvider_Roi import get_roi_window, run_roi_dsm_to_dtm
+from .BulldozerDtmProvider_Scratch import run_in_work_dir
 from .BulldozerDtmProvider_Params import (check_params,
-                                          get_combined_list_params_for_advanced_app,
+                                          get_params_registry,
                                           BulldozerParameterException)
+from .BulldozerDtmProvider_Tiling import (run_tiled_dsm_to_dtm,
+                                          DEFAULT_TILE_SIZE,
+                                          MIN_TILE_SIZE)
+
+# Bulldozer only uses the ground mask in its ground anchors step
+GROUND_MASK_WITHOUT_ANCHORS = ('The ground mask is only used with the ground anchors: '
+                               'activate them or remove the ground mask')
 
 class BulldozerDtmProviderAdvancedAlgorithm(BulldozerDtmProviderAlgorithm):
     """
@@ -42,25 +77,48 @@ class BulldozerDtmProviderAdvancedAlgorithm(BulldozerDtmProviderAlgorithm):
 
     OUTPUT = 'OUTPUT'
     INPUT = 'INPUT'
+    TILED = 'TILED'
+    TILE_SIZE = 'TILE_SIZE'
+    TILE_MARGIN = 'TILE_MARGIN'
+    AUTO_TUNE = 'AUTO_TUNE'
+    INCREMENTAL = 'INCREMENTAL'
+    PYRAMID_LEVELS = 'PYRAMID_LEVELS'
+    ROI_EXTENT = 'ROI_EXTENT'
+    ROI_MASK = 'ROI_MASK'
+    GROUND_MASK = 'GROUND_MASK'
+    GROUND_MASK_VECTOR = 'GROUND_MASK_VECTOR'
+    COG = 'COG'
+    COG_COMPRESSION = 'COG_COMPRESSION'
+    COG_MAX_Z_ERROR = 'COG_MAX_Z_ERROR'
+    COG_OVERVIEWS = 'COG_OVERVIEWS'
 
     def __init__(self):
         super().__init__()
-        params = get_combined_list_params_for_advanced_app()
-        for param in params:
-            setattr(self, param.name.upper(), param.name.upper())
+        for param_name in get_params_registry():
+            setattr(self, param_name.upper(), param_name.upper())
 
     def initAlgorithm(self, config):
         """
         Define the inputs, output and properties of the algorithm
         """
-        params = get_combined_list_params_for_advanced_app()
-
         self.addParameter(QgsProcessingParameterRasterLayer(self.INPUT,
                                                             self.tr('Input DSM')
                                                             )
                           )
 
-        for param in params:
+        self.add_ground_mask_parameters()
+        self.add_bulldozer_parameters()
+        self.add_execution_parameters()
+
+        self.addParameter(QgsProcessingParameterFolderDestination(self.OUTPUT_DIR,
+                                                                  self.tr('Output directory'),
+                                                                  optional=True))
+
+    def add_bulldozer_parameters(self):
+        """
+        Add one parameter per Bulldozer pipeline parameter
+        """
+        for param in get_params_registry().values():
             if param.param_type == bool:
                 new_param = QgsProcessingParameterBoolean(param.name,
                                                           param.description,
@@ -73,9 +131,11 @@ class BulldozerDtmProviderAdvancedAlgorithm(BulldozerDtmProviderAlgorithm):
                 new_param = QgsProcessingParameterNumber(param.name,
                                                          param.description,
                                                          type=QgsProcessingParameterNumber.Integer,
-                                                         minValue=0,
+                                                         minValue=param.min_value,
                                                          defaultValue=param.default_value,
                                                          optional=True)
+                if param.max_value is not None:
+                    new_param.setMaximum(param.max_value)
                 new_param.setFlags(new_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
                 self.addParameter(new_param)
 
@@ -83,39 +143,180 @@ class BulldozerDtmProviderAdvancedAlgorithm(BulldozerDtmProviderAlgorithm):
                 new_param = QgsProcessingParameterNumber(param.name,
                                                          param.description,
                                                          type=QgsProcessingParameterNumber.Double,
-                                                         minValue=0,  # FIXME
+                                                         minValue=param.min_value,
                                                          defaultValue=param.default_value,
                                                          optional=True)
-
+                if param.max_value is not None:
+                    new_param.setMaximum(param.max_value)
                 new_param.setFlags(new_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
                 self.addParameter(new_param)
 
-            # elif param.param_type == str:
-            #     ## FIXME
-            #     self.addParameter(QgsProcessingParameterRasterLayer(param.name,
-            #                                                     param.description))
+            # The str parameters are paths with their own inputs (DSM, output directory and
+            # ground mask, see add_ground_mask_parameters) or execution settings (mp_context)
 
+    def add_ground_mask_parameters(self):
+        """
+        Add the optional ground mask, as a raster and/or as vector layer (e.g. water, roads,
+        parks), rasterized onto the DSM grid
+        """
+        self.addParameter(QgsProcessingParameterRasterLayer(self.GROUND_MASK,
+                                                            self.tr('Ground mask (raster, '
+                                                                    'pixels > 0 are ground)'),
+                                                            optional=True))
+
+        self.addParameter(QgsProcessingParameterFeatureSource(self.GROUND_MASK_VECTOR,
+                                                              self.tr('Ground mask (polygons or '
+                                                                      'lines, e.g. water, roads, '
+                                                                      'parks)'),
+                                                              [QgsProcessing.TypeVectorPolygon,
+                                                               QgsProcessing.TypeVectorLine],
+                                                              optional=True))
+
+    def has_ground_mask_without_anchors(self, parameters, context):
+        """
+        :return: True if a ground mask is given without the ground anchors, the only
+                 Bulldozer step using it
+        """
+        return (bool(parameters.get(self.GROUND_MASK) or parameters.get(self.GROUND_MASK_VECTOR))
+                and not self.parameterAsBool(parameters, self.ACTIVATE_GROUND_ANCHORS, context))
 
-        self.addParameter(QgsProcessingParameterFolderDestination(self.OUTPUT_DIR,
-                                                                  self.tr('Output directory'),
-                                                                  optional=True))
-
+    def checkParameterValues(self, parameters, context):
+        """
+        Reject a ground mask given without the ground anchors (the errors are shown in the
+        dialog)
+        """
+        if self.has_ground_mask_without_anchors(parameters, context):
+            return False, self.tr(GROUND_MASK_WITHOUT_ANCHORS)
+        return super().checkParameterValues(parameters, context)
 
-    def get_params_for_bulldozer(self, parameters, context, feedback):
+    def add_roi_parameters(self):
         """
-        Get the parameters for Bulldozer
+        Add the optional region of interest (extent and/or polygons)
         """
-        params = get_combined_list_params_for_advanced_app()
+        self.addParameter(QgsProcessingParameterExtent(self.ROI_EXTENT,
+                                                       self.tr('Region of interest (extent)'),
+                                                       optional=True))
 
-        params_for_bulldozer = {}
+        self.addParameter(QgsProcessingParameterFeatureSource(self.ROI_MASK,
+                                                              self.tr('Region of interest '
+                                                                      '(polygons)'),
+                                                              [QgsProcessing.TypeVectorPolygon],
+                                                              optional=True))
+
+    def add_execution_parameters(self):
+        """
+        Add the parameters driving how the plugin runs Bulldozer (not given to Bulldozer)
+        """
+        pyramid_levels = QgsProcessingParameterNumber(self.PYRAMID_LEVELS,
+                                                      self.tr('Coarse-to-fine levels (0 = single '
+                                                              'level, the resolution is divided '
+                                                              'by 4 per level)'),
+                                                      type=QgsProcessingParameterNumber.Integer,
+                                                      minValue=0,
+                                                      maxValue=MAX_PYRAMID_LEVELS,
+                                                      defaultValue=0,
+                                                      optional=True)
+        pyramid_levels.setFlags(pyramid_levels.flags()
+                                | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(pyramid_levels)
+
+        self.add_roi_parameters()
+
+        auto_tune = QgsProcessingParameterBoolean(self.AUTO_TUNE,
+                                                  self.tr('Automatic number of workers and tiling '
+                                                          '(from the cores, the free memory and '
+                                                          'the DSM size)'),
+                                                  defaultValue=False,
+                                                  optional=True)
+        auto_tune.setFlags(auto_tune.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(auto_tune)
+
+        tiled = QgsProcessingParameterBoolean(self.TILED,
+                                              self.tr('Tiled processing (bounded memory)'),
+                                              defaultValue=False,
+                                              optional=True)
+        tiled.setFlags(tiled.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(tiled)
+
+        tile_size = QgsProcessingParameterNumber(self.TILE_SIZE,
+                                                 self.tr('Tile size (pixels)'),
+                                                 type=QgsProcessingParameterNumber.Integer,
+                                                 minValue=MIN_TILE_SIZE,
+                                                 defaultValue=DEFAULT_TILE_SIZE,
+                                                 optional=True)
+        tile_size.setFlags(tile_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(tile_size)
+
+        tile_margin = QgsProcessingParameterNumber(self.TILE_MARGIN,
+                                                   self.tr('Tile margin (pixels, 0 = twice the '
+                                                           'max object size)'),
+                                                   type=QgsProcessingParameterNumber.Integer,
+                                                   minValue=0,
+                                                   defaultValue=0,
+                                                   optional=True)
+        tile_margin.setFlags(tile_margin.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(tile_margin)
+
+        incremental = QgsProcessingParameterBoolean(self.INCREMENTAL,
+                                                    self.tr('Incremental update of the DTM of the '
+                                                            'output directory (only the modified '
+                                                            'tiles are recomputed)'),
+                                                    defaultValue=False,
+                                                    optional=True)
+        incremental.setFlags(incremental.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(incremental)
+
+        cog = QgsProcessingParameterBoolean(self.COG,
+                                            self.tr('Write the DTM as a Cloud Optimized GeoTIFF'),
+                                            defaultValue=False,
+                                            optional=True)
+        cog.setFlags(cog.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(cog)
+
+        cog_compression = QgsProcessingParameterEnum(self.COG_COMPRESSION,
+                                                     self.tr('COG compression'),
+                                                     options=list(COG_COMPRESSIONS),
+                                                     defaultValue=COG_COMPRESSIONS.index(
+                                                         DEFAULT_COG_COMPRESSION),
+                                                     optional=True)
+        cog_compression.setFlags(cog_compression.flags()
+                                 | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(cog_compression)
+
+        cog_max_z_error = QgsProcessingParameterNumber(self.COG_MAX_Z_ERROR,
+                                                       self.tr('COG LERC max error (m, 0 = '
+                                                               'lossless)'),
+                                                       type=QgsProcessingParameterNumber.Double,
+                                                       minValue=0,
+                                                       defaultValue=0,
+                                                       optional=True)
+        cog_max_z_error.setFlags(cog_max_z_error.flags()
+                                 | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(cog_max_z_error)
+
+        cog_overviews = QgsProcessingParameterBoolean(self.COG_OVERVIEWS,
+                                                      self.tr('COG overviews'),
+                                                      defaultValue=True,
+                                                      optional=True)
+        cog_overviews.setFlags(cog_overviews.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(cog_overviews)
+
+        self.add_footprint_parameter()
+        self.add_headless_parameter()
+        self.add_profile_parameters()
+        self.add_queue_parameters()
+
+
+    def get_bulldozer_options(self, parameters, context):
+        """
+        Get the values given to the Bulldozer pipeline parameters
+        """
+        options = {}
 
-        for param in params:
+        for param in get_params_registry().values():
             param_name = param.name
             param_name_upper = param.name.upper()
 
-            source = self.parameterAsLayer(parameters, self.INPUT, context).source()
-            params_for_bulldozer["dsm_path"] = source
-
             param_value = None
             if param_name in parameters and parameters[param_name] is not None:
                 if param.param_type == bool:
@@ -128,36 +329,368 @@ class BulldozerDtmProviderAdvancedAlgorithm(BulldozerDtmProviderAlgorithm):
                     param_value = self.parameterAsString(parameters, param_name_upper, context)
 
                 if param_value is not None:
-                    params_for_bulldozer[param_name] = param_value
+                    options[param_name] = param_value
+
+        return options
+
+    def get_params_for_bulldozer(self, parameters, context, feedback):
+        """
+        Get the parameters for Bulldozer
+        """
+        params_for_bulldozer = self.get_bulldozer_options(parameters, context)
 
-            if "output_dir" not in params_for_bulldozer:
-                params_for_bulldozer["output_dir"] = self.parameterAsString(parameters,
-                                                                            self.OUTPUT_DIR,
-                                                                            context)
+        if "output_dir" not in params_for_bulldozer:
+            params_for_bulldozer["output_dir"] = self.parameterAsString(parameters,
+                                                                        self.OUTPUT_DIR,
+                                                                        context)
 
         params_for_bulldozer["dsm_path"] = self.parameterAsLayer(parameters,
                                                                  self.INPUT, context).source()
 
+        # The parameter check is skipped by some callers (e.g. processing.run in scripts)
+        if self.has_ground_mask_without_anchors(parameters, context):
+            raise QgsProcessingException(GROUND_MASK_WITHOUT_ANCHORS)
+        ground_mask = self.get_ground_mask(parameters, context, params_for_bulldozer["dsm_path"],
+                                           params_for_bulldozer["output_dir"], feedback)
+        # The ground mask is part of the cache keys by its key (see get_ground_mask_options)
+        self.ground_mask_key = None
+        if ground_mask is not None:
+            params_for_bulldozer["ground_mask_path"], self.ground_mask_key = ground_mask
+
+        self.check_params_for_bulldozer(params_for_bulldozer, feedback)
+
+        return params_for_bulldozer
+
+    @staticmethod
+    def check_params_for_bulldozer(params_for_bulldozer, feedback):
+        """
+        Check the parameters for Bulldozer, raise a QgsProcessingException if they are not valid
+        """
         try:
             check_params(**params_for_bulldozer)
         except BulldozerParameterException as e:
-            print(f"#####################{e}####################")
             feedback.reportError(f"Parameters are not valid : {e}", fatalError=True)
             raise QgsProcessingException(f"Parameters are not valid : {e}") from e
 
-        return params_for_bulldozer
 
+    def get_ground_mask_options(self):
+        """
+        Get the execution options of the ground mask written by get_params_for_bulldozer:
+        its key replaces its path in the cache keys (see get_cache_key)
+        """
+        if getattr(self, "ground_mask_key", None) is None:
+            return {}
+        return {"ground_mask": self.ground_mask_key}
 
+    def get_execution_options(self, parameters, context, params_for_bulldozer, feedback):
+        """
+        Get the execution options changing the result (part of the result cache key).
+        In automatic mode, the number of workers (unless given) and the tiling are chosen
+        from the machine and the DSM.
+        """
+        tiled = self.parameterAsBool(parameters, self.TILED, context)
+        tile_size = self.parameterAsInt(parameters, self.TILE_SIZE, context)
+        tile_margin = self.parameterAsInt(parameters, self.TILE_MARGIN, context)
+        incremental = self.parameterAsBool(parameters, self.INCREMENTAL, context)
+
+        if self.parameterAsBool(parameters, self.AUTO_TUNE, context):
+            decision = auto_tune_for_dsm(params_for_bulldozer["dsm_path"],
+                                         params_for_bulldozer.get("max_object_size"),
+                                         tile_margin if tile_margin > 0 else None)
+            feedback.pushInfo(f"Automatic settings: {decision}")
+            if "nb_max_workers" not in params_for_bulldozer:
+                params_for_bulldozer["nb_max_workers"] = decision.nb_workers
+            else:
+                feedback.pushInfo(f"Number of workers given by the user: "
+                                  f"{params_for_bulldozer['nb_max_workers']}")
+            # The tiles of the incremental mode must not change between runs
+            if decision.tiled and not incremental:
+                tiled = True
+                tile_size = decision.tile_size
+
+        options = self.get_ground_mask_options()
+        if incremental:
+            options.update({"incremental": True, "tile_size": tile_size,
+                            "tile_margin": tile_margin})
+        elif tiled:
+            options.update({"tile_size": tile_size, "tile_margin": tile_margin})
+        return options
+
+    def get_cog_options(self, parameters, context):
+        """
+        Get the options of the COG outputs, None if they are not requested
+        """
+        if not self.parameterAsBool(parameters, self.COG, context):
+            return None
+        compression = COG_COMPRESSIONS[self.parameterAsEnum(parameters, self.COG_COMPRESSION,
+                                                             context)]
+        return {"compression": compression,
+                "overviews": self.parameterAsBool(parameters, self.COG_OVERVIEWS, context),
+                "max_z_error": self.parameterAsDouble(parameters, self.COG_MAX_Z_ERROR, context)}
+
+    def format_outputs(self, parameters, context, output_dir, feedback):
+        """
+        Convert the Bulldozer products to the requested output format
+        """
+        cog_options = self.get_cog_options(parameters, context)
+        if cog_options is not None:
+            convert_products_to_cog(output_dir, feedback, **cog_options)
+
+    def get_ground_mask(self, parameters, context, dsm_path, output_dir, feedback):
+        """
+        Get the ground mask on the DSM grid, from the cache or written from the raster
+        and vector layers, in the output directory
+
+        :return: the path of the mask and its key (see get_ground_mask_key), None if no
+                 ground mask is given
+        """
+        if not parameters.get(self.GROUND_MASK) and not parameters.get(self.GROUND_MASK_VECTOR):
+            return None
+        dsm_layer = self.parameterAsRasterLayer(parameters, self.INPUT, context)
+
+        mask_layer = self.parameterAsRasterLayer(parameters, self.GROUND_MASK, context)
+        mask_path = mask_layer.source() if mask_layer is not None else None
+
+        source = self.parameterAsSource(parameters, self.GROUND_MASK_VECTOR, context)
+        request = None
+        fingerprint = None
+        if source is not None:
+            # Only the features over the DSM are read (spatial index of the provider)
+            to_source = QgsCoordinateTransform(dsm_layer.crs(), source.sourceCrs(),
+                                               context.transformContext())
+            request = QgsFeatureRequest().setFilterRect(
+                to_source.transformBoundingBox(dsm_layer.extent()))
+            request.setNoAttributes()
+            # Fingerprint of the layer content: the geometries are streamed, not kept
+            digest = hashlib.sha256(source.sourceCrs().toWkt().encode("utf8"))
+            for feature in source.getFeatures(request):
+                digest.update(feature.geometry().asWkb())
+            fingerprint = digest.hexdigest()
+
+        def write_mask(dst_path):
+            geometries = None
+            if source is not None:
+                to_dsm = QgsCoordinateTransform(source.sourceCrs(), dsm_layer.crs(),
+                                                context.transformContext())
+                geometries = []
+                for feature in source.getFeatures(request):
+                    geometry = feature.geometry()
+                    if geometry.isEmpty():
+                        continue
+                    geometry.transform(to_dsm)
+                    geometries.append(json.loads(geometry.asJson()))
+                feedback.pushInfo(f"Rasterizing {len(geometries)} ground mask feature(s)")
+            write_ground_mask(dsm_path, dst_path, mask_path, geometries)
+
+        key = get_ground_mask_key(dsm_path, mask_path, fingerprint)
+        path, cached = get_cached_ground_mask(get_ground_mask_cache(), key, write_mask,
+                                              os.path.join(output_dir, RUN_GROUND_MASK_FILE),
+                                              {"dsm_path": dsm_path, "mask_path": mask_path})
+        if cached:
+            feedback.pushInfo(f"Ground mask found in the cache ({key})")
+        return path, key
+
+    def get_roi(self, parameters, context, dsm_path):
+        """
+        Get the region of interest: its DSM window and its polygons (GeoJSON, DSM CRS)
+
+        :return: (window, geometries), None if the whole DSM is processed
+        """
+        dsm_crs = self.parameterAsRasterLayer(parameters, self.INPUT, context).crs()
+
+        bounds = None
+        if parameters.get(self.ROI_EXTENT):
+            extent = self.parameterAsExtent(parameters, self.ROI_EXTENT, context, dsm_crs)
+            if not extent.isNull():
+                bounds = [extent.xMinimum(), extent.yMinimum(),
+                          extent.xMaximum(), extent.yMaximum()]
+
+        geometries = None
+        source = self.parameterAsSource(parameters, self.ROI_MASK, context)
+        if source is not None:
+            transform = QgsCoordinateTransform(source.sourceCrs(), dsm_crs,
+                                               context.transformContext())
+            geometries = []
+            mask_extent = QgsRectangle()
+            mask_extent.setMinimal()
+            for feature in source.getFeatures():
+                geometry = feature.geometry()
+                if geometry.isEmpty():
+                    continue
+                geometry.transform(transform)
+                mask_extent.combineExtentWith(geometry.boundingBox())
+                geometries.append(json.loads(geometry.asJson()))
+            if not geometries:
+                raise QgsProcessingException("The region of interest layer has no polygon")
+            mask_bounds = [mask_extent.xMinimum(), mask_extent.yMinimum(),
+                           mask_extent.xMaximum(), mask_extent.yMaximum()]
+            if bounds is None:
+                bounds = mask_bounds
+            else:
+                bounds = [max(bounds[0], mask_bounds[0]), max(bounds[1], mask_bounds[1]),
+                          min(bounds[2], mask_bounds[2]), min(bounds[3], mask_bounds[3])]
+
+        if bounds is None:
+            return None
+        try:
+            return get_roi_window(dsm_path, bounds), geometries
+        except ValueError as e:
+            raise QgsProcessingException(str(e)) from e
+
+    @staticmethod
+    def get_roi_options(roi):
+        """
+        Get the execution options describing a region of interest (part of the cache key)
+        """
+        roi_window, roi_geometries = roi
+        options = {"roi": [roi_window.col_off, roi_window.row_off,
+                           roi_window.width, roi_window.height]}
+        if roi_geometries:
+            options["roi_mask"] = hashlib.sha256(
+                json.dumps(roi_geometries, sort_keys=True).encode("utf8")).hexdigest()
+        return options
+
+    @classmethod
+    def run_bulldozer(cls, params_for_bulldozer, execution_options, feedback, work_dir=None):
+        """
+        Run Bulldozer, from coarse to fine resolution in pyramid mode and window by window
+        in tiled mode
+
+        :param work_dir: scratch directory of the intermediate files, None to write them
+                         in the output directory
+        :return: False if the run was canceled, True otherwise
+        """
+        if "pyramid_levels" in execution_options:
+            level_options = {name: value for name, value in execution_options.items()
+                             if name != "pyramid_levels"}
+            return run_pyramid_dsm_to_dtm(
+                params_for_bulldozer,
+                lambda level_feedback, **level_params: cls.run_bulldozer(level_params,
+                                                                         level_options,
+                                                                         level_feedback),
+                execution_options["pyramid_levels"],
+                feedback,
+                work_dir) is not None
+
+        if "tile_size" not in execution_options:
+            return run_in_work_dir(params_for_bulldozer, run_dsm_to_dtm, work_dir, feedback)
+
+        tile_margin = execution_options["tile_margin"]
+        run_tiled_dsm_to_dtm(params_for_bulldozer,
+                             run_dsm_to_dtm,
+                             execution_options["tile_size"],
+                             tile_margin if tile_margin > 0 else None,
+                             feedback,
+                             work_dir)
+        return not feedback.isCanceled()
+
+    @record_run_metrics
+    @profile_run
     def processAlgorithm(self, parameters, context, feedback):
         """
         Call Bulldozer with full parameters
         """
         params_for_bulldozer = self.get_params_for_bulldozer(parameters, context, feedback)
-
-        with suppress_stdout_if_none(), suppress_stderr_if_none():
-            dsm_to_dtm(**params_for_bulldozer)
-
         output_dir = params_for_bulldozer["output_dir"]
+        set_profile_dir(output_dir)
+        execution_options = self.get_execution_options(parameters, context,
+                                                       params_for_bulldozer, feedback)
+        record_input(params_for_bulldozer["dsm_path"])
+        record_workers(params_for_bulldozer.get("nb_max_workers"))
+
+        pyramid_levels = self.parameterAsInt(parameters, self.PYRAMID_LEVELS, context)
+        if pyramid_levels > 0:
+            if execution_options.get("incremental"):
+                raise QgsProcessingException("The incremental mode does not support the "
+                                             "coarse-to-fine levels")
+            execution_options["pyramid_levels"] = pyramid_levels
+
+        roi = self.get_roi(parameters, context, params_for_bulldozer["dsm_path"])
+        if roi is not None:
+            if execution_options.get("incremental"):
+                raise QgsProcessingException("The incremental mode does not support a region "
+                                             "of interest")
+            roi_window, roi_geometries = roi
+            execution_options.update(self.get_roi_options(roi))
+        elif not execution_options.get("incremental"):
+            # The tiles of the incremental mode cover the whole DSM
+            execution_options.update(self.get_footprint_options(parameters, context))
+
+        if self.parameterAsBool(parameters, self.SUBMIT, context):
+            if roi is not None or execution_options.get("incremental"):
+                raise QgsProcessingException("The job queue does not support a region of "
+                                             "interest or the incremental mode")
+            queue_options = dict(execution_options)
+            cog_options = self.get_cog_options(parameters, context)
+            if cog_options is not None:
+                queue_options["cog"] = cog_options
+            self.submit_jobs(parameters, context, [(params_for_bulldozer, queue_options)],
+                             feedback)
+            return {}
+
+        # The incremental mode reuses the previous DTM of the output directory instead
+        cache = None if execution_options.get("incremental") else get_result_cache()
+        if cache is not None:
+            cache_key = get_cache_key(params_for_bulldozer, execution_options)
+            restored = cache.restore(cache_key, output_dir)
+            record_cache(bool(restored))
+            if restored:
+                feedback.pushInfo(f"Result found in the cache ({cache_key}): Bulldozer is not run")
+                self.format_outputs(parameters, context, output_dir, feedback)
+                self.OUTPUT = os.path.join(output_dir, "dtm.tif")
+                return {self.OUTPUT: os.path.join(output_dir, "dtm.tif")}
+
+        footprint = self.get_run_footprint(params_for_bulldozer["dsm_path"], execution_options,
+                                           feedback)
+        with self.make_work_dir(params_for_bulldozer, execution_options) as work_dir:
+            if execution_options.get("incremental"):
+                tile_margin = execution_options["tile_margin"]
+                run_incremental_dsm_to_dtm(params_for_bulldozer,
+                                           run_dsm_to_dtm,
+                                           execution_options["tile_size"],
+                                           tile_margin if tile_margin > 0 else None,
+                                           get_cache_key(dict(params_for_bulldozer,
+                                                              dsm_path=None),
+                                                         self.get_ground_mask_options()),
+                                           feedback,
+                                           work_dir)
+                completed = not feedback.isCanceled()
+            elif roi is not None:
+                # The region is already processed in the scratch directory
+                tile_margin = self.parameterAsInt(parameters, self.TILE_MARGIN, context)
+                completed = run_roi_dsm_to_dtm(
+                    params_for_bulldozer,
+                    lambda roi_feedback, **roi_params: self.run_bulldozer(roi_params,
+                                                                           execution_options,
+                                                                           roi_feedback),
+                    roi_window,
+                    tile_margin if tile_margin > 0 else None,
+                    feedback,
+                    roi_geometries,
+                    work_dir) is not None
+            elif footprint is not None:
+                # The checkpoint of a tiled run stays in the output directory to be resumed,
+                # only its tiles are written in the scratch directory
+                tiled = "tile_size" in execution_options
+                completed = run_footprint_dsm_to_dtm(
+                    params_for_bulldozer,
+                    lambda footprint_feedback, **footprint_params: self.run_bulldozer(
+                        footprint_params, execution_options, footprint_feedback,
+                        work_dir if tiled else None),
+                    footprint,
+                    feedback,
+                    None if tiled else work_dir) is not None
+            else:
+                completed = self.run_bulldozer(params_for_bulldozer, execution_options, feedback,
+                                               work_dir)
+        if not completed:
+            return {}
+
+        if cache is not None:
+            cache.store(cache_key, output_dir, {"params": params_for_bulldozer,
+                                                "options": execution_options})
+
+        self.format_outputs(parameters, context, output_dir, feedback)
 
         self.OUTPUT = os.path.join(output_dir, "dtm.tif")
         return {self.OUTPUT: os.path.join(output_dir, "dtm.tif")}
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+Choice of the number of Bulldozer workers and of the tiling from the machine and the DSM.
+
+The memory model is an estimate: Bulldozer keeps about ten rasters of the DSM size
+in memory (filled DSM, masks, DTM...) and each worker process has a fixed overhead.
+"""
+
+import math
+import os
+from typing import NamedTuple, Optional
+
+from .BulldozerDtmProvider_Tiling import DEFAULT_TILE_SIZE, MIN_TILE_SIZE, get_auto_margin
+from .BulldozerDtmProvider_Worker import get_cpu_count
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Estimated memory used by Bulldozer per DSM pixel (bytes)
+BYTES_PER_PIXEL = 40
+# Estimated memory of a worker process (bytes)
+WORKER_OVERHEAD = 200 * 2 ** 20
+# Part of the available memory given to Bulldozer
+MEMORY_FRACTION = 0.8
+
+
+class AutoTuneDecision(NamedTuple):
+    """ Execution settings chosen by auto_tune """
+    nb_workers: int
+    tiled: bool
+    tile_size: int
+    memory_budget: int
+    estimated_memory: int
+
+    def __str__(self):
+        tiling = f"tiles of {self.tile_size} pixels" if self.tiled else "no tiling"
+        return (f"{self.nb_workers} worker(s), {tiling}, estimated memory "
+                f"{self.estimated_memory / 2 ** 20:.0f} MB for a budget of "
+                f"{self.memory_budget / 2 ** 20:.0f} MB")
+
+
+def get_available_memory() -> Optional[int]:
+    """
+    :return: the memory available for new processes (bytes), None if unknown
+    """
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimate_memory(nb_pixels: int, nb_workers: int, dtype_size: int = 4) -> int:
+    """
+    Estimate the memory used by a Bulldozer run.
+
+    :param nb_pixels: number of pixels given to Bulldozer
+    :param nb_workers: number of Bulldozer workers
+    :param dtype_size: size of a DSM pixel (bytes), rasters are at least float32 in Bulldozer
+    :return: the estimated memory (bytes)
+    """
+    return int(nb_pixels * BYTES_PER_PIXEL * max(dtype_size, 4) / 4 + nb_workers * WORKER_OVERHEAD)
+
+
+def auto_tune(width: int, height: int, dtype_size: int, margin: int,
+              cpu_count: int, available_memory: Optional[int]) -> AutoTuneDecision:
+    """
+    Choose the number of workers and the tiling maximizing the throughput under
+    a memory ceiling: all the cores are used if the memory allows it, the scene is
+    tiled only if it does not fit in memory, with the largest tiles that fit.
+
+    :param width: DSM width (pixels)
+    :param height: DSM height (pixels)
+    :param dtype_size: size of a DSM pixel (bytes)
+    :param margin: overlap between tiles (pixels)
+    :param cpu_count: number of available cores
+    :param available_memory: available memory (bytes), None if unknown
+    :return: the chosen settings
+    """
+    nb_workers = max(cpu_count, 1)
+    if available_memory is None:
+        return AutoTuneDecision(nb_workers, False, DEFAULT_TILE_SIZE, 0,
+                                estimate_memory(width * height, nb_workers, dtype_size))
+    memory_budget = int(available_memory * MEMORY_FRACTION)
+
+    # Worker overheads never take more than half of the budget
+    nb_workers = max(min(nb_workers, memory_budget // (2 * WORKER_OVERHEAD)), 1)
+
+    scene_memory = estimate_memory(width * height, nb_workers, dtype_size)
+    if scene_memory <= memory_budget:
+        return AutoTuneDecision(nb_workers, False, DEFAULT_TILE_SIZE, memory_budget, scene_memory)
+
+    # Largest tile (multiple of the minimum tile size) fitting in the budget, margins included
+    pixels_budget = (memory_budget - nb_workers * WORKER_OVERHEAD) * 4 \
+        / (BYTES_PER_PIXEL * max(dtype_size, 4))
+    padded_size = int(math.sqrt(max(pixels_budget, 0)))
+    tile_size = (padded_size - 2 * margin) // MIN_TILE_SIZE * MIN_TILE_SIZE
+    tile_size = max(min(tile_size, max(width, height)), MIN_TILE_SIZE)
+    padded_pixels = (min(tile_size + 2 * margin, width) * min(tile_size + 2 * margin, height))
+    return AutoTuneDecision(nb_workers, True, tile_size, memory_budget,
+                            estimate_memory(padded_pixels, nb_workers, dtype_size))
+
+
+def auto_tune_for_dsm(dsm_path: str, max_object_size: Optional[float] = None,
+                      margin: Optional[int] = None) -> AutoTuneDecision:
+    """
+    Choose the execution settings of a Bulldozer run from the machine and the DSM.
+
+    :param dsm_path: path of the DSM
+    :param max_object_size: Bulldozer max_object_size parameter (gives the tile margin)
+    :param margin: overlap between tiles (pixels), computed from max_object_size if None
+    :return: the chosen settings
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import rasterio
+
+    with rasterio.open(dsm_path) as dsm:
+        width, height = dsm.width, dsm.height
+        dtype_size = np.dtype(dsm.dtypes[0]).itemsize
+        resolution = dsm.res[0]
+    if margin is None:
+        margin = get_auto_margin(max_object_size, resolution)
+    return auto_tune(width, height, dtype_size, margin, get_cpu_count(), get_available_memory())
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from qgis.core import (QgsProcessing,
+                       QgsProcessingException,
+                       QgsProcessingOutputMultipleLayers,
+                       QgsProcessingParameterFile,
+                       QgsProcessingParameterFolderDestination,
+                       QgsProcessingParameterMultipleLayers,
+                       QgsProcessingParameterNumber,
+                       QgsProcessingParameterString)
+
+from .BulldozerDtmProvider_Advanced_algorithm import BulldozerDtmProviderAdvancedAlgorithm
+from .BulldozerDtmProvider_Metrics import record_input, record_run_metrics, record_workers
+from .BulldozerDtmProvider_Worker import (get_mp_context,
+                                          init_pool_process,
+                                          kill_pool_process,
+                                          run_job,
+                                          split_worker_budget)
+
+
+class BulldozerDtmProviderBatchAlgorithm(BulldozerDtmProviderAdvancedAlgorithm):
+    """
+    Processing algorithm that runs Bulldozer on many DSMs concurrently, in a process pool.
+    """
+
+    OUTPUT = 'OUTPUT'
+    INPUT = 'INPUT'
+    INPUT_FOLDER = 'INPUT_FOLDER'
+    PATTERN = 'PATTERN'
+    WORKER_BUDGET = 'WORKER_BUDGET'
+    CONCURRENT_JOBS = 'CONCURRENT_JOBS'
+
+    # Delay between two checks of the cancel button (seconds)
+    POLLING_DELAY = 1
+
+    # DTMs written by the last run
+    dtm_paths = ()
+
+    def initAlgorithm(self, config):
+        """
+        Define the inputs, output and properties of the algorithm
+        """
+        self.addParameter(QgsProcessingParameterMultipleLayers(self.INPUT,
+                                                               self.tr('Input DSMs'),
+                                                               QgsProcessing.TypeRaster,
+                                                               optional=True))
+
+        self.addParameter(QgsProcessingParameterFile(self.INPUT_FOLDER,
+                                                     self.tr('Input DSMs folder'),
+                                                     behavior=QgsProcessingParameterFile.Folder,
+                                                     optional=True))
+
+        self.addParameter(QgsProcessingParameterString(self.PATTERN,
+                                                       self.tr('DSM file name pattern '
+                                                               '(in the input DSMs folder)'),
+                                                       defaultValue='*.tif',
+                                                       optional=True))
+
+        self.add_bulldozer_parameters()
+
+        self.add_pool_parameters()
+
+        self.add_queue_parameters()
+
+        self.addParameter(QgsProcessingParameterFolderDestination(self.OUTPUT_DIR,
+                                                                  self.tr('Output directory')))
+
+        self.addOutput(QgsProcessingOutputMultipleLayers(self.OUTPUT, self.tr('DTMs')))
+
+    def add_pool_parameters(self):
+        """
+        Add the global number of workers and the number of concurrent jobs
+        """
+        self.addParameter(QgsProcessingParameterNumber(self.WORKER_BUDGET,
+                                                       self.tr('Total number of workers '
+                                                               '(0 = all the cores)'),
+                                                       type=QgsProcessingParameterNumber.Integer,
+                                                       minValue=0,
+                                                       defaultValue=0,
+                                                       optional=True))
+
+        self.addParameter(QgsProcessingParameterNumber(self.CONCURRENT_JOBS,
+                                                       self.tr('Number of concurrent jobs '
+                                                               '(0 = automatic)'),
+                                                       type=QgsProcessingParameterNumber.Integer,
+                                                       minValue=0,
+                                                       defaultValue=0,
+                                                       optional=True))
+
+    def get_input_dsms(self, parameters, context):
+        """
+        Get the paths of the DSMs given as layers or found in the input folder
+        """
+        dsm_paths = [layer.source() for layer in self.parameterAsLayerList(parameters,
+                                                                           self.INPUT,
+                                                                           context)]
+
+        folder = self.parameterAsFile(parameters, self.INPUT_FOLDER, context)
+        if folder:
+            pattern = self.parameterAsString(parameters, self.PATTERN, context) or '*.tif'
+            dsm_paths.extend(sorted(glob.glob(os.path.join(folder, pattern))))
+
+        # Remove duplicates while keeping the order
+        return list(dict.fromkeys(os.path.abspath(path) for path in dsm_paths))
+
+    def get_jobs(self, parameters, context, feedback):
+        """
+        Build the Bulldozer parameters of each job, one output sub-directory per DSM
+        """
+        dsm_paths = self.get_input_dsms(parameters, context)
+        if not dsm_paths:
+            raise QgsProcessingException(self.tr('No input DSM'))
+
+        options = self.get_bulldozer_options(parameters, context)
+        output_dir = self.parameterAsString(parameters, self.OUTPUT_DIR, context)
+
+        jobs = []
+        job_dirs = set()
+        for dsm_path in dsm_paths:
+            job_dir = os.path.splitext(os.path.basename(dsm_path))[0]
+            # Two DSMs with the same name in different folders
+            suffix = 1
+            while job_dir in job_dirs:
+                suffix += 1
+                job_dir = f"{os.path.splitext(os.path.basename(dsm_path))[0]}_{suffix}"
+            job_dirs.add(job_dir)
+
+            params_for_bulldozer = dict(options)
+            params_for_bulldozer["dsm_path"] = dsm_path
+            params_for_bulldozer["output_dir"] = os.path.join(output_dir, job_dir)
+            os.makedirs(params_for_bulldozer["output_dir"], exist_ok=True)
+            self.check_params_for_bulldozer(params_for_bulldozer, feedback)
+            jobs.append(params_for_bulldozer)
+
+        return jobs
+
+    def run_pool(self, function, jobs, concurrent_jobs, feedback):
+        """
+        Call function(job) for each job in a process pool, until the end or the cancel.
+        The jobs are taken from the iterable as the processes become free.
+
+        :return: generator of (job, result, exception) in the order the jobs finish
+        """
+        total = len(jobs) if hasattr(jobs, "__len__") else None
+        jobs = iter(jobs)
+        finished = 0
+        # Bulldozer starts its own pool in each job: the pool processes must not be daemonic,
+        # which is the case of ProcessPoolExecutor workers since Python 3.9. Each pool process
+        # leads its own process group, killed on cancel with the processes of Bulldozer.
+        executor = ProcessPoolExecutor(max_workers=concurrent_jobs, mp_context=get_mp_context(),
+                                       initializer=init_pool_process)
+        try:
+            pending = {}
+            while not feedback.isCanceled():
+                while len(pending) < concurrent_jobs:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    pending[executor.submit(function, job)] = job
+                if not pending:
+                    break
+                done, _ = wait(pending, timeout=self.POLLING_DELAY, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    finished += 1
+                    try:
+                        yield job, future.result(), None
+                    except Exception as e:  # pylint: disable=broad-except
+                        yield job, None, e
+                if total:
+                    feedback.setProgress(100 * finished / total)
+        finally:
+            if feedback.isCanceled():
+                # Stop the running jobs
+                for process in getattr(executor, "_processes", {}).values():
+                    kill_pool_process(process)
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @record_run_metrics
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Call Bulldozer on each input DSM, in a process pool
+        """
+        jobs = self.get_jobs(parameters, context, feedback)
+
+        if self.parameterAsBool(parameters, self.SUBMIT, context):
+            self.submit_jobs(parameters, context,
+                             [(params_for_bulldozer, {}) for params_for_bulldozer in jobs],
+                             feedback)
+            return {}
+
+        concurrent_jobs, workers_per_job = split_worker_budget(
+            len(jobs),
+            self.parameterAsInt(parameters, self.WORKER_BUDGET, context),
+            self.parameterAsInt(parameters, self.CONCURRENT_JOBS, context),
+            jobs[0].get("nb_max_workers"))
+        for params_for_bulldozer in jobs:
+            params_for_bulldozer["nb_max_workers"] = workers_per_job
+        feedback.pushInfo(f"{len(jobs)} DSM(s) to process: {concurrent_jobs} concurrent job(s) "
+                          f"with {workers_per_job} worker(s) each")
+        for params_for_bulldozer in jobs:
+            record_input(params_for_bulldozer["dsm_path"])
+        record_workers(concurrent_jobs * workers_per_job)
+
+        dtm_paths = []
+        failed = []
+        for params_for_bulldozer, dtm_path, error in self.run_pool(run_job, jobs,
+                                                                   concurrent_jobs, feedback):
+            dsm_path = params_for_bulldozer["dsm_path"]
+            if error is None:
+                dtm_paths.append(dtm_path)
+                feedback.pushInfo(f"DTM extracted from {dsm_path}")
+            else:
+                failed.append(dsm_path)
+                feedback.reportError(f"Bulldozer failed on {dsm_path}: {error}")
+
+        if failed and not dtm_paths:
+            raise QgsProcessingException(self.tr('Bulldozer failed on all the input DSMs'))
+
+        self.dtm_paths = dtm_paths
+        return {self.OUTPUT: dtm_paths,
+                self.OUTPUT_DIR: self.parameterAsString(parameters, self.OUTPUT_DIR, context)}
+
+    def postProcessAlgorithm(self, context, feedback):
+        """
+        The DTMs are not added to the map: a batch can produce hundreds of them
+        """
+        if self.queued_jobs:
+            return {}
+
+        feedback.pushInfo(f"{len(self.dtm_paths)} DTM(s) written")
+
+        return {self.OUTPUT: self.dtm_paths}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm.
+        """
+        return 'Bulldozer (Batch)'
+
+    def createInstance(self):
+        """
+        Create a new instance of the algorithm.
+        """
+        return BulldozerDtmProviderBatchAlgorithm()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+On-disk cache of the Bulldozer results.
+
+A result is keyed on the fingerprint of the input files (path, size, modification time)
+and on the normalized Bulldozer parameters. The cache size is bounded: the least
+recently used results are evicted first.
+
+QGIS is only imported by the functions reading the provider settings: the cache
+classes are also used by the worker processes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Callable, List, Optional
+
+from .BulldozerDtmProviderSettings import BulldozerDtmProviderSettings
+from .BulldozerDtmProvider_Params import get_combined_list_params
+
+# Bulldozer parameters which do not change the result
+NON_RESULT_PARAMS = ("output_dir", "nb_max_workers", "developer_mode", "mp_context",
+                     "intermediate_write")
+# Bulldozer products stored in the cache
+CACHED_PRODUCTS = ("dtm.tif", "ndsm.tif")
+# Description file of a cache entry, its modification time is the last access time
+ENTRY_FILE = "bulldozer_cache.json"
+# Default cache size (MB)
+DEFAULT_CACHE_SIZE = 10240
+# Store of the pipeline stage products, in the cache directory
+STAGES_DIR = "stages"
+
+
+def get_file_fingerprint(path: str) -> Optional[list]:
+    """
+    Cheap fingerprint of a file: absolute path, size and modification time.
+
+    :param path: path of the file
+    :return: the fingerprint, None if the file does not exist
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    return [os.path.realpath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def normalize_params(params: dict) -> dict:
+    """
+    Normalize Bulldozer parameters: every parameter is given (default value if missing),
+    numbers are given with their parameter type and files are replaced by their fingerprint.
+
+    :param params: Bulldozer parameters
+    :return: the normalized parameters
+    """
+    normalized = {}
+    for param in get_combined_list_params():
+        if param.name in NON_RESULT_PARAMS:
+            continue
+        value = params.get(param.name)
+        if value is None:
+            value = param.default_value
+        if value is not None and param.param_type in (int, float, bool):
+            value = param.param_type(value)
+        if param.name.endswith("_path"):
+            value = get_file_fingerprint(value)
+        normalized[param.name] = value
+    return normalized
+
+
+def get_cache_key(params: dict, options: Optional[dict] = None) -> str:
+    """
+    Compute the cache key of a Bulldozer run.
+
+    :param params: Bulldozer parameters
+    :param options: plugin options changing the result (e.g. tiled mode). A ground mask
+                    written by the plugin is given by its key ("ground_mask"), its path
+                    changes with the output directory.
+    :return: the cache key
+    """
+    options = options or {}
+    if "ground_mask" in options:
+        params = dict(params, ground_mask_path=None)
+    content = json.dumps({"params": normalize_params(params), "options": options},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+
+def link_or_copy(src: str, dst: str):
+    """
+    Hard link a file (instantaneous), or copy it when a link is not possible.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class BulldozerResultCache:
+    """
+    On-disk, size-bounded, least recently used cache of the Bulldozer products.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int):
+        """
+        :param cache_dir: cache directory
+        :param max_size: maximum size of the cache (bytes)
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_entry_dir(self, key: str) -> str:
+        """
+        :return: directory of the cache entry
+        """
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def restore(self, key: str, output_dir: str) -> List[str]:
+        """
+        Restore the cached products of a run in the output directory.
+
+        :param key: cache key
+        :param output_dir: output directory of the run
+        :return: paths of the restored products, empty if the key is not in the cache
+        """
+        entry_dir = self.get_entry_dir(key)
+        entry_file = os.path.join(entry_dir, ENTRY_FILE)
+        if not os.path.isfile(entry_file):
+            return []
+
+        os.makedirs(output_dir, exist_ok=True)
+        restored = []
+        for product in os.listdir(entry_dir):
+            if product in CACHED_PRODUCTS:
+                link_or_copy(os.path.join(entry_dir, product), os.path.join(output_dir, product))
+                restored.append(os.path.join(output_dir, product))
+
+        # Last access time, used by the eviction
+        os.utime(entry_file)
+        return restored
+
+    def store(self, key: str, output_dir: str, description: Optional[dict] = None):
+        """
+        Store the products of a run in the cache, then evict the least recently used entries.
+
+        :param key: cache key
+        :param output_dir: output directory of the run
+        :param description: information saved with the entry (e.g. the parameters)
+        """
+        products = [product for product in CACHED_PRODUCTS
+                    if os.path.isfile(os.path.join(output_dir, product))]
+        if not products:
+            return
+
+        def link_products(entry_dir):
+            for product in products:
+                link_or_copy(os.path.join(output_dir, product), os.path.join(entry_dir, product))
+
+        self.write_entry(key, link_products, description)
+
+    def write_entry(self, key: str, write_function: Callable, description: Optional[dict] = None):
+        """
+        Write a cache entry, then evict the least recently used entries.
+
+        :param key: cache key
+        :param write_function: function writing the files of the entry, called with the
+                               directory of the entry
+        :param description: information saved with the entry
+        """
+        # The entry is built aside, then moved: a partial entry is never visible
+        entry_dir = self.get_entry_dir(key)
+        tmp_dir = os.path.join(self.cache_dir, f"tmp_{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            write_function(tmp_dir)
+            with open(os.path.join(tmp_dir, ENTRY_FILE), "w", encoding="utf-8") as entry_file:
+                json.dump({"created": time.time(), "description": description or {}},
+                          entry_file, default=str)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            try:
+                os.replace(tmp_dir, entry_dir)
+            except OSError:
+                # The same entry has just been written by another process
+                if not os.path.isfile(os.path.join(entry_dir, ENTRY_FILE)):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.evict()
+
+    def get_entries(self) -> List[tuple]:
+        """
+        :return: (last access time, size, directory) of each cache entry
+        """
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir) or prefix.startswith("tmp_"):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, key)
+                entry_file = os.path.join(entry_dir, ENTRY_FILE)
+                if not os.path.isfile(entry_file):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry_dir, name))
+                           for name in os.listdir(entry_dir))
+                entries.append((os.path.getmtime(entry_file), size, entry_dir))
+        return entries
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in its maximum size.
+        """
+        entries = sorted(self.get_entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+
+    def purge(self):
+        """
+        Remove all the cache entries.
+        """
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def get_default_cache_dir() -> str:
+    """
+    :return: the default cache directory, in the QGIS profile
+    """
+    from qgis.core import QgsApplication  # pylint: disable=import-outside-toplevel
+
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), "bulldozer", "cache")
+
+
+def get_result_cache(force: bool = False) -> Optional[BulldozerResultCache]:
+    """
+    Get the result cache configured in the provider settings.
+
+    :param force: return the cache even if it is disabled
+    :return: the result cache, None if it is disabled
+    """
+    # pylint: disable=import-outside-toplevel
+    from processing.core.ProcessingConfig import ProcessingConfig
+
+    if not force and not ProcessingConfig.getSetting(BulldozerDtmProviderSettings.CACHE_ACTIVATE):
+        return None
+    cache_dir = (ProcessingConfig.getSetting(BulldozerDtmProviderSettings.CACHE_FOLDER)
+                 or get_default_cache_dir())
+    max_size = ProcessingConfig.getSetting(BulldozerDtmProviderSettings.CACHE_MAX_SIZE)
+    if max_size is None:
+        max_size = DEFAULT_CACHE_SIZE
+    return BulldozerResultCache(cache_dir, int(float(max_size) * 2 ** 20))
+
+
+def get_stage_store_options() -> Optional[dict]:
+    """
+    Get the store of the pipeline stage products configured in the provider settings.
+    It is in the cache directory, with the maximum size of the result cache.
+
+    :return: the arguments of the store (see BulldozerDtmProvider_Stages.StageStore),
+             None if it is disabled
+    """
+    # pylint: disable=import-outside-toplevel
+    from processing.core.ProcessingConfig import ProcessingConfig
+
+    if not ProcessingConfig.getSetting(BulldozerDtmProviderSettings.STAGES_ACTIVATE):
+        return None
+    cache = get_result_cache(force=True)
+    return {"cache_dir": os.path.join(cache.cache_dir, STAGES_DIR), "max_size": cache.max_size}
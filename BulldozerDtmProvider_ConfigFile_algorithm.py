@@ -19,19 +19,22 @@
 # See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
 # more details.
 
-import os
 
-from qgis.PyQt.QtCore import QCoreApplication
-from qgis.core import (QgsProcessing,
-                       QgsFeatureSink,
-                       QgsProcessingParameterFile,
+from qgis.core import (QgsProcessingParameterFile,
                        QgsProcessingException)
 
-from bulldozer.utils.config_parser import ConfigParser
-from .import_bulldozer import dsm_to_dtm
-#TODO: remove suppress_stdout_if_none and suppress_stderr_if_none imports when tqdm bug on windows gui is fixed
-from .BulldozerDtmProvider_algorithm import BulldozerDtmProviderAlgorithm, suppress_stdout_if_none, suppress_stderr_if_none
-from .BulldozerDtmProvider_Params import check_params, BulldozerParameterException
+from .BulldozerDtmProvider_algorithm import BulldozerDtmProviderAlgorithm
+from .BulldozerDtmProvider_Cache import get_cache_key, get_result_cache
+from .BulldozerDtmProvider_Engine import run_dsm_to_dtm
+from .BulldozerDtmProvider_Footprint import run_footprint_dsm_to_dtm
+from .BulldozerDtmProvider_Job import get_job
+from .BulldozerDtmProvider_Metrics import (record_cache,
+                                           record_input,
+                                           record_run_metrics,
+                                           record_workers)
+from .BulldozerDtmProvider_Params import BulldozerParameterException
+from .BulldozerDtmProvider_Profiling import profile_run, set_profile_dir
+from .BulldozerDtmProvider_Scratch import run_in_work_dir
 
 class BulldozerDtmProviderConfigFileAlgorithm(BulldozerDtmProviderAlgorithm):
     """
@@ -52,22 +55,76 @@ class BulldozerDtmProviderConfigFileAlgorithm(BulldozerDtmProviderAlgorithm):
                                                      )
                           )
 
+        self.add_footprint_parameter()
+        self.add_headless_parameter()
+        self.add_profile_parameters()
+        self.add_queue_parameters()
+
+    def checkParameterValues(self, parameters, context):
+        """
+        Validate the config file before the run (the errors are shown in the dialog)
+        """
+        source = self.parameterAsString(parameters, self.INPUT, context)
+        if source:
+            try:
+                get_job(source)
+            except BulldozerParameterException as e:
+                return False, str(e)
+        return super().checkParameterValues(parameters, context)
+
+    @record_run_metrics
+    @profile_run
     def processAlgorithm(self, parameters, context, feedback):
         """
         Call Bulldozer with config file
         """
 
         source = self.parameterAsString(parameters, self.INPUT, context)
+        # The job validated by checkParameterValues is reused, unless the file has changed
+        try:
+            job = get_job(source)
+        except BulldozerParameterException as e:
+            raise QgsProcessingException(str(e)) from e
+        params_for_bulldozer = dict(job.params)
+        set_profile_dir(job.output_dir)
+        record_input(params_for_bulldozer["dsm_path"])
+        record_workers(params_for_bulldozer.get("nb_max_workers"))
+        execution_options = self.get_footprint_options(parameters, context)
+
+        if self.parameterAsBool(parameters, self.SUBMIT, context):
+            self.submit_jobs(parameters, context, [(params_for_bulldozer, execution_options)],
+                             feedback)
+            return {}
+
+        cache = get_result_cache()
+        if cache is not None:
+            cache_key = get_cache_key(params_for_bulldozer, execution_options)
+            restored = cache.restore(cache_key, job.output_dir)
+            record_cache(bool(restored))
+            if restored:
+                feedback.pushInfo(f"Result found in the cache ({cache_key}): Bulldozer is not run")
+                self.OUTPUT = job.dtm_path
+                return {self.OUTPUT: job.dtm_path}
 
-        with suppress_stdout_if_none(), suppress_stderr_if_none():
-            dsm_to_dtm(config_path=source)
+        footprint = self.get_run_footprint(params_for_bulldozer["dsm_path"], execution_options,
+                                           feedback)
+        with self.make_work_dir(params_for_bulldozer) as work_dir:
+            if footprint is not None:
+                completed = run_footprint_dsm_to_dtm(params_for_bulldozer, run_dsm_to_dtm,
+                                                     footprint, feedback, work_dir) is not None
+            else:
+                completed = run_in_work_dir(params_for_bulldozer, run_dsm_to_dtm, work_dir,
+                                            feedback)
+        if not completed:
+            return {}
 
-        parser = ConfigParser(False)
-        input_params = parser.read(source)
-        output_dir=input_params['output_dir']
+        if cache is not None:
+            cache.store(cache_key, job.output_dir, {"params": params_for_bulldozer,
+                                                    "options": execution_options,
+                                                    "config_path": source})
 
-        self.OUTPUT = os.path.join(output_dir, "dtm.tif")
-        return {self.OUTPUT: os.path.join(output_dir, "dtm.tif")}
+        self.OUTPUT = job.dtm_path
+        return {self.OUTPUT: job.dtm_path}
 
     def name(self):
         """
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Execution engine of the Bulldozer pipeline.
+
+By default, dsm_to_dtm runs in a worker subprocess (see BulldozerDtmProvider_Worker):
+QGIS stays responsive, the job is killed as soon as the user cancels it, a crash in
+the native code cannot take QGIS down and the memory is released when the job ends.
+"""
+
+import collections
+import json
+import os
+import queue
+import signal
+import subprocess
+import threading
+
+from qgis.core import QgsProcessingException
+from processing.core.ProcessingConfig import ProcessingConfig
+
+from .BulldozerDtmProviderSettings import BulldozerDtmProviderSettings
+from .BulldozerDtmProvider_Cache import get_stage_store_options
+from .BulldozerDtmProvider_Metrics import record_stages
+from .BulldozerDtmProvider_Profiling import get_worker_profile
+#TODO: remove suppress_stdout_if_none and suppress_stderr_if_none imports when tqdm bug on windows gui is fixed
+from .BulldozerDtmProvider_algorithm import suppress_stdout_if_none, suppress_stderr_if_none
+from .BulldozerDtmProvider_Progress import StageMonitor, format_stage_table
+from .BulldozerDtmProvider_Worker import get_python_executable, run_job
+from .import_bulldozer import get_dsm_to_dtm
+
+# Delay between two checks of the cancel button (seconds)
+POLLING_DELAY = 0.2
+# Number of lines of the worker standard error kept for the error messages
+STDERR_TAIL = 30
+
+
+def use_subprocess():
+    """
+    :return: True if Bulldozer has to run in a worker subprocess (provider setting)
+    """
+    value = ProcessingConfig.getSetting(BulldozerDtmProviderSettings.SUBPROCESS)
+    return value is None or bool(value)
+
+
+def get_worker_command():
+    """
+    :return: the command line starting the worker subprocess, and its environment
+    """
+    plugin_dir = os.path.dirname(os.path.abspath(__file__))
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(plugin_dir),
+                                                      env.get("PYTHONPATH")]))
+    env["PYTHONUNBUFFERED"] = "1"
+    return [get_python_executable(), "-m", f"{__package__}.BulldozerDtmProvider_Worker"], env
+
+
+def kill_worker(process):
+    """
+    Kill the worker subprocess and the Bulldozer processes it started.
+    """
+    if process.poll() is not None:
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False,
+                       creationflags=subprocess.CREATE_NO_WINDOW)
+    else:
+        # The worker is the leader of its own process group
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    process.wait()
+
+
+def get_popen_args():
+    """
+    :return: the subprocess.Popen arguments isolating a child process: no console window
+             on Windows, own process group elsewhere (see kill_worker)
+    """
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NO_WINDOW}
+    return {"start_new_session": True}
+
+
+def read_lines(stream, callback):
+    """
+    Read a stream line by line until its end (run in a thread).
+    """
+    for line in iter(stream.readline, ''):
+        callback(line)
+    stream.close()
+
+
+def push_log(feedback, level, message):
+    """
+    Forward a Bulldozer log message to the processing feedback.
+    """
+    if level == "DEBUG":
+        feedback.pushDebugInfo(message)
+    elif level in ("ERROR", "CRITICAL"):
+        feedback.reportError(message)
+    else:
+        feedback.pushInfo(message)
+
+
+def handle_event(feedback, event):
+    """
+    Forward an event of a Bulldozer run (log, stage, timings...) to the processing feedback.
+
+    :param feedback: QGIS processing feedback
+    :param event: event sent by the worker or the stage monitor
+    """
+    if event["event"] == "log":
+        push_log(feedback, event["level"], event["message"])
+    elif event["event"] == "stage":
+        feedback.setProgress(event["progress"])
+        feedback.pushInfo(f"Bulldozer stage: {event['name']}")
+    elif event["event"] == "progress":
+        feedback.setProgress(event["progress"])
+    elif event["event"] == "timings":
+        feedback.pushInfo("Bulldozer stages:\n" + format_stage_table(event["stages"]))
+        record_stages(event["stages"])
+    elif event["event"] == "error":
+        feedback.pushDebugInfo(event["traceback"])
+
+
+def run_in_subprocess(job, feedback):
+    """
+    Run a Bulldozer job in a worker subprocess.
+
+    :param job: {"params": Bulldozer parameters, "stage_store": arguments of the stage store}
+                or {"config_path": path of a config file}, and optionally
+                {"profile": arguments of the worker profiler}
+    :param feedback: QGIS processing feedback
+    :return: False if the job was canceled, True otherwise
+    """
+    command, env = get_worker_command()
+    process = subprocess.Popen(command, env=env, text=True, bufsize=1,
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               **get_popen_args())
+
+    events = queue.Queue()
+    stderr_tail = collections.deque(maxlen=STDERR_TAIL)
+    threads = [threading.Thread(target=read_lines, args=(process.stdout, events.put), daemon=True),
+               threading.Thread(target=read_lines, args=(process.stderr, stderr_tail.append),
+                                daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    process.stdin.write(json.dumps(job))
+    process.stdin.close()
+
+    error = None
+    try:
+        while threads[0].is_alive() or not events.empty():
+            if feedback.isCanceled():
+                feedback.pushInfo("Canceled: stopping Bulldozer")
+                kill_worker(process)
+                return False
+            try:
+                line = events.get(timeout=POLLING_DELAY)
+            except queue.Empty:
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                feedback.pushDebugInfo(line.rstrip())
+                continue
+            if event["event"] == "error":
+                error = event
+            handle_event(feedback, event)
+        process.wait()
+    finally:
+        # Nothing to do if the worker has already exited
+        kill_worker(process)
+        for thread in threads:
+            thread.join()
+
+    if error is not None:
+        raise QgsProcessingException(f"Bulldozer failed: {error['message']}")
+    if process.returncode != 0:
+        raise QgsProcessingException(f"Bulldozer worker exited with code {process.returncode}:\n"
+                                     + "".join(stderr_tail))
+    return True
+
+
+def run_dsm_to_dtm(feedback, config_path=None, **params_for_bulldozer):
+    """
+    Run the Bulldozer pipeline, in a worker subprocess or in the QGIS process
+    depending on the provider settings.
+
+    :param feedback: QGIS processing feedback
+    :param config_path: path of a Bulldozer config file (instead of the parameters)
+    :param params_for_bulldozer: Bulldozer parameters
+    :return: False if the run was canceled, True otherwise
+    """
+    # The stages are only memoized for the runs from parameters
+    stage_store = None if config_path else get_stage_store_options()
+    if use_subprocess():
+        if config_path:
+            job = {"config_path": config_path}
+        else:
+            job = {"params": params_for_bulldozer, "stage_store": stage_store}
+        # In the QGIS process, the call is part of the profile of the algorithm
+        profile = get_worker_profile()
+        if profile is not None:
+            job["profile"] = profile
+        return run_in_subprocess(job, feedback)
+
+    try:
+        dsm_to_dtm = get_dsm_to_dtm()
+    except ImportError as e:
+        raise QgsProcessingException(str(e)) from e
+    with suppress_stdout_if_none(), suppress_stderr_if_none(), \
+            StageMonitor(lambda event, **data: handle_event(feedback, dict(data, event=event))):
+        if config_path:
+            dsm_to_dtm(config_path=config_path)
+        elif stage_store is not None:
+            run_job(params_for_bulldozer, stage_store)
+        else:
+            dsm_to_dtm(**params_for_bulldozer)
+    return True
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Extraction of the DTM on the valid data footprint of the DSM.
+
+Rotated strips and mosaics often leave most of the DSM raster as nodata. The valid
+data footprint is found by scanning the mask of the DSM strip by strip (bounded
+memory), then Bulldozer only processes the tight window around the valid pixels.
+Its products are written back into the full DSM grid, nodata outside of the window.
+"""
+
+import os
+import shutil
+from typing import Callable, List, Optional, Sequence, TYPE_CHECKING
+
+from .BulldozerDtmProvider_Tiling import create_mosaic, write_window_inputs, TILED_PRODUCTS
+
+if TYPE_CHECKING:
+    from rasterio.windows import Window
+
+# Work directory of the footprint run, in the output (or scratch) directory
+FOOTPRINT_DIR = "footprint"
+# Minimal share of the DSM pixels outside of the footprint for the crop to be worth it
+MIN_CROP_GAIN = 0.1
+# Number of rows of the DSM mask read at once by the scan (rounded to whole blocks)
+SCAN_ROWS = 512
+
+
+def get_valid_window(dsm_path: str) -> Optional["Window"]:
+    """
+    Get the bounding window of the valid pixels of the DSM, from its mask band
+    (nodata value, internal mask or alpha band).
+
+    :param dsm_path: path of the DSM
+    :return: the window, None if the DSM has no valid pixel
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import rasterio
+    from rasterio.windows import Window
+
+    with rasterio.open(dsm_path) as dsm:
+        block_rows = dsm.block_shapes[0][0]
+        strip_rows = max(1, SCAN_ROWS // block_rows) * block_rows
+        valid_cols = np.zeros(dsm.width, dtype=bool)
+        row_min, row_max = None, None
+        for row_off in range(0, dsm.height, strip_rows):
+            height = min(strip_rows, dsm.height - row_off)
+            mask = dsm.read_masks(1, window=Window(0, row_off, dsm.width, height))
+            valid_rows = np.flatnonzero(mask.any(axis=1))
+            if valid_rows.size == 0:
+                continue
+            if row_min is None:
+                row_min = row_off + int(valid_rows[0])
+            row_max = row_off + int(valid_rows[-1])
+            valid_cols |= mask.any(axis=0)
+
+    if row_min is None:
+        return None
+    cols = np.flatnonzero(valid_cols)
+    return Window(int(cols[0]), row_min, int(cols[-1]) - int(cols[0]) + 1, row_max - row_min + 1)
+
+
+def get_footprint_window(dsm_path: str, min_gain: float = MIN_CROP_GAIN) -> Optional["Window"]:
+    """
+    Get the window of the DSM to process, if cropping it to its valid data is worth it.
+
+    :param dsm_path: path of the DSM
+    :param min_gain: minimal share of the pixels left out by the crop
+    :return: the window, None if the whole DSM has to be processed
+    """
+    import rasterio  # pylint: disable=import-outside-toplevel
+
+    window = get_valid_window(dsm_path)
+    if window is None:
+        return None
+    with rasterio.open(dsm_path) as dsm:
+        nb_pixels = dsm.width * dsm.height
+    if window.width * window.height > (1 - min_gain) * nb_pixels:
+        return None
+    return window
+
+
+def get_run_footprint(dsm_path: str, options: dict) -> Optional[List[int]]:
+    """
+    Get the footprint of a run from its execution options. The DSM is only scanned here,
+    once the run is not restored from the result cache (only the "crop_footprint" flag
+    is part of the cache key, with the fingerprint of the DSM).
+
+    :param dsm_path: path of the DSM
+    :param options: execution options of the run
+    :return: the footprint (col_off, row_off, width, height), None if the whole DSM is processed
+    """
+    if "footprint" in options:
+        return options["footprint"]
+    if not options.get("crop_footprint"):
+        return None
+    window = get_footprint_window(dsm_path)
+    if window is None:
+        return None
+    return [window.col_off, window.row_off, window.width, window.height]
+
+
+def pad_products(src_dir: str, window: "Window", dst_dir: str, dsm_profile: dict):
+    """
+    Write the Bulldozer products of the footprint window into the full DSM grid.
+
+    :param src_dir: output directory of the run on the footprint window
+    :param window: footprint window, in the DSM
+    :param dst_dir: directory of the full grid products
+    :param dsm_profile: profile of the DSM (gives the grid)
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.windows import Window
+
+    for product in TILED_PRODUCTS:
+        src_product = os.path.join(src_dir, product)
+        if not os.path.isfile(src_product):
+            continue
+        # The blocks which are never written are filled with nodata
+        with rasterio.open(src_product) as src, \
+                create_mosaic(os.path.join(dst_dir, product), src_product, dsm_profile) as dst:
+            for _, block in src.block_windows(1):
+                dst.write(src.read(window=block),
+                          window=Window(window.col_off + block.col_off,
+                                        window.row_off + block.row_off,
+                                        block.width, block.height))
+
+
+def run_footprint_dsm_to_dtm(params: dict, run_function: Callable, window: Sequence[int],
+                             feedback, work_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Run Bulldozer on the valid data footprint of the DSM.
+
+    :param params: Bulldozer parameters (dsm_path and output_dir are required)
+    :param run_function: function running Bulldozer, called as run_function(feedback, **params),
+                         returning False if the run was canceled
+    :param window: footprint window (col_off, row_off, width, height), as in the execution
+                   options (see get_footprint_window)
+    :param feedback: QGIS processing feedback
+    :param work_dir: directory of the footprint DSM and products (scratch), the output
+                     directory if None. A tiled run keeps its checkpoint with the footprint
+                     products: it must run in the output directory to be resumed.
+    :return: the path of the DTM, None if the run was canceled
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.windows import Window
+
+    window = Window(*window)
+    output_dir = params["output_dir"]
+    with rasterio.open(params["dsm_path"]) as dsm:
+        dsm_profile = dsm.profile.copy()
+    share = window.width * window.height / (dsm_profile["width"] * dsm_profile["height"])
+    feedback.pushInfo(f"Valid data footprint: {int(window.width)}x{int(window.height)} pixels "
+                      f"({100 * share:.0f}% of the DSM)")
+
+    # The footprint directory is kept when the run fails or is canceled: a tiled run in the
+    # output directory is resumed from its checkpoint (the scratch directory is removed)
+    footprint_dir = os.path.join(work_dir or output_dir, FOOTPRINT_DIR)
+    os.makedirs(footprint_dir, exist_ok=True)
+    footprint_params = write_window_inputs(params, window, footprint_dir)
+    if run_function(feedback, **footprint_params) is False or feedback.isCanceled():
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    pad_products(footprint_dir, window, output_dir, dsm_profile)
+    if not params.get("developer_mode"):
+        shutil.rmtree(footprint_dir, ignore_errors=True)
+    return os.path.join(output_dir, "dtm.tif")
@@ -23,6 +23,17 @@
 from qgis.core import QgsProcessingParameterFileDestination
 
 from .BulldozerDtmProvider_Advanced_algorithm import BulldozerDtmProviderAdvancedAlgorithm
+from .BulldozerDtmProvider_Metrics import record_run_metrics
+
+
+def write_config_file(params_for_bulldozer, config_file):
+    """
+    Write the Bulldozer parameters in a Bulldozer config file
+    """
+    with open(config_file, 'w') as f:
+        for key, value in params_for_bulldozer.items():
+            if value is not None:
+                f.write(f"{key}: {value} \n")
 
 
 class BulldozerDtmProviderGenerateConfigFile(BulldozerDtmProviderAdvancedAlgorithm):
@@ -49,6 +60,12 @@ class BulldozerDtmProviderGenerateConfigFile(BulldozerDtmProviderAdvancedAlgorit
                                                                 fileFilter='YAML files (*.yaml)')
                           )
 
+    def add_execution_parameters(self):
+        """
+        Execution options are not part of a Bulldozer config file
+        """
+
+    @record_run_metrics
     def processAlgorithm(self, parameters, context, feedback):
         """
         Call Bulldozer with full parameters
@@ -58,10 +75,7 @@ class BulldozerDtmProviderGenerateConfigFile(BulldozerDtmProviderAdvancedAlgorit
         params_for_bulldozer["config_file"] = self.parameterAsString(parameters,
                                                                      self.CONFIG_FILE, context)
 
-        with open(params_for_bulldozer["config_file"], 'w') as f:
-            for key, value in params_for_bulldozer.items():
-                if value is not None:
-                    f.write(f"{key}: {value} \n")
+        write_config_file(params_for_bulldozer, params_for_bulldozer["config_file"])
 
         self.OUTPUT = params_for_bulldozer["config_file"]
         return {self.OUTPUT: params_for_bulldozer["config_file"]}
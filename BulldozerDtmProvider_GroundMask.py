@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Ground mask of the Bulldozer runs, from a raster and/or vector layers.
+
+Bulldozer expects a binary mask (pixels > 0 are ground) on the grid of the DSM. A raster
+mask is warped onto the DSM grid, the polygons and lines of a vector layer (water, roads,
+parks...) are rasterized onto it. The mask is written block by block: only the geometries
+whose bounds intersect a block, found with a block index, are rasterized in it, so the
+memory is bounded by the block size whatever the DSM size.
+
+The masks are stored in the cache folder, keyed on the fingerprint of the layers and on
+the DSM grid: the runs over the same area reuse the mask instead of rasterizing it again.
+Each run gets its own link (or copy) of the mask in its output directory, so that the
+eviction of the cache never removes the mask of a run, a configuration file or a queued job.
+"""
+
+import contextlib
+import hashlib
+import json
+import math
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .BulldozerDtmProvider_Cache import (get_file_fingerprint,
+                                         get_result_cache,
+                                         link_or_copy,
+                                         BulldozerResultCache,
+                                         ENTRY_FILE)
+
+# Store of the ground masks, in the cache directory
+GROUND_MASK_DIR = "ground_masks"
+# File of the ground mask in its cache entry
+GROUND_MASK_FILE = "ground_mask.tif"
+# File of the ground mask of a run, in its output directory
+RUN_GROUND_MASK_FILE = "input_ground_mask.tif"
+# Size of the blocks of the mask written at once (pixels, multiple of the GeoTIFF blocks)
+BLOCK_SIZE = 1024
+
+
+def get_dsm_grid(dsm_path: str) -> dict:
+    """
+    :return: the grid of the DSM (size, transform and CRS), part of the ground mask key
+    """
+    import rasterio  # pylint: disable=import-outside-toplevel
+
+    with rasterio.open(dsm_path) as dsm:
+        return {"width": dsm.width, "height": dsm.height,
+                "transform": list(dsm.transform)[:6],
+                "crs": dsm.crs.to_wkt() if dsm.crs else None}
+
+
+def get_ground_mask_key(dsm_path: str, mask_path: Optional[str] = None,
+                        vector_fingerprint: Optional[str] = None) -> str:
+    """
+    Compute the key of a ground mask.
+
+    :param dsm_path: path of the DSM giving the grid of the mask
+    :param mask_path: path of the raster mask
+    :param vector_fingerprint: fingerprint of the geometries of the vector mask
+    :return: the key
+    """
+    content = json.dumps({"grid": get_dsm_grid(dsm_path),
+                          "raster": get_file_fingerprint(mask_path),
+                          "vector": vector_fingerprint}, sort_keys=True)
+    return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+
+def iter_points(coordinates: Sequence) -> Iterable[Sequence[float]]:
+    """
+    :return: the points of nested GeoJSON coordinates
+    """
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        yield coordinates
+        return
+    for item in coordinates:
+        yield from iter_points(item)
+
+
+def get_geometry_bounds(geometry: dict) -> Optional[Tuple[float, float, float, float]]:
+    """
+    :param geometry: GeoJSON geometry
+    :return: (xmin, ymin, xmax, ymax) of the geometry, None if it is empty
+    """
+    if geometry["type"] == "GeometryCollection":
+        points = [point for part in geometry["geometries"]
+                  for point in iter_points(part["coordinates"])]
+    else:
+        points = list(iter_points(geometry["coordinates"]))
+    if not points:
+        return None
+    xs, ys = [point[0] for point in points], [point[1] for point in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def index_geometries(geometries: List[dict], transform, width: int, height: int,
+                     block_size: int = BLOCK_SIZE) -> Dict[Tuple[int, int], List[int]]:
+    """
+    Index the geometries by the blocks of the grid their bounds intersect.
+
+    :param geometries: GeoJSON geometries, in the CRS of the grid
+    :param transform: affine transform of the grid
+    :param width: width of the grid (pixels)
+    :param height: height of the grid (pixels)
+    :param block_size: size of the blocks (pixels)
+    :return: the indices of the geometries, by (block row, block column)
+    """
+    inverse = ~transform
+    nb_block_rows = math.ceil(height / block_size)
+    nb_block_cols = math.ceil(width / block_size)
+    index = {}
+    for geometry_index, geometry in enumerate(geometries):
+        bounds = get_geometry_bounds(geometry)
+        if bounds is None:
+            continue
+        xmin, ymin, xmax, ymax = bounds
+        # The four corners: the grid may be rotated
+        pixels = [inverse * corner
+                  for corner in ((xmin, ymin), (xmin, ymax), (xmax, ymin), (xmax, ymax))]
+        first_col = max(0, math.floor(min(col for col, _ in pixels) / block_size))
+        last_col = min(nb_block_cols - 1, math.floor(max(col for col, _ in pixels) / block_size))
+        first_row = max(0, math.floor(min(row for _, row in pixels) / block_size))
+        last_row = min(nb_block_rows - 1, math.floor(max(row for _, row in pixels) / block_size))
+        for block_row in range(first_row, last_row + 1):
+            for block_col in range(first_col, last_col + 1):
+                index.setdefault((block_row, block_col), []).append(geometry_index)
+    return index
+
+
+def write_ground_mask(dsm_path: str, dst_path: str, mask_path: Optional[str] = None,
+                      geometries: Optional[List[dict]] = None, block_size: int = BLOCK_SIZE):
+    """
+    Write the ground mask on the grid of the DSM, block by block: union of the raster mask
+    (valid pixels > 0) and of the geometries (pixels whose center is inside, pixels touched
+    by the lines).
+
+    :param dsm_path: path of the DSM
+    :param dst_path: path of the ground mask (GeoTIFF, 1 = ground)
+    :param mask_path: path of the raster mask, warped onto the DSM grid (nearest neighbor)
+    :param geometries: GeoJSON geometries, in the DSM CRS
+    :param block_size: size of the blocks written at once (pixels)
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.features import rasterize
+    from rasterio.vrt import WarpedVRT
+    from rasterio.windows import Window
+
+    with rasterio.open(dsm_path) as dsm:
+        width, height = dsm.width, dsm.height
+        transform, crs = dsm.transform, dsm.crs
+    profile = {"driver": "GTiff", "dtype": "uint8", "count": 1, "width": width,
+               "height": height, "transform": transform, "crs": crs, "nodata": None,
+               "tiled": True, "blockxsize": 256, "blockysize": 256, "compress": "deflate"}
+    index = index_geometries(geometries or [], transform, width, height, block_size)
+
+    with contextlib.ExitStack() as stack:
+        mask = None
+        if mask_path:
+            src = stack.enter_context(rasterio.open(mask_path))
+            mask = stack.enter_context(WarpedVRT(src, crs=crs, transform=transform,
+                                                 width=width, height=height,
+                                                 resampling=Resampling.nearest))
+        dst = stack.enter_context(rasterio.open(dst_path, "w", **profile))
+        for row_off in range(0, height, block_size):
+            for col_off in range(0, width, block_size):
+                window = Window(col_off, row_off,
+                                min(block_size, width - col_off),
+                                min(block_size, height - row_off))
+                block = np.zeros((int(window.height), int(window.width)), dtype=np.uint8)
+                if mask is not None:
+                    block[(mask.read(1, window=window) > 0)
+                          & (mask.read_masks(1, window=window) > 0)] = 1
+                block_geometries = index.get((row_off // block_size, col_off // block_size))
+                if block_geometries:
+                    rasterize([geometries[i] for i in block_geometries], out=block,
+                              transform=dst.window_transform(window), default_value=1)
+                # The blocks which are not written read back as 0 (no nodata value)
+                if block.any():
+                    dst.write(block, 1, window=window)
+
+
+def get_ground_mask_cache() -> BulldozerResultCache:
+    """
+    Get the store of the ground masks: in the cache directory, with the maximum size
+    of the result cache (used even if the result cache is disabled).
+    """
+    cache = get_result_cache(force=True)
+    return BulldozerResultCache(os.path.join(cache.cache_dir, GROUND_MASK_DIR), cache.max_size)
+
+
+def get_cached_ground_mask(cache: BulldozerResultCache, key: str,
+                           write_function: Callable[[str], None], dst_path: str,
+                           description: Optional[dict] = None) -> Tuple[str, bool]:
+    """
+    Get the ground mask of a run from the cache, write it and store it in the cache if it
+    is missing. The run uses its own link (or copy) of the mask, never the cache entry.
+
+    :param cache: store of the ground masks (see get_ground_mask_cache)
+    :param key: key of the mask (see get_ground_mask_key)
+    :param write_function: function writing the mask, called with its path
+    :param dst_path: path of the mask of the run
+    :param description: information saved with the mask
+    :return: the path of the mask of the run, and True if it was found in the cache
+    """
+    entry_dir = cache.get_entry_dir(key)
+    entry_file = os.path.join(entry_dir, ENTRY_FILE)
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    if os.path.isfile(entry_file):
+        try:
+            link_or_copy(os.path.join(entry_dir, GROUND_MASK_FILE), dst_path)
+            # Last access time, used by the eviction
+            os.utime(entry_file)
+            return dst_path, True
+        except FileNotFoundError:
+            # Evicted by another run in the meantime
+            pass
+    # The mask of a previous run may be a link to a cache entry: it is not overwritten
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    write_function(dst_path)
+    cache.write_entry(key, lambda tmp_dir: link_or_copy(dst_path,
+                                                        os.path.join(tmp_dir, GROUND_MASK_FILE)),
+                      description)
+    return dst_path, False
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+Incremental update of a DTM after a partial update of its DSM.
+
+The DSM is split into the tiles of the tiled mode and the hash of each tile is saved
+in a manifest next to the DTM. On the next run, only the tiles whose hash changed are
+recomputed: each one is extended by the tile margin (the DTM around a modified object
+may change too), given to Bulldozer with a margin of context, and patched into the
+existing products in place.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable, List, Optional
+
+from .BulldozerDtmProvider_Progress import ScaledFeedback
+from .BulldozerDtmProvider_Tiling import (compute_tiles,
+                                          get_auto_margin,
+                                          pad_window,
+                                          run_tiled_dsm_to_dtm,
+                                          write_window_inputs,
+                                          TILED_PRODUCTS)
+
+# Manifest of the incremental mode, in the output directory
+MANIFEST_FILE = "bulldozer_incremental.json"
+MANIFEST_VERSION = 1
+
+
+def get_grid(dsm) -> dict:
+    """
+    :param dsm: opened DSM (rasterio dataset)
+    :return: description of the DSM grid, which must not change between incremental runs
+    """
+    return {"width": dsm.width,
+            "height": dsm.height,
+            "transform": list(dsm.transform)[:6],
+            "crs": dsm.crs.to_string() if dsm.crs else None,
+            "dtype": dsm.dtypes[0],
+            "nodata": dsm.nodata}
+
+
+def get_tile_hashes(dsm, tiles) -> List[str]:
+    """
+    :param dsm: opened DSM (rasterio dataset)
+    :param tiles: tiles of the DSM
+    :return: hash of the pixel values of each tile core
+    """
+    return [hashlib.sha256(dsm.read(window=tile.core).tobytes()).hexdigest() for tile in tiles]
+
+
+def read_manifest(output_dir: str) -> Optional[dict]:
+    """
+    :return: the manifest of the previous run, None if there is none
+    """
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def write_manifest(output_dir: str, manifest: dict):
+    """
+    Write the manifest of a run (the previous one is replaced atomically).
+    """
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(path + ".tmp", path)
+
+
+def break_hard_link(path: str):
+    """
+    Replace a hard linked file (e.g. shared with the result cache) by a private copy
+    before modifying it in place.
+    """
+    if os.stat(path).st_nlink > 1:
+        tmp_path = path + ".tmp"
+        shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def rebuild_overviews(path: str):
+    """
+    Rebuild the overviews of a patched raster (e.g. a COG), if it has some.
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.enums import Resampling
+
+    with rasterio.open(path, "r+") as dst:
+        factors = dst.overviews(1)
+        if factors:
+            dst.build_overviews(factors, Resampling.average)
+
+
+def get_dirty_tiles(manifest: Optional[dict], new_manifest: dict, output_dir: str) -> Optional[list]:
+    """
+    Compare the manifests of the previous and of the new run.
+
+    :return: the indexes of the modified tiles, None if the whole DTM has to be computed
+    """
+    if manifest is None or not os.path.isfile(os.path.join(output_dir, "dtm.tif")):
+        return None
+    for key in ("version", "grid", "params_key", "tile_size", "margin"):
+        if manifest.get(key) != new_manifest[key]:
+            return None
+    return [index for index, (old_hash, new_hash)
+            in enumerate(zip(manifest["tiles"], new_manifest["tiles"])) if old_hash != new_hash]
+
+
+def run_incremental_dsm_to_dtm(params: dict, run_function: Callable, tile_size: int,
+                               margin: Optional[int], params_key: str, feedback,
+                               work_dir: Optional[str] = None) -> str:
+    """
+    Update the DTM of the output directory: only the modified tiles of the DSM are
+    recomputed. The whole DTM is computed (in tiled mode) by the first run, or when the
+    DSM grid, the parameters or the tiling changed.
+
+    :param params: Bulldozer parameters (dsm_path and output_dir are required)
+    :param run_function: function running Bulldozer, called as run_function(feedback, **params),
+                         returning False if the run was canceled
+    :param tile_size: side of the tiles (pixels)
+    :param margin: overlap between tiles (pixels), computed from max_object_size if None
+    :param params_key: hash of the parameters changing the result (except the DSM)
+    :param feedback: QGIS processing feedback
+    :param work_dir: directory of the tiles (scratch), the output directory if None
+    :return: the path of the DTM
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.windows import Window
+
+    dsm_path = params["dsm_path"]
+    output_dir = params["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+
+    feedback.pushInfo("Incremental mode: comparing the DSM with the previous run")
+    with rasterio.open(dsm_path) as dsm:
+        if margin is None:
+            margin = get_auto_margin(params.get("max_object_size"), dsm.res[0])
+        tiles = compute_tiles(dsm.width, dsm.height, tile_size, margin)
+        new_manifest = {"version": MANIFEST_VERSION,
+                        "grid": get_grid(dsm),
+                        "params_key": params_key,
+                        "tile_size": tile_size,
+                        "margin": margin,
+                        "tiles": get_tile_hashes(dsm, tiles)}
+        width, height = dsm.width, dsm.height
+    feedback.setProgress(10)
+
+    dirty_tiles = get_dirty_tiles(read_manifest(output_dir), new_manifest, output_dir)
+    if dirty_tiles is None:
+        feedback.pushInfo("No compatible previous run: computing the whole DTM")
+        dtm_path = run_tiled_dsm_to_dtm(params, run_function, tile_size, margin,
+                                        ScaledFeedback(feedback, 10, 100), work_dir)
+        if not feedback.isCanceled():
+            write_manifest(output_dir, new_manifest)
+        return dtm_path
+
+    feedback.pushInfo(f"{len(dirty_tiles)} modified tile(s) out of {len(tiles)}")
+    if not dirty_tiles:
+        write_manifest(output_dir, new_manifest)
+        return os.path.join(output_dir, "dtm.tif")
+
+    # The manifest is removed while the products are patched: an interrupted update
+    # is followed by a full run
+    os.remove(os.path.join(output_dir, MANIFEST_FILE))
+    products = {}
+    for product in TILED_PRODUCTS:
+        path = os.path.join(output_dir, product)
+        if os.path.isfile(path):
+            break_hard_link(path)
+            products[product] = rasterio.open(path, "r+")
+
+    tiles_dir = os.path.join(work_dir or output_dir, "tiles")
+    try:
+        for count, index in enumerate(dirty_tiles):
+            if feedback.isCanceled():
+                return os.path.join(output_dir, "dtm.tif")
+
+            # The patch covers the tile and the area where the DTM may have changed,
+            # Bulldozer sees a margin of context around the patch
+            patch = pad_window(tiles[index].core, margin, width, height)
+            read = pad_window(patch, margin, width, height)
+            patch_in_read = Window(patch.col_off - read.col_off, patch.row_off - read.row_off,
+                                   patch.width, patch.height)
+
+            tile_dir = os.path.join(tiles_dir, f"tile_{index:04d}")
+            os.makedirs(tile_dir, exist_ok=True)
+            tile_params = write_window_inputs(params, read, tile_dir)
+            completed = run_function(ScaledFeedback(feedback,
+                                                    10 + 90 * count / len(dirty_tiles),
+                                                    10 + 90 * (count + 1) / len(dirty_tiles)),
+                                     **tile_params)
+            # A canceled tile is not patched and no manifest is written: full run next time
+            if completed is False or feedback.isCanceled():
+                return os.path.join(output_dir, "dtm.tif")
+            if not os.path.isfile(os.path.join(tile_dir, "dtm.tif")):
+                raise RuntimeError(f"Bulldozer did not write the DTM of tile {index}")
+
+            for product, dst in products.items():
+                tile_product = os.path.join(tile_dir, product)
+                if os.path.isfile(tile_product):
+                    with rasterio.open(tile_product) as src:
+                        dst.write(src.read(window=patch_in_read), window=patch)
+
+            if not params.get("developer_mode"):
+                shutil.rmtree(tile_dir, ignore_errors=True)
+    finally:
+        for dst in products.values():
+            dst.close()
+        if not params.get("developer_mode"):
+            shutil.rmtree(tiles_dir, ignore_errors=True)
+
+    for product in products:
+        rebuild_overviews(os.path.join(output_dir, product))
+    write_manifest(output_dir, new_manifest)
+    return os.path.join(output_dir, "dtm.tif")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+import queue
+import subprocess
+import sys
+import threading
+
+from qgis.core import (QgsProcessingException,
+                       QgsProcessingOutputFolder,
+                       QgsProcessingParameterString)
+
+from .BulldozerDtmProvider_algorithm import BulldozerDtmProviderAlgorithm
+from .BulldozerDtmProvider_Engine import get_popen_args, kill_worker, read_lines, POLLING_DELAY
+from .BulldozerDtmProvider_Metrics import record_run_metrics
+from .BulldozerDtmProvider_Worker import get_python_executable
+from .import_bulldozer import (get_install_command,
+                               get_venv_folder,
+                               is_bulldozer_installed,
+                               BULLDOZER_REQUIREMENT)
+
+
+class BulldozerDtmProviderInstallAlgorithm(BulldozerDtmProviderAlgorithm):
+    """
+    Processing algorithm that installs Bulldozer in the plugin folder, with pip.
+
+    It runs as a background processing task, the pip log is streamed to the feedback.
+    """
+
+    OUTPUT = 'OUTPUT'
+    PACKAGE = 'PACKAGE'
+
+    def initAlgorithm(self, config):
+        """
+        Define the inputs, output and properties of the algorithm
+        """
+        self.addParameter(QgsProcessingParameterString(self.PACKAGE,
+                                                       self.tr('Package to install (pip '
+                                                               'requirement, e.g. '
+                                                               'bulldozer-dtm==1.3.1)'),
+                                                       defaultValue=BULLDOZER_REQUIREMENT))
+
+        self.addOutput(QgsProcessingOutputFolder(self.OUTPUT, self.tr('Installation folder')))
+
+    @staticmethod
+    def get_pip_progress(line, progress):
+        """
+        Estimate the installation progress from a line of the pip log.
+
+        :param line: line of the pip log
+        :param progress: current progress (%)
+        :return: the new progress (%)
+        """
+        if line.startswith("Collecting"):
+            return min(progress + 5, 70)
+        if line.startswith("Installing collected packages"):
+            return 80
+        if line.startswith("Successfully installed"):
+            return 100
+        return progress
+
+    @record_run_metrics
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Run pip in a subprocess
+        """
+        package = self.parameterAsString(parameters, self.PACKAGE, context) or BULLDOZER_REQUIREMENT
+        command = get_install_command(get_python_executable(), package)
+        feedback.pushCommandInfo(" ".join(command))
+
+        process = subprocess.Popen(command, text=True, bufsize=1,
+                                   stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT,
+                                   **get_popen_args())
+        lines = queue.Queue()
+        reader = threading.Thread(target=read_lines, args=(process.stdout, lines.put), daemon=True)
+        reader.start()
+
+        progress = 0
+        try:
+            while reader.is_alive() or not lines.empty():
+                if feedback.isCanceled():
+                    feedback.pushInfo("Canceled: stopping pip")
+                    kill_worker(process)
+                    return {}
+                try:
+                    line = lines.get(timeout=POLLING_DELAY).rstrip()
+                except queue.Empty:
+                    continue
+                feedback.pushConsoleInfo(line)
+                progress = self.get_pip_progress(line, progress)
+                feedback.setProgress(progress)
+            process.wait()
+        finally:
+            kill_worker(process)
+            reader.join()
+
+        if process.returncode != 0:
+            raise QgsProcessingException(f"pip exited with code {process.returncode}")
+
+        if not is_bulldozer_installed():
+            raise QgsProcessingException(f"Bulldozer not found in {get_venv_folder()} "
+                                         "after the installation")
+        feedback.pushInfo(f"Bulldozer installed in {get_venv_folder()}")
+        if "bulldozer" in sys.modules:
+            feedback.pushInfo("Bulldozer is already loaded in QGIS: restart QGIS to use the "
+                              "new version when Bulldozer does not run in a separate process")
+
+        self.OUTPUT = get_venv_folder()
+        return {self.OUTPUT: get_venv_folder()}
+
+    def postProcessAlgorithm(self, context, feedback):
+        """
+        Nothing to add to the map
+        """
+        return {self.OUTPUT: self.OUTPUT}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm.
+        """
+        return 'Install Bulldozer'
+
+    def shortHelpString(self):
+        """
+        Returns the algorithm help
+        """
+        return self.tr("Installs (or upgrades) the bulldozer-dtm Python package in the plugin "
+                       "folder, with pip. Needed only if Bulldozer is not available in the QGIS "
+                       "Python environment.")
+
+    def createInstance(self):
+        """
+        Create a new instance of the algorithm.
+        """
+        return BulldozerDtmProviderInstallAlgorithm()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Bulldozer jobs read from config files.
+
+A config file is parsed once into a job: its parameters are typed and validated
+(unknown or misspelled keys, types, bounds, choices, missing input files) before any
+raster is opened, and all the errors of a file are reported at once. The job is then
+used for the execution, the output paths and the result cache key. The jobs are kept
+per file version (path, modification time and size): the job validated before the run
+is reused by the run.
+"""
+
+import difflib
+import functools
+import os
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple
+
+from .BulldozerDtmProvider_Params import (BulldozerParameterException,
+                                          check_bounds,
+                                          get_params_registry)
+
+CONFIG_EXTENSIONS = (".yaml", ".yml")
+REQUIRED_PARAMS = ("dsm_path", "output_dir")
+# Keys of the config files which are not Bulldozer parameters (ignored by Bulldozer)
+IGNORED_KEYS = ("config_file",)
+# Number of config file versions whose job is kept
+JOB_CACHE_SIZE = 32
+
+
+class BulldozerJob(NamedTuple):
+    """ Bulldozer run read from a config file, with validated parameters
+    """
+    config_path: str
+    params: Mapping[str, Any]
+
+    @property
+    def output_dir(self) -> str:
+        """ Output directory of the run """
+        return self.params["output_dir"]
+
+    @property
+    def dtm_path(self) -> str:
+        """ Path of the DTM produced by the run """
+        return os.path.join(self.output_dir, "dtm.tif")
+
+
+def read_config_file(config_path: str) -> dict:
+    """
+    Parse a Bulldozer config file (YAML).
+
+    :param config_path: path of the config file
+    :return: the content of the file
+    """
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    if not config_path.lower().endswith(CONFIG_EXTENSIONS):
+        raise BulldozerParameterException(f"Config file {config_path} should be a YAML file "
+                                          f"({', '.join(CONFIG_EXTENSIONS)})")
+    try:
+        with open(config_path, encoding="utf8") as f:
+            # The C parser (libyaml) is much faster when it is available
+            content = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    except OSError as e:
+        raise BulldozerParameterException(f"Cannot read config file {config_path}: "
+                                          f"{e.strerror}") from e
+    except yaml.YAMLError as e:
+        raise BulldozerParameterException(f"Invalid YAML in config file {config_path}: "
+                                          f"{e}") from e
+    if not isinstance(content, dict):
+        raise BulldozerParameterException(f"Config file {config_path} should contain "
+                                          f"'parameter: value' lines")
+    return content
+
+
+def convert_value(param_obj, value):
+    """
+    Convert a value read from a config file to the type of its parameter.
+
+    :raise BulldozerParameterException: if the value does not have the right type
+    """
+    if param_obj.param_type == bool:
+        if not isinstance(value, bool):
+            raise BulldozerParameterException(f"Parameter {param_obj.name} should be a boolean "
+                                              f"(true or false)")
+        return value
+    if param_obj.param_type == int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise BulldozerParameterException(f"Parameter {param_obj.name} should be an integer")
+        return value
+    if param_obj.param_type == float:
+        # YAML reads numbers like 1e-3 (without a dot) as strings
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            return float(value)
+        except (TypeError, ValueError) as e:
+            raise BulldozerParameterException(f"Parameter {param_obj.name} "
+                                              f"should be a float") from e
+    if not isinstance(value, str):
+        raise BulldozerParameterException(f"Parameter {param_obj.name} should be a string")
+    if param_obj.choices and value not in param_obj.choices:
+        raise BulldozerParameterException(f"Parameter {param_obj.name} should be one of "
+                                          f"{', '.join(param_obj.choices)}")
+    return value
+
+
+def get_params_errors(content: dict):
+    """
+    Validate the content of a config file, without reading any raster.
+
+    :param content: content of the config file
+    :return: (the typed parameters, the list of all the errors)
+    """
+    registry = get_params_registry()
+    params, errors = {}, []
+
+    for key in REQUIRED_PARAMS:
+        if content.get(key) is None:
+            errors.append(f"Missing parameter {key}")
+
+    for key, value in content.items():
+        key = str(key)
+        if key in IGNORED_KEYS:
+            continue
+        if key not in registry:
+            matches = difflib.get_close_matches(key, registry, n=1)
+            errors.append(f"Unknown parameter {key}"
+                          + (f" (did you mean {matches[0]}?)" if matches else ""))
+            continue
+        if value is None:
+            continue
+        try:
+            value = convert_value(registry[key], value)
+            check_bounds(registry[key], value)
+        except BulldozerParameterException as e:
+            errors.append(str(e))
+            continue
+        # Bulldozer creates the output directory, the inputs must exist
+        if key.endswith("_path") and not os.path.isfile(value):
+            errors.append(f"Parameter {key}: file {value} does not exist")
+        params[key] = value
+
+    return params, errors
+
+
+def load_job(config_path: str) -> BulldozerJob:
+    """
+    Parse and validate a Bulldozer config file.
+
+    :param config_path: path of the config file
+    :return: the job
+    :raise BulldozerParameterException: with all the errors of the config file
+    """
+    params, errors = get_params_errors(read_config_file(config_path))
+    if errors:
+        raise BulldozerParameterException(f"Invalid config file {config_path}:\n- "
+                                          + "\n- ".join(errors))
+    return BulldozerJob(config_path, MappingProxyType(params))
+
+
+@functools.lru_cache(maxsize=JOB_CACHE_SIZE)
+def load_job_version(config_path: str, mtime_ns: int, size: int) -> BulldozerJob:
+    """
+    Parse and validate a version of a config file, once (the invalid files are parsed again).
+
+    :param config_path: real path of the config file
+    :param mtime_ns: modification time of the file (nanoseconds), part of the cache key
+    :param size: size of the file (bytes), part of the cache key
+    :return: the job
+    """
+    # pylint: disable=unused-argument
+    return load_job(config_path)
+
+
+def get_job(config_path: str) -> BulldozerJob:
+    """
+    Get the job of a config file, parsed and validated once per version of the file.
+
+    :param config_path: path of the config file
+    :return: the job
+    :raise BulldozerParameterException: with all the errors of the config file
+    """
+    try:
+        stat = os.stat(config_path)
+    except OSError:
+        return load_job(config_path)
+    job = load_job_version(os.path.realpath(config_path), stat.st_mtime_ns, stat.st_size)
+    return job._replace(config_path=config_path)
+
+
+def validate_config_files(config_paths: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Validate many Bulldozer config files.
+
+    :param config_paths: paths of the config files
+    :return: the errors of each config file (empty list if it is valid)
+    """
+    results = {}
+    for config_path in config_paths:
+        try:
+            results[config_path] = get_params_errors(read_config_file(config_path))[1]
+        except BulldozerParameterException as e:
+            results[config_path] = [str(e)]
+    return results
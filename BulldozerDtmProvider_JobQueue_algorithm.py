@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+from qgis.core import (QgsProcessingException,
+                       QgsProcessingOutputNumber,
+                       QgsProcessingParameterEnum,
+                       QgsProcessingParameterNumber,
+                       QgsProcessingParameterString)
+
+from .BulldozerDtmProvider_algorithm import BulldozerDtmProviderAlgorithm
+from .BulldozerDtmProvider_Metrics import record_run_metrics
+from .BulldozerDtmProvider_Queue import (format_job_table,
+                                         get_job_queue,
+                                         parse_job_ids,
+                                         JOB_STATUSES)
+
+
+class BulldozerDtmProviderJobQueueAlgorithm(BulldozerDtmProviderAlgorithm):
+    """
+    Processing algorithm that lists and manages the jobs of the job queue.
+    """
+
+    ACTION = 'ACTION'
+    JOB_IDS = 'JOB_IDS'
+    PRIORITY = 'PRIORITY'
+
+    ACTIONS = ('List the jobs',
+               'Cancel queued jobs',
+               'Queue failed or canceled jobs again',
+               'Change the priority of queued jobs',
+               'Remove the done and canceled jobs')
+
+    def initAlgorithm(self, config):
+        """
+        Define the inputs, output and properties of the algorithm
+        """
+        self.addParameter(QgsProcessingParameterEnum(self.ACTION,
+                                                     self.tr('Action'),
+                                                     options=[self.tr(action)
+                                                              for action in self.ACTIONS],
+                                                     defaultValue=0))
+
+        self.addParameter(QgsProcessingParameterString(self.JOB_IDS,
+                                                       self.tr('Job identifiers, e.g. 1, 4, 7 '
+                                                               '(empty = all the jobs)'),
+                                                       optional=True))
+
+        self.addParameter(QgsProcessingParameterNumber(self.PRIORITY,
+                                                       self.tr('New priority'),
+                                                       type=QgsProcessingParameterNumber.Integer,
+                                                       defaultValue=0,
+                                                       optional=True))
+
+        for status in JOB_STATUSES:
+            self.addOutput(QgsProcessingOutputNumber(status.upper(),
+                                                     self.tr(f'Number of {status} jobs')))
+
+    @record_run_metrics
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Apply the action to the job queue, then list its jobs
+        """
+        queue = get_job_queue()
+        action = self.parameterAsEnum(parameters, self.ACTION, context)
+        try:
+            job_ids = parse_job_ids(self.parameterAsString(parameters, self.JOB_IDS, context))
+        except ValueError as e:
+            raise QgsProcessingException(str(e)) from e
+
+        if action == 1:
+            feedback.pushInfo(f"{queue.cancel(job_ids)} job(s) canceled")
+        elif action == 2:
+            feedback.pushInfo(f"{queue.retry(job_ids)} job(s) queued again")
+        elif action == 3:
+            if job_ids is None:
+                raise QgsProcessingException(self.tr('Give the identifiers of the jobs'))
+            priority = self.parameterAsInt(parameters, self.PRIORITY, context)
+            feedback.pushInfo(f"{queue.set_priority(job_ids, priority)} job(s) with the "
+                              f"priority {priority}")
+        elif action == 4:
+            feedback.pushInfo(f"{queue.purge()} job(s) removed")
+
+        feedback.pushInfo(f"Job queue {queue.db_path}:\n{format_job_table(queue.get_jobs())}")
+        return {status.upper(): count for status, count in queue.count_jobs().items()}
+
+    def postProcessAlgorithm(self, context, feedback):
+        """
+        Nothing is added to the map
+        """
+        return {}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm.
+        """
+        return 'Bulldozer (Job queue)'
+
+    def createInstance(self):
+        """
+        Create a new instance of the algorithm.
+        """
+        return BulldozerDtmProviderJobQueueAlgorithm()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Metrics of the algorithm runs, for the monitoring of the headless runs (e.g. qgis_process
+on a render farm).
+
+Each run of an algorithm writes one record: input pixels, throughput, duration of the
+Bulldozer stages, peak resident memory, result cache hits and misses, number of workers
+and exit status. The records are appended to a JSON lines file and/or summed in a
+Prometheus textfile collector file (counters, and gauges of the last run).
+
+This module must not import QGIS at the module level: the records are plain dicts.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import re
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .BulldozerDtmProviderSettings import BulldozerDtmProviderSettings
+from .BulldozerDtmProvider_Progress import get_rss
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: the writers are not serialized
+    fcntl = None
+
+# Prefix of the Prometheus metrics
+METRICS_PREFIX = "bulldozer"
+# Maximum length of the error message of a record
+MAX_ERROR_LENGTH = 500
+# Prometheus counters: name, help, function giving the increment from a record
+PROMETHEUS_COUNTERS = (
+    ("runs_total", "Number of algorithm runs.", lambda record: 1),
+    ("input_pixels_total", "Number of input DSM pixels.", lambda record: record["input_pixels"]),
+    ("run_seconds_total", "Duration of the algorithm runs.", lambda record: record["duration"]),
+    ("cache_hits_total", "Number of results restored from the result cache.",
+     lambda record: record["cache_hits"]),
+    ("cache_misses_total", "Number of results missing from the result cache.",
+     lambda record: record["cache_misses"]),
+)
+# Prometheus gauges of the last run: name, help, record field
+PROMETHEUS_GAUGES = (
+    ("last_run_timestamp_seconds", "End of the last run (Unix time).", "end"),
+    ("last_run_duration_seconds", "Duration of the last run.", "duration"),
+    ("last_run_input_pixels", "Number of input DSM pixels of the last run.", "input_pixels"),
+    ("last_run_pixels_per_second", "Throughput of the last run.", "pixels_per_second"),
+    ("last_run_peak_rss_bytes", "Peak resident memory of the last run.", "peak_rss"),
+    ("last_run_workers", "Number of workers of the last run.", "workers"),
+)
+# Prometheus gauge of the duration of the stages of the last run
+PROMETHEUS_STAGE_GAUGE = ("last_run_stage_seconds", "Duration of the Bulldozer stages of "
+                                                    "the last run.")
+PROMETHEUS_SAMPLE = re.compile(r"^(\w+)(\{.*\})? (\S+)$")
+
+# Run of the current thread (algorithms run in QGIS task threads)
+_current = threading.local()
+
+
+class RunMetrics:
+    """
+    Metrics of an algorithm run, filled while it runs.
+    """
+
+    def __init__(self, algorithm: str):
+        """
+        :param algorithm: name of the algorithm
+        """
+        self.algorithm = algorithm
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self.dsm_paths = []
+        self.input_pixels = 0
+        self.stages = {}
+        self.peak_rss = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.workers = None
+
+    def add_input(self, dsm_path: str):
+        """
+        Count the pixels of an input DSM (not counted if it cannot be read: the run reports
+        the error).
+        """
+        import rasterio  # pylint: disable=import-outside-toplevel
+
+        self.dsm_paths.append(dsm_path)
+        try:
+            with rasterio.open(dsm_path) as dsm:
+                self.input_pixels += dsm.width * dsm.height
+        except (OSError, rasterio.errors.RasterioError):
+            pass
+
+    def add_stages(self, stages: List[dict]):
+        """
+        Add the stage measures of a Bulldozer run (see StageMonitor): the stages of the
+        tiles and levels of a run are summed.
+        """
+        for stage in stages:
+            total = self.stages.setdefault(stage["name"], {"wall": 0.0, "cpu": 0.0})
+            total["wall"] += stage["wall"]
+            total["cpu"] += stage["cpu"]
+            self.peak_rss = max(self.peak_rss, stage["peak_rss"])
+
+    def get_record(self, status: str, error: Optional[str] = None) -> dict:
+        """
+        :param status: exit status of the run: "success", "canceled" or "failed"
+        :param error: error message of a failed run
+        :return: the record of the run
+        """
+        duration = time.perf_counter() - self._start
+        return {"algorithm": self.algorithm,
+                "status": status,
+                "error": error[:MAX_ERROR_LENGTH] if error else None,
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "start": self.start,
+                "end": self.start + duration,
+                "duration": duration,
+                "dsm_paths": self.dsm_paths,
+                "input_pixels": self.input_pixels,
+                "pixels_per_second": self.input_pixels / duration if duration > 0 else None,
+                "stages": self.stages,
+                "peak_rss": max(self.peak_rss, get_rss()),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "workers": self.workers}
+
+
+def get_current_run() -> Optional[RunMetrics]:
+    """
+    :return: the run of the current thread, None outside of an algorithm run
+    """
+    return getattr(_current, "run", None)
+
+
+def record_input(dsm_path: str):
+    """
+    Record an input DSM of the current run.
+    """
+    run = get_current_run()
+    if run is not None:
+        run.add_input(dsm_path)
+
+
+def record_cache(hit: bool):
+    """
+    Record a hit or a miss of the result cache in the current run.
+    """
+    run = get_current_run()
+    if run is not None:
+        if hit:
+            run.cache_hits += 1
+        else:
+            run.cache_misses += 1
+
+
+def record_workers(workers: Optional[int]):
+    """
+    Record the number of workers of the current run (None = all the cores).
+    """
+    run = get_current_run()
+    if run is not None:
+        run.workers = workers or os.cpu_count()
+
+
+def record_stages(stages: List[dict]):
+    """
+    Record the stage measures of a Bulldozer run in the current run.
+    """
+    run = get_current_run()
+    if run is not None:
+        run.add_stages(stages)
+
+
+@contextlib.contextmanager
+def locked(path: str):
+    """
+    Serialize the writers of a file, through a lock file next to it (POSIX only).
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a", encoding="utf-8") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def append_record(path: str, record: dict):
+    """
+    Append a record to a JSON lines file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with locked(path), open(path, "a", encoding="utf8") as records:
+        records.write(json.dumps(record, default=str) + "\n")
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """
+    :return: the labels of a Prometheus sample, e.g. {algorithm="advanced"}
+    """
+    escaped = {name: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for name, value in labels.items()}
+    return "{" + ",".join(f'{name}="{value}"' for name, value in sorted(escaped.items())) + "}"
+
+
+def read_prometheus(path: str) -> Dict[Tuple[str, str], float]:
+    """
+    Read the samples of a Prometheus textfile written by update_prometheus.
+
+    :return: the values, by (metric name, labels)
+    """
+    samples = {}
+    if not os.path.isfile(path):
+        return samples
+    with open(path, encoding="utf8") as textfile:
+        for line in textfile:
+            match = PROMETHEUS_SAMPLE.match(line.strip())
+            if match and not line.startswith("#"):
+                samples[(match.group(1), match.group(2) or "")] = float(match.group(3))
+    return samples
+
+
+def update_prometheus(path: str, record: dict):
+    """
+    Add a record to a Prometheus textfile collector file: the counters are incremented,
+    the gauges of the last run of the algorithm are replaced. The file is replaced
+    atomically, the collector never reads a partial file.
+    """
+    prefix = f"{METRICS_PREFIX}_"
+    algorithm = {"algorithm": record["algorithm"]}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with locked(path):
+        samples = read_prometheus(path)
+        for name, _, increment in PROMETHEUS_COUNTERS:
+            labels = dict(algorithm, status=record["status"]) if name == "runs_total" \
+                else algorithm
+            key = (prefix + name, format_labels(labels))
+            samples[key] = samples.get(key, 0) + (increment(record) or 0)
+        for name, _, field in PROMETHEUS_GAUGES:
+            if record[field] is not None:
+                samples[(prefix + name, format_labels(algorithm))] = record[field]
+        # The stages of the previous run are replaced by the stages of this run
+        stage_gauge = prefix + PROMETHEUS_STAGE_GAUGE[0]
+        stage_labels = format_labels(algorithm)[:-1] + ","
+        for key in [key for key in samples
+                    if key[0] == stage_gauge and key[1].startswith(stage_labels)]:
+            del samples[key]
+        for stage, measures in record["stages"].items():
+            samples[(stage_gauge, format_labels(dict(algorithm, stage=stage)))] = measures["wall"]
+
+        metrics = [(name, help_text, "counter") for name, help_text, _ in PROMETHEUS_COUNTERS]
+        metrics += [(name, help_text, "gauge") for name, help_text, _ in PROMETHEUS_GAUGES]
+        metrics.append(PROMETHEUS_STAGE_GAUGE + ("gauge",))
+        lines = []
+        for name, help_text, metric_type in metrics:
+            lines += [f"# HELP {prefix}{name} {help_text}", f"# TYPE {prefix}{name} {metric_type}"]
+            lines += [f"{metric}{labels} {float(value)!r}"
+                      for (metric, labels), value in sorted(samples.items())
+                      if metric == prefix + name]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as textfile:
+            textfile.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+def get_setting_path(name: str) -> Optional[str]:
+    """
+    :return: the path given by a provider setting, or else by the environment variable
+             of the same name (e.g. BULLDOZER_METRICS_FILE for qgis_process), None if unset
+    """
+    # pylint: disable=import-outside-toplevel
+    from processing.core.ProcessingConfig import ProcessingConfig
+
+    return ProcessingConfig.getSetting(name) or os.environ.get(name) or None
+
+
+def write_record(record: dict, feedback):
+    """
+    Write the record of a run in the files configured in the provider settings.
+    A metrics file which cannot be written does not fail the run.
+    """
+    for setting, write_function in ((BulldozerDtmProviderSettings.METRICS_FILE, append_record),
+                                    (BulldozerDtmProviderSettings.PROMETHEUS_FILE,
+                                     update_prometheus)):
+        path = get_setting_path(setting)
+        if path is None:
+            continue
+        try:
+            write_function(path, record)
+        except (OSError, ValueError) as e:
+            feedback.reportError(f"Run metrics not written to {path}: {e}")
+
+
+def record_run_metrics(process_algorithm: Callable) -> Callable:
+    """
+    Decorator of the processAlgorithm methods: the run is measured and its record written
+    when it ends (see write_record), whatever its exit status.
+    """
+    @functools.wraps(process_algorithm)
+    def wrapper(self, parameters, context, feedback):
+        # Nested calls (e.g. a subclass calling its parent) belong to the outer run
+        if get_current_run() is not None:
+            return process_algorithm(self, parameters, context, feedback)
+
+        _current.run = RunMetrics(self.name())
+        status, error = "failed", None
+        try:
+            results = process_algorithm(self, parameters, context, feedback)
+            status = "canceled" if feedback.isCanceled() else "success"
+            return results
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record = _current.run.get_record(status, error)
+            _current.run = None
+            feedback.pushDebugInfo(f"Run metrics: {json.dumps(record, default=str)}")
+            write_record(record, feedback)
+    return wrapper
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+Output formatting of the Bulldozer products.
+
+The products are converted into Cloud Optimized GeoTIFF: internally tiled, compressed
+and with overviews, so that display in QGIS and network reads stay cheap.
+"""
+
+import os
+from typing import List
+
+# Compression methods offered for the COG outputs (GDAL COMPRESS values)
+COG_COMPRESSIONS = ("DEFLATE", "ZSTD", "LERC", "LERC_DEFLATE", "LERC_ZSTD", "NONE")
+DEFAULT_COG_COMPRESSION = "DEFLATE"
+# Internal tile size of the COG outputs (pixels)
+COG_BLOCK_SIZE = 512
+# Bulldozer products converted to COG
+COG_PRODUCTS = ("dtm.tif", "ndsm.tif")
+
+
+def get_cog_options(compression: str = DEFAULT_COG_COMPRESSION, predictor: bool = True,
+                    overviews: bool = True, max_z_error: float = 0) -> dict:
+    """
+    Build the creation options of the GDAL COG driver.
+
+    :param compression: compression method (see COG_COMPRESSIONS)
+    :param predictor: use a predictor (DEFLATE and ZSTD)
+    :param overviews: build the overviews
+    :param max_z_error: maximum error of the LERC compressions (0 = lossless)
+    :return: the creation options
+    """
+    options = {"COMPRESS": compression,
+               "BLOCKSIZE": COG_BLOCK_SIZE,
+               "OVERVIEWS": "AUTO" if overviews else "NONE",
+               "BIGTIFF": "IF_SAFER",
+               "NUM_THREADS": "ALL_CPUS"}
+    if predictor and compression in ("DEFLATE", "ZSTD"):
+        # Floating point predictor for float rasters, horizontal differencing otherwise
+        options["PREDICTOR"] = "YES"
+    if compression.startswith("LERC"):
+        options["MAX_Z_ERROR"] = max_z_error
+    return options
+
+
+def convert_to_cog(path: str, **cog_options) -> str:
+    """
+    Convert a raster into a Cloud Optimized GeoTIFF, in place.
+
+    The COG is written next to the raster then moved over it: the original file
+    (which may be hard linked in the result cache) is never modified.
+
+    :param path: path of the raster
+    :param cog_options: see get_cog_options
+    :return: the path of the COG
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    import rasterio.shutil
+
+    tmp_path = os.path.join(os.path.dirname(path), f".cog_{os.path.basename(path)}")
+    try:
+        with rasterio.Env(GDAL_CACHEMAX=512):
+            rasterio.shutil.copy(path, tmp_path, driver="COG", **get_cog_options(**cog_options))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def convert_products_to_cog(output_dir: str, feedback, **cog_options) -> List[str]:
+    """
+    Convert the Bulldozer products of an output directory into Cloud Optimized GeoTIFF.
+
+    :param output_dir: Bulldozer output directory
+    :param feedback: QGIS processing feedback
+    :param cog_options: see get_cog_options
+    :return: the paths of the converted products
+    """
+    paths = [os.path.join(output_dir, product) for product in COG_PRODUCTS
+             if os.path.isfile(os.path.join(output_dir, product))]
+    for path in paths:
+        if feedback.isCanceled():
+            break
+        feedback.pushInfo(f"Writing {os.path.basename(path)} as a Cloud Optimized GeoTIFF")
+        convert_to_cog(path, **cog_options)
+    return paths
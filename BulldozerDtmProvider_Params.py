@@ -20,11 +20,19 @@
 # more details.
 
 
+import functools
 import os
+from types import MappingProxyType
+from typing import Any, Mapping, NamedTuple, Optional, Tuple
 
-from itertools import chain
+from .BulldozerDtmProvider_ParamsCatalogue import bulldozer_pipeline_params
 
-from bulldozer.pipeline.bulldozer_parameters import bulldozer_pipeline_params
+# Bounds of the numeric parameters (inclusive, None = unbounded), 0 is the default minimum
+PARAM_BOUNDS = {
+    "nb_max_workers": (1, None),
+    "num_outer_iter": (1, None),
+    "num_inner_iter": (1, None),
+}
 
 
 class BulldozerParameterException(Exception):
@@ -32,29 +40,66 @@ class BulldozerParameterException(Exception):
     """
 
 
-def get_combined_list_params():
-    """ Combine all the parameters from the different algorithms
+class BulldozerParamSpec(NamedTuple):
+    """ Immutable description of a Bulldozer parameter
     """
-    params = []
-
-    for ll in bulldozer_pipeline_params.values():
-        params.extend(ll)
+    name: str
+    group: str
+    label: str
+    description: str
+    param_type: type
+    default_value: Any
+    choices: Optional[Tuple[Any, ...]]
+    min_value: Optional[float]
+    max_value: Optional[float]
+
+
+@functools.lru_cache(maxsize=None)
+def get_params_registry() -> Mapping[str, BulldozerParamSpec]:
+    """ Registry of the Bulldozer parameters, by name, built once per process
+    """
+    registry = {}
+    for group, params in bulldozer_pipeline_params.items():
+        for param in params:
+            min_value, max_value = None, None
+            if param.param_type in (int, float):
+                min_value, max_value = PARAM_BOUNDS.get(param.name, (0, None))
+            registry[param.name] = BulldozerParamSpec(
+                name=param.name,
+                group=group,
+                label=param.label,
+                description=param.description,
+                param_type=param.param_type,
+                default_value=param.default_value,
+                choices=tuple(param.choices) if param.choices else None,
+                min_value=min_value,
+                max_value=max_value)
+
+    return MappingProxyType(registry)
 
-    return params
 
+def get_combined_list_params():
+    """ Combine all the parameters from the different algorithms
+    """
+    return tuple(get_params_registry().values())
 
 
 def get_combined_list_params_for_advanced_app():
     """ Combine all the parameters from the different algorithms
     """
-    params = list(chain(*bulldozer_pipeline_params.values()))
-
-    return params
+    return get_combined_list_params()
 
 
-def get_from_params_base(param_name, list_param_objects):
-    """ Get the value of a parameter from the parameters dictionary
+def get_from_params_base(param_name, list_param_objects=None):
+    """ Get the description of a parameter, from the registry or from a list of parameters
     """
+    if list_param_objects is None:
+        try:
+            return get_params_registry()[param_name]
+        except KeyError as e:
+            message = f"Parameter not found in the parameters dictionary:{param_name}"
+            raise BulldozerParameterException(message) from e
+
     res_temp = [param for param in list_param_objects if param.name == param_name]
     if len(res_temp) == 1:
         return res_temp[0]
@@ -65,24 +110,36 @@ def get_from_params_base(param_name, list_param_objects):
     raise BulldozerParameterException("Multiple parameters found in the parameters dictionary")
 
 
+def check_bounds(param_obj, value):
+    """ Check that a numeric value is within the bounds of its parameter
+    """
+    if value is None or param_obj.param_type not in (int, float):
+        return
+    if param_obj.min_value is not None and float(value) < param_obj.min_value:
+        raise BulldozerParameterException(f"Parameter {param_obj.name} should be greater "
+                                          f"than or equal to {param_obj.min_value}")
+    if param_obj.max_value is not None and float(value) > param_obj.max_value:
+        raise BulldozerParameterException(f"Parameter {param_obj.name} should be lower "
+                                          f"than or equal to {param_obj.max_value}")
 
 def check_params(*args, **kwargs):
     """ Check given parameters
     """
-    params_baseline = get_combined_list_params()
-
     # pour chaque parametre de la fonction, récuprérer le paramètre correspondant
-    # avec get_from_params_base
+    # dans le registre
     for key, value in kwargs.items():
         if key == "config_file":
             if not isinstance(value, str):
                 raise BulldozerParameterException(f"Parameter {key} should be a string")
             continue
-        param_obj = get_from_params_base(key, params_baseline)
+        param_obj = get_from_params_base(key)
 
         if param_obj.param_type == str:
             if not isinstance(value, str):
                 raise BulldozerParameterException(f"Parameter {key} should be a string")
+            if param_obj.choices and value not in param_obj.choices:
+                raise BulldozerParameterException(f"Parameter {key} should be one of "
+                                                  f"{', '.join(param_obj.choices)}")
         elif param_obj.param_type == int:
             if value == param_obj.default_value:
                 continue
@@ -105,6 +162,8 @@ def check_params(*args, **kwargs):
         else:
             raise BulldozerParameterException(f"Parameter {key} has an unknown type")
 
+        check_bounds(param_obj, value)
+
         if key == "output_dir":
             if "processing_" in value:
                 continue
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Catalogue of the Bulldozer pipeline parameters.
+
+Copy of bulldozer.pipeline.bulldozer_parameters (Bulldozer 1.3.1): the algorithms
+are registered when QGIS starts, and importing Bulldozer at that time would load
+numpy, rasterio and the whole pipeline. Before the first run, the copy is compared
+with the parameters of the installed Bulldozer (see import_bulldozer), so that another
+version never runs with stale parameters and bounds.
+"""
+
+import multiprocessing as mp
+from typing import Any, Dict, List, Optional
+
+# Version of Bulldozer the catalogue is copied from
+BULLDOZER_VERSION = "1.3.1"
+
+# Keys of the parameter groups (bulldozer.utils.bulldozer_argparse)
+REQ_PARAM_KEY = "REQUIRED"
+OPT_PARAM_KEY = "OPTIONAL"
+EXPERT_PARAM_KEY = "EXPERT OPTIONAL"
+
+
+class BulldozerParam:
+    """
+    Bulldozer pipeline parameter (same attributes as bulldozer BulldozerParam)
+    """
+
+    def __init__(self, name: str, alias: str, label: str, description: str, param_type: type,
+                 default_value: Any, value_label: Optional[str] = None,
+                 value_choices: Optional[List[Any]] = None):
+        self.name = name
+        self.alias = alias
+        self.label = label
+        self.description = description
+        self.param_type = param_type
+        self.default_value = default_value
+        self.value_label = value_label
+        self.choices = value_choices
+
+    def __repr__(self):
+        return f"BulldozerParam(name={self.name!r}, param_type={self.param_type.__name__}, " \
+               f"default_value={self.default_value!r})"
+
+
+# Bulldozer parameters description and default values, by group
+bulldozer_pipeline_params = {
+    # Required parameters
+    REQ_PARAM_KEY: [
+        BulldozerParam(
+            name="dsm_path",
+            alias="dsm",
+            label="Input DSM",
+            description="Input DSM path.",
+            param_type=str,
+            default_value=None,
+            value_label="<path/dsm.tif>",
+        ),
+        BulldozerParam(
+            name="output_dir",
+            alias="out",
+            label="Output directory",
+            description="Output directory path.",
+            param_type=str,
+            default_value=None,
+            value_label="<path>",
+        ),
+    ],
+    # Options
+    OPT_PARAM_KEY: [
+        BulldozerParam(
+            name="generate_ndsm",
+            alias="ndsm",
+            label="Generate nDSM",
+            description="Generate the Normalized Digital Surface Model (nDSM=DSM-DTM).",
+            param_type=bool,
+            default_value=False,
+        ),
+        BulldozerParam(
+            name="max_object_size",
+            alias="max_size",
+            label="Max object size (m)",
+            description="Foreground max object size (in meter).",
+            param_type=float,
+            default_value=16,
+            value_label="<value>",
+        ),
+        BulldozerParam(
+            name="ground_mask_path",
+            alias="ground",
+            label="Ground mask path",
+            description="Path to the binary ground classification mask.",
+            param_type=str,
+            default_value=None,
+            value_label="<mask.tif>",
+        ),
+        BulldozerParam(
+            name="activate_ground_anchors",
+            alias="anchors",
+            label="Activate ground anchors",
+            description="Activate ground anchor detection (ground pre-detection).",
+            param_type=bool,
+            default_value=False,
+        ),
+        BulldozerParam(
+            name="nb_max_workers",
+            alias="workers",
+            label="Number of workers",
+            description="Max number of CPU core to use.",
+            param_type=int,
+            default_value=None,
+            value_label="<value>",
+        ),
+        BulldozerParam(
+            name="developer_mode",
+            alias="dev",
+            label="Developper mode",
+            description="To keep the intermediate results.",
+            param_type=bool,
+            default_value=False,
+        ),
+    ],
+    # Expert options: these parameters are considered as core settings
+    # must be changed by users who are experts
+    EXPERT_PARAM_KEY: [
+        BulldozerParam(
+            name="reg_filtering_iter",
+            alias="reg_it",
+            label="Number of regular mask filtering iterations",
+            description="Number of regular mask filtering iterations.",
+            param_type=int,
+            default_value=None,
+            value_label="<value>",
+        ),
+        BulldozerParam(
+            name="dsm_z_accuracy",
+            alias="dsm_z",
+            label="DSM altimetric accuracy (m)",
+            description="Altimetric height accuracy of the input DSM (m). "
+            "If null, use the default value: 2*planimetric resolution.",
+            param_type=float,
+            default_value=None,
+            value_label="<value>",
+        ),
+        BulldozerParam(
+            name="max_ground_slope",
+            alias="max_slope",
+            label="Max ground slope (%%)",
+            description="Maximum slope of the observed landscape terrain (%%).",
+            param_type=float,
+            default_value=20.0,
+            value_label="<value>",
+        ),
+        BulldozerParam(
+            name="prevent_unhook_iter",
+            alias="unhook_it",
+            label="Unhook iterations",
+            description="Number of unhook iterations.",
+            param_type=int,
+            default_value=10,
+            value_label="<value>",
+        ),
+        BulldozerParam(
+            name="num_outer_iter",
+            alias="outer",
+            label="Number of outer iterations",
+            description="Number of gravity step iterations.",
+            param_type=int,
+            default_value=25,
+            value_label="<value>",
+        ),
+        BulldozerParam(
+            name="num_inner_iter",
+            alias="inner",
+            label="Number of inner iterations",
+            description="Number of tension iterations.",
+            param_type=int,
+            default_value=5,
+            value_label="<value>",
+        ),
+        BulldozerParam(
+            name="mp_context",
+            alias="context",
+            label="Multiprocessing context",
+            description=f"To use a multiprocessing context among those available : {mp.get_all_start_methods()}. "
+            f"By default uses '{mp.get_start_method()}' (the default of the current OS)",
+            param_type=str,
+            default_value=mp.get_start_method(),
+            value_label="<value>",
+            value_choices=mp.get_all_start_methods(),
+        ),
+        BulldozerParam(
+            name="intermediate_write",
+            alias="inter_write",
+            label="Write intermediate results",
+            description="To write intermediate results instead of keeping all in memory.",
+            param_type=bool,
+            default_value=False,
+        ),
+        BulldozerParam(
+            name="enforce_dtm_below_dsm",
+            alias="below_dsm",
+            label="Ensure that DTM <= DSM",
+            description="Ensure that DTM <= DSm even in noisy areas.",
+            param_type=bool,
+            default_value=False,
+        ),
+    ],
+}
+
+
+def describe_params(params: dict) -> Dict[str, tuple]:
+    """
+    :param params: parameters by group, as bulldozer_pipeline_params
+    :return: (group, type, default value, choices) of the parameters, by name
+    """
+    return {param.name: (group, param.param_type, param.default_value, param.choices)
+            for group, group_params in params.items() for param in group_params}
+
+
+def get_catalogue_mismatch(installed_params: dict) -> List[str]:
+    """
+    Compare the catalogue with the parameters of the installed Bulldozer.
+
+    :param installed_params: bulldozer.pipeline.bulldozer_parameters.bulldozer_pipeline_params
+    :return: the names of the parameters added, removed or changed, empty if they match
+    """
+    catalogue = describe_params(bulldozer_pipeline_params)
+    installed = describe_params(installed_params)
+    return sorted(name for name in catalogue.keys() | installed.keys()
+                  if catalogue.get(name) != installed.get(name))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+Low resolution preview of the Bulldozer DTM, to tune the parameters in seconds.
+
+The DSM is decimated by an integer factor, the parameters given in pixels are rescaled
+to the coarse resolution and Bulldozer is run on the coarse DSM. The parameters given
+in meters (max object size, slope, altimetric accuracy) need no rescaling.
+"""
+
+import os
+import shutil
+from typing import Callable, Optional
+
+from .BulldozerDtmProvider_Params import get_from_params_base
+
+# Work directory of the preview, in the output directory
+PREVIEW_DIR = "preview"
+# Default decimation factor of the preview
+DEFAULT_PREVIEW_FACTOR = 8
+# Bulldozer parameters given as a number of pixels (morphological iterations)
+PIXEL_PARAMS = ("reg_filtering_iter", "prevent_unhook_iter")
+
+
+def decimate_raster(src_path: str, factor: int, dst_path: str):
+    """
+    Decimate a raster by an integer factor, keeping one pixel out of factor in each
+    direction (as the drape cloth pyramid of Bulldozer does).
+
+    :param src_path: path of the full resolution raster
+    :param factor: decimation factor
+    :param dst_path: path of the decimated raster (GeoTIFF)
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.transform import Affine
+
+    with rasterio.open(src_path) as src:
+        width = max(1, src.width // factor)
+        height = max(1, src.height // factor)
+        data = src.read(out_shape=(src.count, height, width), resampling=Resampling.nearest)
+        profile = src.profile.copy()
+        profile.update(driver="GTiff", width=width, height=height,
+                       transform=src.transform * Affine.scale(src.width / width,
+                                                              src.height / height))
+        for key in ("blockxsize", "blockysize", "tiled", "interleave"):
+            profile.pop(key, None)
+    with rasterio.open(dst_path, "w", **profile) as dst:
+        dst.write(data)
+
+
+def rescale_params(params: dict, factor: int, resolution: float) -> dict:
+    """
+    Rescale the Bulldozer parameters to a DSM decimated by factor.
+
+    :param params: Bulldozer parameters of the full resolution run
+    :param factor: decimation factor
+    :param resolution: resolution of the full resolution DSM
+    :return: the parameters of the preview run
+    """
+    preview_params = dict(params)
+    for name in PIXEL_PARAMS:
+        value = params.get(name)
+        if value is None and name == "reg_filtering_iter":
+            # Default value computed by Bulldozer from the max object size
+            max_object_size = params.get("max_object_size")
+            if max_object_size is None:
+                max_object_size = get_from_params_base("max_object_size").default_value
+            value = int(max(1, max_object_size / 4))
+        elif value is None:
+            value = get_from_params_base(name).default_value
+        # 0 disables the filtering: it is kept
+        preview_params[name] = max(1, round(value / factor)) if value >= 1 else value
+    # The default altimetric accuracy is derived from the resolution by Bulldozer:
+    # the full resolution value is kept
+    if preview_params.get("dsm_z_accuracy") is None:
+        preview_params["dsm_z_accuracy"] = 2 * resolution
+    return preview_params
+
+
+def run_preview_dsm_to_dtm(params: dict, run_function: Callable, factor: int,
+                           feedback) -> Optional[str]:
+    """
+    Run Bulldozer on a decimated DSM.
+
+    :param params: Bulldozer parameters of the full resolution run
+    :param run_function: function running Bulldozer, called as run_function(feedback, **params),
+                         returning False if the run was canceled
+    :param factor: decimation factor
+    :param feedback: QGIS processing feedback
+    :return: the path of the coarse DTM, None if the run was canceled
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+
+    dsm_path = params["dsm_path"]
+    output_dir = params["output_dir"]
+    with rasterio.open(dsm_path) as dsm:
+        resolution = dsm.res[0]
+        feedback.pushInfo(f"Preview: {dsm.width // factor}x{dsm.height // factor} pixels "
+                          f"at {resolution * factor} resolution")
+
+    preview_dir = os.path.join(output_dir, PREVIEW_DIR)
+    os.makedirs(preview_dir, exist_ok=True)
+    try:
+        preview_params = rescale_params(params, factor, resolution)
+        preview_params["dsm_path"] = os.path.join(preview_dir, "dsm.tif")
+        decimate_raster(dsm_path, factor, preview_params["dsm_path"])
+        # The ground mask must have the size of the DSM
+        if params.get("ground_mask_path"):
+            preview_params["ground_mask_path"] = os.path.join(preview_dir, "ground_mask.tif")
+            decimate_raster(params["ground_mask_path"], factor,
+                            preview_params["ground_mask_path"])
+
+        if run_function(feedback, **preview_params) is False:
+            return None
+    finally:
+        if not params.get("developer_mode"):
+            shutil.rmtree(preview_dir, ignore_errors=True)
+
+    return os.path.join(output_dir, "dtm.tif")
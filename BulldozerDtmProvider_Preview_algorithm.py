@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+
+import os
+from qgis.core import (QgsProcessingParameterFileDestination,
+                       QgsProcessingParameterNumber)
+
+from .BulldozerDtmProvider_Advanced_algorithm import BulldozerDtmProviderAdvancedAlgorithm
+from .BulldozerDtmProvider_Engine import run_dsm_to_dtm
+from .BulldozerDtmProvider_GenerateConfigFile import write_config_file
+from .BulldozerDtmProvider_Metrics import record_input, record_run_metrics, record_workers
+from .BulldozerDtmProvider_Preview import run_preview_dsm_to_dtm, DEFAULT_PREVIEW_FACTOR
+
+
+class BulldozerDtmProviderPreviewAlgorithm(BulldozerDtmProviderAdvancedAlgorithm):
+    """
+    Processing algorithm that runs Bulldozer on a decimated DSM, to tune the parameters.
+    The parameters can be saved in a config file for the full resolution run.
+    """
+
+    OUTPUT = 'OUTPUT'
+    INPUT = 'INPUT'
+    FACTOR = 'FACTOR'
+    CONFIG_FILE = 'CONFIG_FILE'
+
+    def add_execution_parameters(self):
+        """
+        Add the decimation factor and the config file of the full resolution run
+        """
+        self.addParameter(QgsProcessingParameterNumber(self.FACTOR,
+                                                       self.tr('Decimation factor'),
+                                                       type=QgsProcessingParameterNumber.Integer,
+                                                       minValue=1,
+                                                       defaultValue=DEFAULT_PREVIEW_FACTOR))
+
+        self.addParameter(QgsProcessingParameterFileDestination(self.CONFIG_FILE,
+                                                                self.tr('Config file of the full '
+                                                                        'resolution run'),
+                                                                fileFilter='YAML files (*.yaml)',
+                                                                optional=True,
+                                                                createByDefault=False))
+
+        self.add_headless_parameter()
+
+    @record_run_metrics
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Call Bulldozer on the decimated DSM
+        """
+        params_for_bulldozer = self.get_params_for_bulldozer(parameters, context, feedback)
+        output_dir = params_for_bulldozer["output_dir"]
+        factor = self.parameterAsInt(parameters, self.FACTOR, context)
+        record_input(params_for_bulldozer["dsm_path"])
+        record_workers(params_for_bulldozer.get("nb_max_workers"))
+
+        if run_preview_dsm_to_dtm(params_for_bulldozer, run_dsm_to_dtm, factor,
+                                  feedback) is None:
+            return {}
+
+        results = {self.OUTPUT: os.path.join(output_dir, "dtm.tif")}
+        # The full resolution parameters are saved, not the rescaled ones
+        config_file = self.parameterAsFileOutput(parameters, self.CONFIG_FILE, context)
+        if config_file:
+            write_config_file(params_for_bulldozer, config_file)
+            feedback.pushInfo("Config file : " + config_file)
+            results[self.CONFIG_FILE] = config_file
+
+        self.OUTPUT = os.path.join(output_dir, "dtm.tif")
+        return results
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm.
+        """
+        return 'Bulldozer (Preview)'
+
+    def createInstance(self):
+        """
+        Create a new instance of the algorithm.
+        """
+        return BulldozerDtmProviderPreviewAlgorithm()
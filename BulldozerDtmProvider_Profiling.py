@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Profiling of the algorithm runs, to find where the time of a slow run goes.
+
+The plugin code of the run (parameters, layers, tiling, GDAL I/O...) is profiled with
+cProfile in the algorithm thread, and each Bulldozer call is profiled in its worker
+subprocess. The allocations of the Python code (numpy arrays included, GDAL buffers
+excluded) are optionally traced with tracemalloc. The reports are written in the profile
+directory of the output directory:
+
+- plugin.prof, worker_001.prof...: cProfile statistics (e.g. for snakeviz or pstats)
+- plugin_allocations.txt, worker_001_allocations.txt...: top allocations
+
+The Bulldozer pool processes are not profiled: their time shows in the worker as waits.
+
+This module must not import QGIS: the worker subprocess profiles its Bulldozer call.
+"""
+
+import cProfile
+import functools
+import os
+import pstats
+import tempfile
+import threading
+import tracemalloc
+from typing import Callable, List, Optional
+
+# Profile directory, in the output directory
+PROFILE_DIR = "profile"
+# Number of functions of the hotspot summary
+TOP_HOTSPOTS = 15
+# Number of lines of the allocation reports
+TOP_ALLOCATIONS = 25
+
+# Profiled run of the current thread (algorithms run in QGIS task threads)
+_current = threading.local()
+
+
+class RunProfiler:
+    """
+    Profile the code run in a with block, then write its reports.
+    """
+
+    def __init__(self, profile_dir: str, name: str, trace_memory: bool = False):
+        """
+        :param profile_dir: directory of the reports
+        :param name: name of the reports (e.g. "plugin")
+        :param trace_memory: trace the allocations (slower)
+        """
+        self.profile_dir = profile_dir
+        self.name = name
+        self.trace_memory = trace_memory
+        self.profiler = cProfile.Profile()
+        self.snapshot = None
+
+    def __enter__(self):
+        if self.trace_memory:
+            if tracemalloc.is_tracing():
+                # Traced by someone else, who stops the tracing
+                self.trace_memory = False
+            else:
+                tracemalloc.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.disable()
+        if self.trace_memory:
+            self.snapshot = (tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        if self.profile_dir is not None:
+            self.write_reports()
+
+    def get_stats_path(self) -> str:
+        """
+        :return: path of the cProfile statistics
+        """
+        return os.path.join(self.profile_dir, f"{self.name}.prof")
+
+    def write_reports(self):
+        """
+        Write the cProfile statistics and the top allocations in the profile directory.
+        """
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.profiler.dump_stats(self.get_stats_path())
+        if self.snapshot is None:
+            return
+        snapshot, peak = self.snapshot
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        with open(os.path.join(self.profile_dir, f"{self.name}_allocations.txt"), "w",
+                  encoding="utf8") as report:
+            report.write(f"Peak traced memory: {peak / 2 ** 20:.1f} MB\n")
+            report.write(f"Top {TOP_ALLOCATIONS} allocations still alive at the end:\n")
+            for statistic in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                report.write(f"{statistic}\n")
+
+
+def format_hotspots(stats_paths: List[str], limit: int = TOP_HOTSPOTS) -> str:
+    """
+    Format the functions with the highest own time, over cProfile statistics files.
+
+    :param stats_paths: paths of the cProfile statistics
+    :param limit: number of functions
+    :return: the table
+    """
+    stats = pstats.Stats(*stats_paths)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    lines = [f"{'Own (s)':>9}{'Cumul (s)':>11}{'Calls':>10}  Function"]
+    for (path, line, function), (_, calls, own_time, cumulative_time, _) in rows:
+        location = f"{os.path.basename(path)}:{line}" if path != "~" else "built-in"
+        lines.append(f"{own_time:>9.2f}{cumulative_time:>11.2f}{calls:>10}  "
+                     f"{function} ({location})")
+    return "\n".join(lines)
+
+
+def set_profile_dir(output_dir: str):
+    """
+    Set the output directory of the profiled run of the current thread: its reports are
+    written in its profile directory.
+    """
+    options = getattr(_current, "options", None)
+    if options is not None:
+        options["dir"] = os.path.join(output_dir, PROFILE_DIR)
+
+
+def get_worker_profile() -> Optional[dict]:
+    """
+    Get the profile options of the next Bulldozer call of the profiled run
+    (see RunProfiler, used by the worker subprocess).
+
+    :return: the RunProfiler arguments, None if the run is not profiled
+    """
+    options = getattr(_current, "options", None)
+    if options is None or options["dir"] is None:
+        return None
+    options["workers"] += 1
+    return {"profile_dir": options["dir"], "name": f"worker_{options['workers']:03d}",
+            "trace_memory": options["trace_memory"]}
+
+
+def report_profile(profile_dir: str, feedback):
+    """
+    Summarize the hotspots of the plugin and Bulldozer workers in the feedback.
+    """
+    feedback.pushInfo(f"Profile reports written in {profile_dir}")
+    names = sorted(name for name in os.listdir(profile_dir) if name.endswith(".prof"))
+    workers = [os.path.join(profile_dir, name) for name in names if name.startswith("worker_")]
+    for title, paths in (("Plugin", [os.path.join(profile_dir, name) for name in names
+                                     if not name.startswith("worker_")]),
+                         (f"Bulldozer ({len(workers)} call(s))", workers)):
+        if paths:
+            feedback.pushInfo(f"{title} hotspots (own time):\n{format_hotspots(paths)}")
+    for name in sorted(os.listdir(profile_dir)):
+        if name.endswith("_allocations.txt"):
+            with open(os.path.join(profile_dir, name), encoding="utf8") as report:
+                head = [line.rstrip() for line, _ in zip(report, range(7))]
+            feedback.pushInfo(f"{name}:\n" + "\n".join(head))
+
+
+def profile_run(process_algorithm: Callable) -> Callable:
+    """
+    Decorator of the processAlgorithm methods of the algorithms with the profile
+    parameters (see BulldozerDtmProviderAlgorithm.add_profile_parameters): the whole run
+    is profiled, the algorithm gives its output directory with set_profile_dir.
+    """
+    @functools.wraps(process_algorithm)
+    def wrapper(self, parameters, context, feedback):
+        if not self.parameterAsBool(parameters, self.PROFILE, context) \
+                or getattr(_current, "options", None) is not None:
+            return process_algorithm(self, parameters, context, feedback)
+
+        _current.options = {"dir": None, "workers": 0,
+                            "trace_memory": self.parameterAsBool(parameters,
+                                                                 self.PROFILE_MEMORY, context)}
+        profiler = RunProfiler(None, "plugin", _current.options["trace_memory"])
+        try:
+            with profiler:
+                return process_algorithm(self, parameters, context, feedback)
+        finally:
+            # The run may have failed before giving its output directory
+            profiler.profile_dir = (_current.options["dir"]
+                                    or tempfile.mkdtemp(prefix="bulldozer_profile_"))
+            _current.options = None
+            profiler.write_reports()
+            report_profile(profiler.profile_dir, feedback)
+    return wrapper
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Progress reporting and per-stage timing of the Bulldozer pipeline.
+
+The pipeline stages are detected from the messages of the "bulldozer" logger.
+This module must not import QGIS: the monitor runs in the worker subprocess.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, List
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+# Pipeline stages: (name, beginning of the log message starting the stage,
+# progress (%) at the start of the stage). The first stage starts with the run.
+BULLDOZER_STAGES = (
+    ("preprocess", None, 0),
+    ("regular-mask", "Raw regular mask processing", 5),
+    ("dsm-filling", "Horizontal nodata mask processing", 15),
+    ("anchors", "First pass of a drape cloth filter: Starting", 30),
+    ("drape-cloth", "Main pass of a drape cloth filter: Starting", 50),
+    ("postprocess", "Pits removal: Starting", 90),
+)
+
+# Delay between two memory and CPU time measurements (seconds)
+SAMPLING_DELAY = 0.2
+
+
+def get_rss() -> int:
+    """
+    :return: resident memory of the current process and of its children (bytes)
+    """
+    if psutil is not None:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    if resource is not None:
+        # Peak of the process since its start (kilobytes on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return 0
+
+
+class StageMonitor(logging.Handler):
+    """
+    Follow the stages of a Bulldozer run and measure their wall-clock time,
+    CPU time and peak resident memory.
+
+    Events are reported through a callback: callback("stage", name=..., progress=...)
+    when a stage starts and callback("timings", stages=[...]) at the end of the run.
+    """
+
+    def __init__(self, callback: Callable):
+        super().__init__(logging.INFO)
+        self.addFilter(logging.Filter("bulldozer"))
+        self.callback = callback
+        self.stages = []
+        self.stage_index = None
+        self.stage_start = None
+        self.peak_rss = 0
+        self._children_cpu = {}
+        self._stop_sampling = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        # Attached to the root logger: Bulldozer removes its own handlers at the end of a run
+        logging.getLogger().addHandler(self)
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self.start_stage(0)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        logging.getLogger().removeHandler(self)
+        self._stop_sampling.set()
+        self._sampler.join()
+        self.end_stage()
+        if exc_type is None:
+            self.callback("progress", progress=100)
+        self.callback("timings", stages=self.stages)
+
+    def _sample(self):
+        """
+        Measure the resident memory and CPU time until the end of the run (run in a thread).
+        """
+        while not self._stop_sampling.is_set():
+            self.peak_rss = max(self.peak_rss, get_rss())
+            self.get_cpu_time()
+            self._stop_sampling.wait(SAMPLING_DELAY)
+
+    def get_cpu_time(self) -> float:
+        """
+        :return: CPU time (user + system) of the current process and of its children (seconds)
+        """
+        if psutil is None:
+            times = os.times()
+            return times.user + times.system + times.children_user + times.children_system
+
+        process = psutil.Process()
+        cpu_times = process.cpu_times()
+        for child in process.children(recursive=True):
+            try:
+                child_times = child.cpu_times()
+                # The last measure is kept when the child exits (e.g. Bulldozer pool workers)
+                self._children_cpu[child.pid] = child_times.user + child_times.system
+            except psutil.Error:
+                pass
+        return cpu_times.user + cpu_times.system + sum(self._children_cpu.values())
+
+    def start_stage(self, stage_index: int):
+        """
+        Close the current stage and start a new one.
+        """
+        self.end_stage()
+        name, _, progress = BULLDOZER_STAGES[stage_index]
+        self.stage_index = stage_index
+        self.stage_start = (time.perf_counter(), self.get_cpu_time())
+        self.peak_rss = get_rss()
+        self.callback("stage", name=name, progress=progress)
+
+    def end_stage(self):
+        """
+        Record the measures of the current stage.
+        """
+        if self.stage_index is None:
+            return
+        wall_start, cpu_start = self.stage_start
+        self.stages.append({"name": BULLDOZER_STAGES[self.stage_index][0],
+                            "wall": time.perf_counter() - wall_start,
+                            "cpu": self.get_cpu_time() - cpu_start,
+                            "peak_rss": max(self.peak_rss, get_rss())})
+        self.stage_index = None
+
+    def emit(self, record):
+        try:
+            message = record.getMessage()
+            # Stages only move forward (optional stages may be skipped)
+            for stage_index in range(len(BULLDOZER_STAGES) - 1, self.stage_index or 0, -1):
+                if message.startswith(BULLDOZER_STAGES[stage_index][1]):
+                    self.start_stage(stage_index)
+                    break
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+
+
+def format_stage_table(stages: List[dict]) -> str:
+    """
+    Format the stage measures as a text table.
+
+    :param stages: measures recorded by StageMonitor
+    :return: the table
+    """
+    lines = [f"{'Stage':<14}{'Wall (s)':>10}{'CPU (s)':>10}{'Peak RSS (MB)':>15}"]
+    for stage in stages:
+        lines.append(f"{stage['name']:<14}{stage['wall']:>10.2f}{stage['cpu']:>10.2f}"
+                     f"{stage['peak_rss'] / 2 ** 20:>15.1f}")
+    lines.append(f"{'total':<14}{sum(stage['wall'] for stage in stages):>10.2f}"
+                 f"{sum(stage['cpu'] for stage in stages):>10.2f}"
+                 f"{max((stage['peak_rss'] for stage in stages), default=0) / 2 ** 20:>15.1f}")
+    return "\n".join(lines)
+
+
+class ScaledFeedback:
+    """
+    Processing feedback reporting its progress in a sub-range of another feedback
+    (e.g. one tile of a tiled run).
+    """
+
+    def __init__(self, feedback, start: float, end: float):
+        self._feedback = feedback
+        self._start = start
+        self._end = end
+
+    def setProgress(self, progress):  # pylint: disable=invalid-name
+        """
+        Report a progress (0-100) of the sub-task.
+        """
+        self._feedback.setProgress(self._start + (self._end - self._start) * progress / 100)
+
+    def __getattr__(self, name):
+        return getattr(self._feedback, name)
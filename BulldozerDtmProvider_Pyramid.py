@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Coarse-to-fine (pyramid) extraction of the DTM.
+
+Bulldozer is first run on the DSM decimated by 4**levels, with the parameters rescaled
+as for the preview (see BulldozerDtmProvider_Preview). At each finer level, the DTM of
+the previous level is upsampled and constrains the DSM of the level: the objects already
+found are clipped just above it. The drape cloth no longer has to climb down the objects,
+so the finer levels only run a few outer iterations. The full resolution level is the
+last one, its nDSM is computed from the original DSM.
+"""
+
+import os
+import shutil
+from typing import Callable, List, Optional, TYPE_CHECKING
+
+from .BulldozerDtmProvider_Params import get_from_params_base
+from .BulldozerDtmProvider_Preview import decimate_raster, rescale_params
+from .BulldozerDtmProvider_Progress import ScaledFeedback
+from .BulldozerDtmProvider_Scratch import run_in_work_dir
+
+if TYPE_CHECKING:
+    import numpy
+
+# Work directory of the levels, in the output (or scratch) directory
+PYRAMID_DIR = "pyramid"
+# Maximum number of coarse levels
+MAX_PYRAMID_LEVELS = 3
+# Decimation factor between two levels: the coarse levels cost a small share of the run
+LEVEL_RATIO = 4
+# Share of the outer iterations run by the levels constrained by a coarser DTM
+FINE_ITER_SHARE = 0.2
+# Height above the coarser DTM at which the DSM is clipped, in altimetric accuracies
+OBJECT_TOLERANCE = 1.0
+
+
+def get_level_factors(levels: int) -> List[int]:
+    """
+    :param levels: number of coarse levels
+    :return: the decimation factors of the levels, from the coarsest to the full resolution
+    """
+    return [LEVEL_RATIO ** level for level in range(levels, 0, -1)] + [1]
+
+
+def get_fine_params(params: dict) -> dict:
+    """
+    Get the parameters of a level constrained by the DTM of a coarser level.
+
+    :param params: Bulldozer parameters of the level
+    :return: the parameters with fewer outer iterations
+    """
+    num_outer_iter = params.get("num_outer_iter")
+    if num_outer_iter is None:
+        num_outer_iter = get_from_params_base("num_outer_iter").default_value
+    return dict(params, num_outer_iter=max(1, round(num_outer_iter * FINE_ITER_SHARE)))
+
+
+def upsample_dtm(coarse_dtm_path: str, profile: dict) -> "numpy.ndarray":
+    """
+    Upsample a coarse DTM (bilinear) to the grid of a DSM.
+
+    :param coarse_dtm_path: DTM of the coarser level
+    :param profile: profile of the DSM
+    :return: the upsampled DTM, NaN where it has no data
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.warp import reproject
+
+    dtm = np.full((profile["height"], profile["width"]), np.nan, dtype=np.float32)
+    with rasterio.open(coarse_dtm_path) as src:
+        reproject(rasterio.band(src, 1), dtm,
+                  dst_transform=profile["transform"], dst_crs=profile["crs"],
+                  dst_nodata=np.nan, resampling=Resampling.bilinear)
+    return dtm
+
+
+def write_constrained_dsm(dsm_path: str, coarse_dtm_path: str, tolerance: float,
+                          dst_path: str):
+    """
+    Write the DSM of a level without the objects found by the coarser level: the valid
+    pixels are clipped at tolerance above the upsampled coarse DTM.
+
+    :param dsm_path: DSM of the level
+    :param coarse_dtm_path: DTM of the coarser level
+    :param tolerance: height above the coarse DTM (m)
+    :param dst_path: path of the constrained DSM
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import rasterio
+
+    with rasterio.open(dsm_path) as dsm:
+        profile = dsm.profile.copy()
+        data = dsm.read(1, masked=True)
+    ceiling = upsample_dtm(coarse_dtm_path, profile) + tolerance
+    with np.errstate(invalid="ignore"):
+        clipped = ~data.mask & (data.data > ceiling)
+    data.data[clipped] = ceiling[clipped]
+
+    profile.update(driver="GTiff")
+    for key in ("blockxsize", "blockysize", "tiled", "interleave"):
+        profile.pop(key, None)
+    with rasterio.open(dst_path, "w", **profile) as dst:
+        dst.write(data.data, 1)
+
+
+def write_ndsm(dsm_path: str, dtm_path: str, ndsm_path: str):
+    """
+    Compute the nDSM (DSM - DTM) from the original DSM, nodata where the DSM has no data.
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+
+    with rasterio.open(dsm_path) as dsm, rasterio.open(dtm_path) as dtm:
+        dsm_data = dsm.read(1, masked=True)
+        ndsm = dsm_data - dtm.read(1)
+        profile = dtm.profile.copy()
+    nodata = profile.get("nodata")
+    with rasterio.open(ndsm_path, "w", **profile) as dst:
+        dst.write(ndsm.filled(nodata if nodata is not None else 0).astype(profile["dtype"]), 1)
+
+
+def run_pyramid_dsm_to_dtm(params: dict, run_function: Callable, levels: int, feedback,
+                           work_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Run Bulldozer from coarse to fine resolution.
+
+    :param params: Bulldozer parameters of the full resolution run
+    :param run_function: function running Bulldozer, called as run_function(feedback, **params),
+                         returning False if the run was canceled
+    :param levels: number of coarse levels (1 to MAX_PYRAMID_LEVELS)
+    :param feedback: QGIS processing feedback
+    :param work_dir: directory of the levels and of the intermediate files (scratch),
+                     the output directory if None
+    :return: the path of the DTM, None if the run was canceled
+    """
+    import rasterio  # pylint: disable=import-outside-toplevel
+
+    if not 1 <= levels <= MAX_PYRAMID_LEVELS:
+        raise ValueError(f"The number of pyramid levels must be between 1 and "
+                         f"{MAX_PYRAMID_LEVELS}")
+
+    dsm_path = params["dsm_path"]
+    output_dir = params["output_dir"]
+    with rasterio.open(dsm_path) as dsm:
+        resolution = dsm.res[0]
+
+    pyramid_dir = os.path.join(work_dir or output_dir, PYRAMID_DIR)
+    os.makedirs(pyramid_dir, exist_ok=True)
+    factors = get_level_factors(levels)
+    # The coarse levels are cheap: the full resolution gets half of the progress bar
+    steps = [50 * index / levels for index in range(levels + 1)] + [100]
+    coarse_dtm = None
+    try:
+        for index, factor in enumerate(factors):
+            feedback.pushInfo(f"Pyramid level {index + 1}/{len(factors)}: "
+                              f"{resolution * factor} resolution")
+            level_dir = os.path.join(pyramid_dir, f"level_{factor}")
+            os.makedirs(level_dir, exist_ok=True)
+            level_dsm = dsm_path
+            level_params = dict(params)
+            if factor > 1:
+                level_dsm = os.path.join(level_dir, "dsm.tif")
+                decimate_raster(dsm_path, factor, level_dsm)
+                level_params = rescale_params(params, factor, resolution)
+                level_params["output_dir"] = level_dir
+                # The ground mask must have the size of the DSM
+                if params.get("ground_mask_path"):
+                    level_params["ground_mask_path"] = os.path.join(level_dir, "ground_mask.tif")
+                    decimate_raster(params["ground_mask_path"], factor,
+                                    level_params["ground_mask_path"])
+            level_params["dsm_path"] = level_dsm
+
+            if coarse_dtm is not None:
+                z_accuracy = level_params.get("dsm_z_accuracy") or 2 * resolution
+                level_params = get_fine_params(level_params)
+                level_params["dsm_path"] = os.path.join(level_dir, "constrained_dsm.tif")
+                write_constrained_dsm(level_dsm, coarse_dtm, OBJECT_TOLERANCE * z_accuracy,
+                                      level_params["dsm_path"])
+
+            level_feedback = ScaledFeedback(feedback, steps[index], steps[index + 1])
+            if factor == 1:
+                completed = run_in_work_dir(level_params, run_function, work_dir, level_feedback)
+            else:
+                completed = run_function(level_feedback, **level_params)
+            if completed is False or feedback.isCanceled():
+                return None
+            coarse_dtm = os.path.join(level_params["output_dir"], "dtm.tif")
+    finally:
+        if not params.get("developer_mode"):
+            shutil.rmtree(pyramid_dir, ignore_errors=True)
+
+    dtm_path = os.path.join(output_dir, "dtm.tif")
+    ndsm_path = os.path.join(output_dir, "ndsm.tif")
+    if os.path.isfile(ndsm_path):
+        write_ndsm(dsm_path, dtm_path, ndsm_path)
+    return dtm_path
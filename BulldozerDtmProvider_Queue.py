@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Persistent queue of Bulldozer jobs.
+
+The jobs are stored in a local SQLite file: they survive QGIS restarts and crashes,
+and can be drained later (e.g. overnight) by the "Run job queue" algorithm. The jobs
+are run by priority (highest first), then in submission order. A job left running by
+a process which no longer exists is queued again when the queue is drained.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from .BulldozerDtmProviderSettings import BulldozerDtmProviderSettings
+from .BulldozerDtmProvider_Worker import run_job
+
+QUEUE_FILE = "queue.sqlite"
+# Delay waiting for a lock held by another process (seconds)
+SQLITE_TIMEOUT = 30
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELED = "canceled"
+JOB_STATUSES = (QUEUED, RUNNING, DONE, FAILED, CANCELED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    options TEXT NOT NULL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    owner TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_priority ON jobs (status, priority DESC, id);
+"""
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QueuedJob(NamedTuple):
+    """ Job of the queue
+    """
+    job_id: int
+    priority: int
+    status: str
+    params: dict
+    options: dict
+    submitted: float
+    started: Optional[float]
+    finished: Optional[float]
+    owner: Optional[str]
+    message: Optional[str]
+
+    @classmethod
+    def from_row(cls, row) -> "QueuedJob":
+        """ Build a job from a row of the jobs table """
+        return cls(row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4]), *row[5:])
+
+
+def get_owner() -> str:
+    """
+    :return: the identifier of the current process, owner of the jobs it runs
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def is_owner_alive(owner: str) -> bool:
+    """
+    Check whether the process owning a running job still exists.
+    The processes of other hosts are assumed to be alive.
+    """
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    if psutil is not None:
+        return psutil.pid_exists(int(pid))
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class BulldozerJobQueue:
+    """
+    Queue of Bulldozer jobs stored in a SQLite file, shared by the QGIS processes.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self.connect()) as connection:
+            connection.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Open a connection, in autocommit mode: the transactions are explicit
+        """
+        return sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT, isolation_level=None)
+
+    def execute(self, query: str, args: Iterable = ()) -> int:
+        """
+        Run a query modifying the queue.
+
+        :return: the number of modified jobs
+        """
+        with closing(self.connect()) as connection:
+            return connection.execute(query, tuple(args)).rowcount
+
+    def submit(self, params: dict, options: Optional[dict] = None, priority: int = 0) -> int:
+        """
+        Add a job to the queue.
+
+        :param params: Bulldozer parameters
+        :param options: execution options (see run_queued_job)
+        :param priority: jobs with a higher priority run first
+        :return: the job identifier
+        """
+        with closing(self.connect()) as connection:
+            cursor = connection.execute(
+                "INSERT INTO jobs (priority, status, params, options, submitted) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (priority, QUEUED, json.dumps(params), json.dumps(options or {}), time.time()))
+            return cursor.lastrowid
+
+    def claim(self, owner: str) -> Optional[QueuedJob]:
+        """
+        Take the next job of the queue and mark it as running.
+
+        :param owner: identifier of the process running the job (see get_owner)
+        :return: the job, None if the queue is empty
+        """
+        with closing(self.connect()) as connection:
+            # Lock the database: two processes cannot claim the same job
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT * FROM jobs WHERE status = ? "
+                                         "ORDER BY priority DESC, id LIMIT 1",
+                                         (QUEUED,)).fetchone()
+                if row is not None:
+                    connection.execute("UPDATE jobs SET status = ?, started = ?, owner = ?, "
+                                       "message = NULL WHERE id = ?",
+                                       (RUNNING, time.time(), owner, row[0]))
+                    row = connection.execute("SELECT * FROM jobs WHERE id = ?",
+                                             (row[0],)).fetchone()
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return None if row is None else QueuedJob.from_row(row)
+
+    def finish(self, job_id: int, status: str, message: Optional[str] = None):
+        """
+        Record the end of a running job (DONE or FAILED)
+        """
+        self.execute("UPDATE jobs SET status = ?, finished = ?, message = ? WHERE id = ?",
+                     (status, time.time(), message, job_id))
+
+    def requeue(self, job_ids: Iterable[int], message: Optional[str] = None) -> int:
+        """
+        Put running jobs back in the queue (e.g. interrupted by a cancel)
+
+        :return: the number of jobs queued again
+        """
+        count = 0
+        for job_id in job_ids:
+            count += self.execute("UPDATE jobs SET status = ?, started = NULL, owner = NULL, "
+                                  "message = ? WHERE id = ? AND status = ?",
+                                  (QUEUED, message, job_id, RUNNING))
+        return count
+
+    def recover_interrupted(self) -> int:
+        """
+        Put back in the queue the running jobs whose process no longer exists
+        (QGIS closed or crashed during the run).
+
+        :return: the number of jobs queued again
+        """
+        interrupted = [job.job_id for job in self.get_jobs([RUNNING])
+                       if not is_owner_alive(job.owner or "")]
+        return self.requeue(interrupted, "Interrupted, queued again")
+
+    def cancel(self, job_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Cancel queued jobs (all of them if job_ids is None)
+
+        :return: the number of canceled jobs
+        """
+        return self.set_status(job_ids, (QUEUED,), CANCELED)
+
+    def retry(self, job_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Queue failed or canceled jobs again (all of them if job_ids is None)
+
+        :return: the number of queued jobs
+        """
+        return self.set_status(job_ids, (FAILED, CANCELED), QUEUED)
+
+    def set_status(self, job_ids: Optional[Iterable[int]], from_statuses: Iterable[str],
+                   status: str) -> int:
+        """
+        Change the status of the jobs having one of the given statuses
+
+        :return: the number of modified jobs
+        """
+        from_statuses = tuple(from_statuses)
+        query = (f"UPDATE jobs SET status = ?, finished = ? "
+                 f"WHERE status IN ({', '.join('?' * len(from_statuses))})")
+        finished = time.time() if status == CANCELED else None
+        if job_ids is None:
+            return self.execute(query, (status, finished) + from_statuses)
+        return sum(self.execute(query + " AND id = ?", (status, finished) + from_statuses
+                                + (job_id,))
+                   for job_id in job_ids)
+
+    def set_priority(self, job_ids: Iterable[int], priority: int) -> int:
+        """
+        Change the priority of queued jobs
+
+        :return: the number of modified jobs
+        """
+        return sum(self.execute("UPDATE jobs SET priority = ? WHERE id = ? AND status = ?",
+                                (priority, job_id, QUEUED))
+                   for job_id in job_ids)
+
+    def purge(self) -> int:
+        """
+        Remove the finished (done or canceled) jobs
+
+        :return: the number of removed jobs
+        """
+        return self.execute("DELETE FROM jobs WHERE status IN (?, ?)", (DONE, CANCELED))
+
+    def get_jobs(self, statuses: Optional[Iterable[str]] = None) -> List[QueuedJob]:
+        """
+        :param statuses: statuses of the returned jobs (all the jobs if None)
+        :return: the jobs, in the order they run
+        """
+        query = "SELECT * FROM jobs"
+        args = ()
+        if statuses is not None:
+            args = tuple(statuses)
+            query += f" WHERE status IN ({', '.join('?' * len(args))})"
+        with closing(self.connect()) as connection:
+            rows = connection.execute(query + " ORDER BY priority DESC, id", args).fetchall()
+        return [QueuedJob.from_row(row) for row in rows]
+
+    def count_jobs(self) -> Dict[str, int]:
+        """
+        :return: the number of jobs of each status
+        """
+        with closing(self.connect()) as connection:
+            counts = dict(connection.execute("SELECT status, COUNT(*) FROM jobs "
+                                             "GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+
+def get_default_queue_path() -> str:
+    """
+    :return: the default path of the job queue, in the QGIS profile
+    """
+    from qgis.core import QgsApplication  # pylint: disable=import-outside-toplevel
+
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), "bulldozer", QUEUE_FILE)
+
+
+def get_job_queue() -> BulldozerJobQueue:
+    """
+    Get the job queue configured in the provider settings.
+    """
+    # pylint: disable=import-outside-toplevel
+    from processing.core.ProcessingConfig import ProcessingConfig
+
+    folder = ProcessingConfig.getSetting(BulldozerDtmProviderSettings.QUEUE_FOLDER)
+    return BulldozerJobQueue(os.path.join(folder, QUEUE_FILE) if folder
+                             else get_default_queue_path())
+
+
+def parse_job_ids(text: str) -> Optional[List[int]]:
+    """
+    Parse a list of job identifiers, e.g. "1, 4, 7"
+
+    :return: the identifiers, None if the text is empty (all the jobs)
+    """
+    if not text or not text.strip():
+        return None
+    try:
+        return [int(value) for value in text.replace(";", ",").split(",") if value.strip()]
+    except ValueError as e:
+        raise ValueError(f"Invalid job identifiers: {text}") from e
+
+
+def format_job_table(jobs: List[QueuedJob]) -> str:
+    """
+    Format the jobs of the queue as a text table.
+    """
+    lines = [f"{'Id':>5} {'Priority':>8} {'Status':<9} {'Submitted':<19} {'Duration':>9}  DSM"]
+    for job in jobs:
+        duration = ""
+        if job.started is not None:
+            duration = f"{(job.finished or time.time()) - job.started:.1f}s"
+        submitted = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.submitted))
+        line = (f"{job.job_id:>5} {job.priority:>8} {job.status:<9} {submitted:<19} "
+                f"{duration:>9}  {job.params.get('dsm_path', '')}")
+        if job.message:
+            line += f" ({job.message})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class JobFeedback:
+    """
+    Feedback of a job run in a pool process: the messages go to the log
+    and the job is stopped by terminating its process.
+    """
+
+    def isCanceled(self):  # pylint: disable=invalid-name
+        """ The job cannot be canceled from the pool process """
+        return False
+
+    def setProgress(self, progress):  # pylint: disable=invalid-name
+        """ The progress is reported per job, by the queue """
+
+    def pushInfo(self, message):  # pylint: disable=invalid-name
+        """ Log an information message """
+        LOGGER.info(message)
+
+
+def run_queued_job(job: QueuedJob, stage_store: Optional[dict] = None,
+                   nb_max_workers: Optional[int] = None) -> str:
+    """
+    Run a job of the queue in a pool process.
+
+    :param job: the job, its options may give a tiled run ("tile_size", "tile_margin"),
+                a run on the valid data footprint ("crop_footprint": True), a coarse-to-fine
+                run ("pyramid_levels") and a COG conversion of the outputs ("cog": COG options)
+    :param stage_store: arguments of the store of the stage products, None if disabled
+    :param nb_max_workers: number of Bulldozer workers, the one of the job if None
+    :return: path of the computed DTM
+    """
+    # pylint: disable=import-outside-toplevel
+    from .BulldozerDtmProvider_Footprint import get_run_footprint, run_footprint_dsm_to_dtm
+    from .BulldozerDtmProvider_Pyramid import run_pyramid_dsm_to_dtm
+    from .BulldozerDtmProvider_Tiling import run_tiled_dsm_to_dtm
+
+    params = dict(job.params)
+    if nb_max_workers:
+        params["nb_max_workers"] = nb_max_workers
+
+    def run_level(feedback, **run_params):
+        if "tile_size" in job.options:
+            return run_tiled_dsm_to_dtm(
+                run_params,
+                lambda _, **tile_params: run_job(tile_params, stage_store),
+                job.options["tile_size"],
+                job.options.get("tile_margin") or None,
+                feedback)
+        return run_job(run_params, stage_store)
+
+    def run_function(feedback, **run_params):
+        if "pyramid_levels" in job.options:
+            return run_pyramid_dsm_to_dtm(run_params, run_level, job.options["pyramid_levels"],
+                                          feedback)
+        return run_level(feedback, **run_params)
+
+    footprint = get_run_footprint(params["dsm_path"], job.options)
+    if footprint is not None:
+        dtm_path = run_footprint_dsm_to_dtm(params, run_function, footprint, JobFeedback())
+    else:
+        dtm_path = run_function(JobFeedback(), **params)
+
+    if job.options.get("cog"):
+        from .BulldozerDtmProvider_Output import convert_products_to_cog
+        convert_products_to_cog(params["output_dir"], JobFeedback(), **job.options["cog"])
+    return dtm_path
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+Extraction of the DTM on a region of interest of the DSM.
+
+Only the region of interest, padded with a margin of context, is read from the DSM
+and given to Bulldozer. The products are then cropped to the region of interest, and
+optionally masked outside of its polygons. The runtime and the memory scale with the
+size of the region, not with the size of the DSM.
+"""
+
+import math
+import os
+import shutil
+from typing import Callable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from .BulldozerDtmProvider_Tiling import (get_auto_margin,
+                                          get_tile_profile,
+                                          pad_window,
+                                          write_window_inputs,
+                                          TILED_PRODUCTS)
+
+if TYPE_CHECKING:
+    from rasterio.windows import Window
+
+# Work directory of the region of interest, in the output directory
+ROI_DIR = "roi"
+
+
+def get_roi_window(dsm_path: str, bounds: Sequence[float]) -> "Window":
+    """
+    Get the DSM window covering a region of interest.
+
+    :param dsm_path: path of the DSM
+    :param bounds: (xmin, ymin, xmax, ymax) of the region, in the DSM CRS
+    :return: the window, rounded outwards to whole pixels and clipped to the DSM
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.windows import Window, from_bounds
+
+    with rasterio.open(dsm_path) as dsm:
+        window = from_bounds(*bounds, transform=dsm.transform)
+        # Rounded outwards: the pixels partially covered by the region are kept
+        col_off, row_off = math.floor(window.col_off), math.floor(window.row_off)
+        window = Window(col_off, row_off,
+                        math.ceil(window.col_off + window.width) - col_off,
+                        math.ceil(window.row_off + window.height) - row_off)
+        try:
+            window = window.intersection(Window(0, 0, dsm.width, dsm.height))
+        except rasterio.errors.WindowError as e:
+            raise ValueError("The region of interest does not intersect the DSM") from e
+    if window.width < 1 or window.height < 1:
+        raise ValueError("The region of interest does not intersect the DSM")
+    return Window(int(window.col_off), int(window.row_off), int(window.width), int(window.height))
+
+
+def crop_product(src_path: str, window: "Window", dst_path: str,
+                 geometries: Optional[List[dict]] = None):
+    """
+    Crop a product to the region of interest.
+
+    :param src_path: product computed on the padded region
+    :param window: region of interest, in the product referential
+    :param dst_path: cropped product
+    :param geometries: GeoJSON geometries of the region (product CRS), pixels outside are nodata
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.features import geometry_mask
+
+    with rasterio.open(src_path) as src:
+        transform = src.window_transform(window)
+        profile = get_tile_profile(src.profile, window, transform)
+        data = src.read(window=window)
+    if geometries:
+        outside = geometry_mask(geometries, out_shape=data.shape[1:], transform=transform)
+        data[:, outside] = profile["nodata"] if profile.get("nodata") is not None else 0
+    with rasterio.open(dst_path, "w", **profile) as dst:
+        dst.write(data)
+
+
+def write_roi_inputs(params: dict, window: "Window", margin: Optional[int],
+                     roi_dir: str) -> Tuple[dict, "Window"]:
+    """
+    Write the region of interest of the Bulldozer inputs, padded with a margin of context.
+
+    :param params: Bulldozer parameters (dsm_path is required)
+    :param window: region of interest (see get_roi_window)
+    :param margin: context added around the region (pixels), computed from max_object_size if None
+    :param roi_dir: directory of the written inputs, and output directory of their run
+    :return: the Bulldozer parameters of the padded region, and the region of interest in it
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.windows import Window
+
+    with rasterio.open(params["dsm_path"]) as dsm:
+        if margin is None:
+            margin = get_auto_margin(params.get("max_object_size"), dsm.res[0])
+        padded = pad_window(window, margin, dsm.width, dsm.height)
+    roi_params = write_window_inputs(params, padded, roi_dir)
+    return roi_params, Window(window.col_off - padded.col_off, window.row_off - padded.row_off,
+                              window.width, window.height)
+
+
+def crop_products(src_dir: str, window: "Window", dst_dir: str,
+                  geometries: Optional[List[dict]] = None):
+    """
+    Crop the Bulldozer products of a padded region to the region of interest.
+
+    :param src_dir: output directory of the run on the padded region
+    :param window: region of interest, in the padded region (see write_roi_inputs)
+    :param dst_dir: directory of the cropped products (may be src_dir)
+    :param geometries: GeoJSON geometries of the region (product CRS), pixels outside are nodata
+    """
+    for product in TILED_PRODUCTS:
+        src_product = os.path.join(src_dir, product)
+        if os.path.isfile(src_product):
+            crop_product(src_product, window, os.path.join(dst_dir, product), geometries)
+
+
+def run_roi_dsm_to_dtm(params: dict, run_function: Callable, window: "Window",
+                       margin: Optional[int], feedback,
+                       geometries: Optional[List[dict]] = None,
+                       work_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Run Bulldozer on a region of interest of the DSM.
+
+    :param params: Bulldozer parameters (dsm_path and output_dir are required)
+    :param run_function: function running Bulldozer, called as run_function(feedback, **params),
+                         returning False if the run was canceled
+    :param window: region of interest (see get_roi_window)
+    :param margin: context added around the region (pixels), computed from max_object_size if None
+    :param feedback: QGIS processing feedback
+    :param geometries: GeoJSON geometries of the region (DSM CRS), the DTM is nodata outside
+    :param work_dir: directory of the region DSM and products (scratch), the output directory
+                     if None
+    :return: the path of the DTM, None if the run was canceled
+    """
+    output_dir = params["output_dir"]
+    roi_dir = os.path.join(work_dir or output_dir, ROI_DIR)
+    os.makedirs(roi_dir, exist_ok=True)
+    try:
+        roi_params, window_in_roi = write_roi_inputs(params, window, margin, roi_dir)
+        feedback.pushInfo(f"Region of interest: {int(window.width)}x{int(window.height)} pixels")
+
+        if run_function(feedback, **roi_params) is False:
+            return None
+
+        crop_products(roi_dir, window_in_roi, output_dir, geometries)
+    finally:
+        if not params.get("developer_mode"):
+            shutil.rmtree(roi_dir, ignore_errors=True)
+
+    return os.path.join(output_dir, "dtm.tif")
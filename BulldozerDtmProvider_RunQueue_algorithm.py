@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+import functools
+import os
+
+from qgis.core import (QgsProcessingOutputMultipleLayers,
+                       QgsProcessingParameterNumber)
+
+from .BulldozerDtmProvider_Batch_algorithm import BulldozerDtmProviderBatchAlgorithm
+from .BulldozerDtmProvider_Cache import get_cache_key, get_result_cache, get_stage_store_options
+from .BulldozerDtmProvider_Metrics import (record_cache,
+                                           record_input,
+                                           record_run_metrics,
+                                           record_workers)
+from .BulldozerDtmProvider_Output import convert_products_to_cog
+from .BulldozerDtmProvider_Queue import (get_job_queue,
+                                         get_owner,
+                                         run_queued_job,
+                                         DONE,
+                                         FAILED,
+                                         QUEUED)
+from .BulldozerDtmProvider_Worker import split_worker_budget
+
+
+class BulldozerDtmProviderRunQueueAlgorithm(BulldozerDtmProviderBatchAlgorithm):
+    """
+    Processing algorithm that runs the jobs of the job queue, by priority, in a process pool.
+    """
+
+    OUTPUT = 'OUTPUT'
+    MAX_JOBS = 'MAX_JOBS'
+
+    def initAlgorithm(self, config):
+        """
+        Define the inputs, output and properties of the algorithm
+        """
+        self.add_pool_parameters()
+
+        self.addParameter(QgsProcessingParameterNumber(self.MAX_JOBS,
+                                                       self.tr('Maximum number of jobs to run '
+                                                               '(0 = until the queue is empty)'),
+                                                       type=QgsProcessingParameterNumber.Integer,
+                                                       minValue=0,
+                                                       defaultValue=0,
+                                                       optional=True))
+
+        self.addOutput(QgsProcessingOutputMultipleLayers(self.OUTPUT, self.tr('DTMs')))
+
+    @staticmethod
+    def get_cache_key(job):
+        """
+        Get the result cache key of a job, the same as the advanced algorithm one
+        """
+        return get_cache_key(job.params, {name: value for name, value in job.options.items()
+                                          if name != "cog"})
+
+    @record_run_metrics
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Run the queued jobs until the queue is empty, the maximum number of jobs or the cancel
+        """
+        queue = get_job_queue()
+        recovered = queue.recover_interrupted()
+        if recovered:
+            feedback.pushInfo(f"{recovered} interrupted job(s) queued again")
+
+        self.dtm_paths = []
+        nb_queued = queue.count_jobs()[QUEUED]
+        max_jobs = self.parameterAsInt(parameters, self.MAX_JOBS, context)
+        if max_jobs > 0:
+            nb_queued = min(nb_queued, max_jobs)
+        if nb_queued == 0:
+            feedback.pushInfo(f"No job in the job queue {queue.db_path}")
+            return {self.OUTPUT: self.dtm_paths}
+
+        concurrent_jobs, workers_per_job = split_worker_budget(
+            nb_queued,
+            self.parameterAsInt(parameters, self.WORKER_BUDGET, context),
+            self.parameterAsInt(parameters, self.CONCURRENT_JOBS, context))
+        feedback.pushInfo(f"{nb_queued} job(s) to run from {queue.db_path}: {concurrent_jobs} "
+                          f"concurrent job(s) with {workers_per_job} worker(s) each")
+        record_workers(concurrent_jobs * workers_per_job)
+
+        cache = get_result_cache()
+        owner = get_owner()
+        running = set()
+        claimed = 0
+
+        def claim_jobs():
+            """
+            Take the next job of the queue when a pool process is free: the jobs submitted
+            or reprioritized during the run are taken into account
+            """
+            nonlocal claimed
+            while max_jobs <= 0 or claimed < max_jobs:
+                job = queue.claim(owner)
+                if job is None:
+                    return
+                claimed += 1
+                output_dir = job.params["output_dir"]
+                record_input(job.params["dsm_path"])
+                restored = cache is not None and cache.restore(self.get_cache_key(job), output_dir)
+                if cache is not None:
+                    record_cache(bool(restored))
+                if restored:
+                    if job.options.get("cog"):
+                        convert_products_to_cog(output_dir, feedback, **job.options["cog"])
+                    queue.finish(job.job_id, DONE, "Restored from the result cache")
+                    feedback.pushInfo(f"Job {job.job_id}: result found in the cache")
+                    self.dtm_paths.append(os.path.join(output_dir, "dtm.tif"))
+                    continue
+                running.add(job.job_id)
+                feedback.pushInfo(f"Job {job.job_id} started: {job.params['dsm_path']}")
+                yield job
+
+        function = functools.partial(run_queued_job,
+                                     stage_store=get_stage_store_options(),
+                                     nb_max_workers=workers_per_job)
+        try:
+            for job, dtm_path, error in self.run_pool(function, claim_jobs(), concurrent_jobs,
+                                                      feedback):
+                running.discard(job.job_id)
+                if error is None:
+                    queue.finish(job.job_id, DONE)
+                    if cache is not None:
+                        cache.store(self.get_cache_key(job), job.params["output_dir"],
+                                    {"params": job.params, "options": job.options})
+                    self.dtm_paths.append(dtm_path)
+                    feedback.pushInfo(f"Job {job.job_id} done: {dtm_path}")
+                else:
+                    queue.finish(job.job_id, FAILED, f"{type(error).__name__}: {error}")
+                    feedback.reportError(f"Job {job.job_id} failed on "
+                                         f"{job.params['dsm_path']}: {error}")
+                total = claimed + queue.count_jobs()[QUEUED]
+                if max_jobs > 0:
+                    total = min(total, max_jobs)
+                feedback.setProgress(100 * (claimed - len(running)) / max(total, 1))
+        finally:
+            # Jobs stopped by a cancel or an error are run again by the next run of the queue
+            if running:
+                queue.requeue(running, "Stopped, queued again")
+
+        return {self.OUTPUT: self.dtm_paths}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm.
+        """
+        return 'Bulldozer (Run job queue)'
+
+    def createInstance(self):
+        """
+        Create a new instance of the algorithm.
+        """
+        return BulldozerDtmProviderRunQueueAlgorithm()
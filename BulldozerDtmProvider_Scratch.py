@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Scratch directory of the Bulldozer runs.
+
+The intermediate files (tiles, region of interest, temporary files of Bulldozer) can
+be written in a scratch folder, e.g. on a fast local disk, instead of the output
+directory: only the products are moved to the output directory, and the scratch
+directory of a run is removed as soon as the run ends, even if it fails.
+
+QGIS is only imported by the function reading the provider settings.
+"""
+
+import contextlib
+import os
+import shutil
+import tempfile
+from typing import Callable, Iterator, Optional, Tuple
+
+from .BulldozerDtmProviderSettings import BulldozerDtmProviderSettings
+
+# Entries of a Bulldozer output directory which are not products
+INTERMEDIATE_ENTRIES = ("tmp",)
+# Disk usage, in float32 rasters of the size of the processed DSM (rough upper bounds):
+# the DTM, the nDSM and the masks are kept, the input copy and the temporary files are not
+PRODUCT_RASTERS = 3
+WORK_RASTERS = 6
+
+
+def get_scratch_root() -> Optional[str]:
+    """
+    :return: the scratch folder configured in the provider settings, None if there is none
+    """
+    # pylint: disable=import-outside-toplevel
+    from processing.core.ProcessingConfig import ProcessingConfig
+
+    return ProcessingConfig.getSetting(BulldozerDtmProviderSettings.SCRATCH_FOLDER) or None
+
+
+@contextlib.contextmanager
+def make_work_dir(scratch_root: Optional[str]) -> Iterator[Optional[str]]:
+    """
+    Create the scratch directory of a run, removed at the end of the run.
+
+    :param scratch_root: scratch folder, None to write the intermediate files in the
+                         output directory
+    :return: the scratch directory of the run, None without scratch folder
+    """
+    if not scratch_root:
+        yield None
+        return
+    os.makedirs(scratch_root, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="bulldozer_", dir=scratch_root)
+    try:
+        yield work_dir
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def move_products(src_dir: str, dst_dir: str):
+    """
+    Move the products of a Bulldozer run (files and masks) to another directory,
+    replacing the ones of a previous run.
+    """
+    os.makedirs(dst_dir, exist_ok=True)
+    for name in os.listdir(src_dir):
+        if name in INTERMEDIATE_ENTRIES:
+            continue
+        dst = os.path.join(dst_dir, name)
+        if os.path.isdir(dst) and not os.path.islink(dst):
+            shutil.rmtree(dst)
+        elif os.path.lexists(dst):
+            os.remove(dst)
+        shutil.move(os.path.join(src_dir, name), dst)
+
+
+def run_in_work_dir(params: dict, run_function: Callable, work_dir: Optional[str], feedback):
+    """
+    Run Bulldozer in a scratch directory and move its products to the output directory.
+
+    :param params: Bulldozer parameters
+    :param run_function: function running Bulldozer, called as run_function(feedback, **params),
+                         returning False if the run was canceled
+    :param work_dir: scratch directory of the run, None to run in the output directory
+    :param feedback: QGIS processing feedback
+    :return: the result of run_function
+    """
+    if work_dir is None:
+        return run_function(feedback, **params)
+
+    run_dir = tempfile.mkdtemp(prefix="run_", dir=work_dir)
+    try:
+        result = run_function(feedback, **dict(params, output_dir=run_dir))
+        if result is not False:
+            move_products(run_dir, params["output_dir"])
+        return result
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def get_free_space(path: str) -> Tuple[int, int]:
+    """
+    :param path: path of a file or directory, which may not exist yet
+    :return: the identifier of its file system and its free space (bytes)
+    """
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return os.stat(path).st_dev, shutil.disk_usage(path).free
+
+
+def estimate_disk_usage(dsm_path: str, tile_size: Optional[int] = None,
+                        margin: int = 0) -> Tuple[int, int]:
+    """
+    Estimate the disk usage of a run.
+
+    :param dsm_path: path of the DSM
+    :param tile_size: side of the tiles in tiled mode (the intermediate files are
+                      those of one tile), None if the DSM is processed at once
+    :param margin: margin of the tiles (pixels)
+    :return: the size of the products and the size of the intermediate files (bytes)
+    """
+    import rasterio  # pylint: disable=import-outside-toplevel
+
+    with rasterio.open(dsm_path) as dsm:
+        nb_pixels = dsm.width * dsm.height
+    work_pixels = nb_pixels
+    if tile_size:
+        work_pixels = min(nb_pixels, (tile_size + 2 * margin) ** 2)
+    raster_size = 4
+    return nb_pixels * raster_size * PRODUCT_RASTERS, work_pixels * raster_size * WORK_RASTERS
+
+
+def check_free_space(params: dict, work_dir: Optional[str], tile_size: Optional[int] = None,
+                     margin: int = 0):
+    """
+    Check that there is enough free space for a run, before any file is written.
+
+    :param params: Bulldozer parameters (dsm_path and output_dir are required)
+    :param work_dir: scratch directory of the run, None if it runs in the output directory
+    :param tile_size: side of the tiles in tiled mode, None if the DSM is processed at once
+    :param margin: margin of the tiles (pixels)
+    :raise ValueError: if a disk is too small
+    """
+    products_size, work_size = estimate_disk_usage(params["dsm_path"], tile_size, margin)
+    required = {}
+    for path, size in ((params["output_dir"], products_size),
+                       (work_dir or params["output_dir"], work_size)):
+        device, free = get_free_space(path)
+        required_size, _, _ = required.get(device, (0, path, free))
+        required[device] = (required_size + size, path, free)
+
+    for required_size, path, free in required.values():
+        if required_size > free:
+            raise ValueError(f"Not enough free space for Bulldozer in {path}: about "
+                             f"{required_size / 2 ** 20:.0f} MB required, "
+                             f"{free / 2 ** 20:.0f} MB available")
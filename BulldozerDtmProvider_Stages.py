@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+Bulldozer pipeline with memoization of the products of its stages.
+
+The pipeline of bulldozer.pipeline.bulldozer_pipeline.dsm_to_dtm is run stage by stage.
+The products of each stage are stored, keyed by the DSM content, the parameters the stage
+depends on and the key of the previous stage. A rerun loads the products of the deepest
+stage whose key did not change and only computes the following stages: changing the
+drape cloth iterations does not recompute the masks and the DSM filling.
+
+This module must not import QGIS: the pipeline runs in the worker processes.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from typing import Dict, Optional
+
+from .BulldozerDtmProvider_Cache import BulldozerResultCache, ENTRY_FILE
+from .import_bulldozer import import_bulldozer_pipeline
+
+# Memoized stages, in the pipeline order: (name, parameters the stage depends on, products).
+# The names are the ones of BulldozerDtmProvider_Progress.BULLDOZER_STAGES.
+MEMO_STAGES = (
+    ("regular-mask",
+     ("max_ground_slope", "dsm_z_accuracy", "max_object_size", "reg_filtering_iter"),
+     ("regular_mask",)),
+    ("dsm-filling",
+     ("max_object_size",),
+     ("border_nodata", "inner_nodata", "filled_dsm")),
+    ("anchors",
+     ("activate_ground_anchors", "ground_mask_path", "max_object_size", "prevent_unhook_iter",
+      "num_outer_iter", "num_inner_iter", "dsm_z_accuracy"),
+     ("ground_anchors",)),
+    ("drape-cloth",
+     ("max_object_size", "prevent_unhook_iter", "num_outer_iter", "num_inner_iter"),
+     ("dtm",)),
+)
+# Size of the blocks read to fingerprint a file (bytes)
+FINGERPRINT_BLOCK_SIZE = 2 ** 24
+
+logger = logging.getLogger("bulldozer")
+
+
+def get_content_fingerprint(path: Optional[str]) -> Optional[str]:
+    """
+    Fingerprint of the content of a file: the DSM tiles and regions of interest are
+    rewritten by each run, their modification time changes but not their content.
+
+    :param path: path of the file
+    :return: the sha256 of the file, None if there is no file
+    """
+    if not path:
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(FINGERPRINT_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_stage_keys(params: dict, dsm_fingerprint: str, version: str) -> Dict[str, str]:
+    """
+    Compute the key of each memoized stage.
+
+    :param params: Bulldozer parameters, with their default values (see retrieve_params)
+                   and the files replaced by their fingerprint
+    :param dsm_fingerprint: fingerprint of the DSM
+    :param version: Bulldozer version
+    :return: the key of each stage
+    """
+    keys = {}
+    previous_key = dsm_fingerprint
+    for name, dependencies, _ in MEMO_STAGES:
+        content = json.dumps({"stage": name, "version": version, "previous": previous_key,
+                              "params": {param: params.get(param) for param in dependencies}},
+                             sort_keys=True, default=str)
+        previous_key = hashlib.sha256(content.encode("utf8")).hexdigest()
+        keys[name] = previous_key
+    return keys
+
+
+class StageStore(BulldozerResultCache):
+    """
+    On-disk, size-bounded, least recently used store of the products of the pipeline stages.
+    """
+
+    def save(self, key: str, stage: str, products: dict):
+        """
+        Store the products of a stage.
+
+        :param key: key of the stage
+        :param stage: name of the stage
+        :param products: arrays produced by the stage (None if the stage produced nothing)
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        def save_arrays(entry_dir):
+            for name, array in products.items():
+                if array is not None:
+                    np.save(os.path.join(entry_dir, f"{name}.npy"), array)
+
+        self.write_entry(key, save_arrays,
+                         {"stage": stage,
+                          "products": {name: array is not None
+                                       for name, array in products.items()}})
+
+    def load(self, key: str, name: str):
+        """
+        Load a product of a stage.
+
+        :param key: key of the stage
+        :param name: name of the product
+        :return: the array (None if the stage produced nothing)
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        entry_dir = self.get_entry_dir(key)
+        with open(os.path.join(entry_dir, ENTRY_FILE), encoding="utf-8") as entry_file:
+            stored = json.load(entry_file)["description"]["products"][name]
+        # Last access time, used by the eviction
+        os.utime(os.path.join(entry_dir, ENTRY_FILE))
+        return np.load(os.path.join(entry_dir, f"{name}.npy")) if stored else None
+
+    def has(self, key: str) -> bool:
+        """
+        :return: True if the products of the stage are stored
+        """
+        return os.path.isfile(os.path.join(self.get_entry_dir(key), ENTRY_FILE))
+
+
+def run_staged_dsm_to_dtm(params: dict, store: StageStore):
+    """
+    Run the Bulldozer pipeline, resuming from the deepest stored stage.
+
+    The stages run in memory (intermediate_write is ignored): their products are arrays.
+    The masks of the stages loaded from the store are not written in the output directory.
+
+    :param params: Bulldozer parameters
+    :param store: store of the stage products
+    """
+    pipeline = import_bulldozer_pipeline()
+    np = pipeline.np
+
+    try:
+        params = pipeline.retrieve_params(**params)
+        params["intermediate_write"] = False
+        os.makedirs(params["output_dir"], exist_ok=True)
+        pipeline.setup_logger(params["output_dir"])
+        pipeline.init_logfile()
+        if params["nb_max_workers"] is None:
+            params["nb_max_workers"] = multiprocessing.cpu_count()
+
+        with pipeline.BulldozerContextManager(params, tile_mode=True) as manager:
+            with pipeline.rasterio.open(params["dsm_path"]) as dsm:
+                input_profile = dsm.profile.copy()
+            resolution = input_profile["transform"][0]
+            input_nodata = input_profile["nodata"]
+            # Bulldozer replaces a None or NaN nodata by its own value (Cython constraint)
+            replace_nodata = input_nodata is None or np.isnan(input_nodata)
+            pipeline_nodata = pipeline.DEFAULT_NODATA if replace_nodata else input_nodata
+            if params["dsm_z_accuracy"] is None:
+                params["dsm_z_accuracy"] = 2 * resolution
+
+            def read_clean_dsm():
+                # A new array for each stage: the DSM filling modifies it
+                dsm = pipeline.read(params["dsm_path"])
+                if replace_nodata:
+                    dsm = np.nan_to_num(dsm, copy=False, nan=pipeline.DEFAULT_NODATA)
+                return dsm
+
+            def compute_regular_mask():
+                regular_slope = max(float(params["max_ground_slope"]) * resolution / 100.0,
+                                    params["dsm_z_accuracy"])
+                return {"regular_mask": pipeline.regular_detector.detect_regular_areas(
+                    dsm_key=read_clean_dsm(), dsm_profile=input_profile,
+                    regular_slope=regular_slope, nodata=pipeline_nodata,
+                    max_object_size=params["max_object_size"],
+                    reg_filtering_iter=params["reg_filtering_iter"], manager=manager)}
+
+            def compute_dsm_filling():
+                clean_dsm = read_clean_dsm()
+                border_nodata, inner_nodata_path = \
+                    pipeline.border_detector.detect_border_nodata(
+                        dsm_key=clean_dsm, dsm_profile=input_profile, nodata=pipeline_nodata,
+                        manager=manager)
+                filled_dsm = pipeline.dsm_filler.fill_dsm(
+                    dsm_key=clean_dsm, regular_mask_key=get("regular_mask"),
+                    border_nodata_mask_key=border_nodata, dsm_profile=input_profile,
+                    nodata=pipeline_nodata, max_object_size=params["max_object_size"],
+                    manager=manager)
+                return {"border_nodata": border_nodata,
+                        "inner_nodata": pipeline.read(inner_nodata_path),
+                        "filled_dsm": filled_dsm}
+
+            def compute_anchors():
+                if not params["activate_ground_anchors"]:
+                    return {"ground_anchors": None}
+                logger.info("First pass of a drape cloth filter: Starting...")
+                first_dtm = pipeline.dtm_extraction.drape_cloth(
+                    filled_dsm_key=get("filled_dsm"), ground_mask_key=params["ground_mask_path"],
+                    filled_dsm_profile=input_profile, manager=manager,
+                    max_object_size=params["max_object_size"],
+                    prevent_unhook_iter=params["prevent_unhook_iter"],
+                    num_outer_iterations=params["num_outer_iter"],
+                    num_inner_iterations=params["num_inner_iter"],
+                    inter_dtm_filename="dtm_first_pass.tif")
+                logger.info("First pass of a drape cloth filter: Done.")
+                return {"ground_anchors": pipeline.ground_anchors_detector.detect_ground_anchors(
+                    intermediate_dtm_key=first_dtm, dsm_key=get("filled_dsm"),
+                    regular_mask_key=get("regular_mask"),
+                    ground_mask_path=params["ground_mask_path"], dsm_profile=input_profile,
+                    dsm_z_accuracy=params["dsm_z_accuracy"], manager=manager)}
+
+            def compute_drape_cloth():
+                logger.info("Main pass of a drape cloth filter: Starting...")
+                dtm = pipeline.dtm_extraction.drape_cloth(
+                    filled_dsm_key=get("filled_dsm"), ground_mask_key=get("ground_anchors"),
+                    filled_dsm_profile=input_profile, manager=manager,
+                    max_object_size=params["max_object_size"],
+                    prevent_unhook_iter=params["prevent_unhook_iter"],
+                    num_outer_iterations=params["num_outer_iter"],
+                    num_inner_iterations=params["num_inner_iter"],
+                    inter_dtm_filename="dtm_second_pass.tif")
+                logger.info("Main pass of a drape cloth filter: Done.")
+                logger.info("Pits removal: Starting...")
+                dtm = pipeline.fill_pits.run(dtm_key=dtm,
+                                             border_nodata_mask_key=get("border_nodata"),
+                                             dtm_profile=input_profile, nodata=input_nodata,
+                                             manager=manager)
+                logger.info("Pits removal: Done.")
+                return {"dtm": dtm}
+
+            key_params = dict(params, ground_mask_path=get_content_fingerprint(
+                params["ground_mask_path"]))
+            keys = get_stage_keys(key_params, get_content_fingerprint(params["dsm_path"]),
+                                  pipeline.__version__)
+            compute_functions = {"regular-mask": compute_regular_mask,
+                                 "dsm-filling": compute_dsm_filling,
+                                 "anchors": compute_anchors,
+                                 "drape-cloth": compute_drape_cloth}
+            stage_of_product = {product: name for name, _, products in MEMO_STAGES
+                                for product in products}
+            products = {}
+
+            def get(product):
+                """Get a product: computed in this run, loaded from the store or computed"""
+                if product not in products:
+                    stage = stage_of_product[product]
+                    if store.has(keys[stage]):
+                        logger.info("Stage %s: products loaded from the stage store", stage)
+                        products[product] = store.load(keys[stage], product)
+                    else:
+                        stage_products = compute_functions[stage]()
+                        # Stored before the next stages can modify them
+                        store.save(keys[stage], stage, stage_products)
+                        products.update(stage_products)
+                return products[product]
+
+            dtm = get("dtm")
+
+            # Post process: compare with DSM (optional) + computes nDSM (optional)
+            postprocess = {}
+            if params["enforce_dtm_below_dsm"] or params["generate_ndsm"]:
+                logger.info("Postprocessing: Starting...")
+                nodata_mask = np.logical_or(get("border_nodata"), get("inner_nodata"))
+                postprocess = pipeline.run_postprocess(params["dsm_path"], dtm, nodata_mask,
+                                                       input_nodata,
+                                                       params["enforce_dtm_below_dsm"],
+                                                       params["generate_ndsm"])
+                dtm = postprocess.get("dtm", dtm)
+                logger.info("Postprocessing: Done.")
+
+            logger.info("Writing DTM...")
+            manager.write_tif(dtm, "dtm.tif", input_profile, key="out")
+            if params["generate_ndsm"]:
+                logger.info("Writing nDSM...")
+                manager.write_tif(postprocess["ndsm"], "ndsm.tif", input_profile, key="out")
+    finally:
+        pipeline.clean_handlers()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+Parameter sweep: Bulldozer run on every combination of a set of parameter values.
+
+This module must not import QGIS: run_sweep_job runs in the worker processes.
+"""
+
+import csv
+import itertools
+import time
+from typing import Dict, List, Optional, Sequence
+
+from .BulldozerDtmProvider_Worker import run_job
+
+# Summary of the sweep, in the output directory
+SWEEP_SUMMARY_FILE = "sweep_summary.csv"
+# Output statistics of each combination
+SWEEP_STATS = ("min", "max", "mean", "std", "valid")
+
+
+def parse_value(text: str, param_type: type):
+    """
+    Parse one parameter value.
+
+    :param text: the value
+    :param param_type: type of the parameter
+    :return: the typed value
+    """
+    text = text.strip()
+    if param_type == bool:
+        if text.lower() in ("true", "1", "yes"):
+            return True
+        if text.lower() in ("false", "0", "no"):
+            return False
+        raise ValueError(f"Invalid boolean: {text}")
+    return param_type(text)
+
+
+def parse_sweep_values(text: str, param_type: type) -> list:
+    """
+    Parse the values of a swept parameter: a list ("1, 2, 4") or an inclusive range
+    ("start:stop" or "start:stop:step").
+
+    :param text: the values
+    :param param_type: type of the parameter
+    :return: the values, without duplicates
+    """
+    if ":" not in text:
+        values = [parse_value(value, param_type) for value in text.split(",") if value.strip()]
+    else:
+        if param_type not in (int, float):
+            raise ValueError(f"A range is only allowed for numbers: {text}")
+        bounds = [parse_value(value, param_type) for value in text.split(":")]
+        if len(bounds) not in (2, 3) or (len(bounds) == 3 and bounds[2] <= 0):
+            raise ValueError(f"Invalid range: {text}")
+        start, stop = bounds[:2]
+        step = bounds[2] if len(bounds) == 3 else 1
+        nb_values = int((stop - start) / step + 1e-9) + 1
+        values = [param_type(round(start + index * step, 9)) for index in range(nb_values)]
+    if not values:
+        raise ValueError(f"No value: {text}")
+    return list(dict.fromkeys(values))
+
+
+def get_combinations(sweep: Dict[str, list]) -> List[dict]:
+    """
+    :param sweep: values of each swept parameter
+    :return: every combination of the values, the last parameter varying fastest
+    """
+    names = list(sweep)
+    return [dict(zip(names, values)) for values in itertools.product(*sweep.values())]
+
+
+def run_sweep_job(params: dict, stage_store: Optional[dict] = None) -> float:
+    """
+    Run the Bulldozer pipeline in a worker process.
+
+    :param params: Bulldozer parameters
+    :param stage_store: arguments of the store of the stage products, None to disable it
+    :return: the wall-clock time of the run (seconds)
+    """
+    start = time.perf_counter()
+    run_job(params, stage_store)
+    return time.perf_counter() - start
+
+
+def get_raster_stats(path: str) -> dict:
+    """
+    :param path: path of a single band raster
+    :return: statistics of the valid pixels, see SWEEP_STATS (valid = ratio of valid pixels)
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import rasterio
+
+    with rasterio.open(path) as src:
+        data = src.read(1, masked=True)
+    valid = data.compressed()
+    if valid.size == 0:
+        return {"min": None, "max": None, "mean": None, "std": None, "valid": 0.0}
+    return {"min": float(valid.min()), "max": float(valid.max()),
+            "mean": float(valid.mean()), "std": float(np.std(valid)),
+            "valid": valid.size / data.size}
+
+
+def format_sweep_table(rows: List[dict], names: Sequence[str]) -> str:
+    """
+    Format the summary of a sweep as a text table.
+
+    :param rows: one row per combination: name, parameter values, runtime and SWEEP_STATS
+    :param names: swept parameters
+    :return: the table
+    """
+    columns = ["name", *names, "runtime", *SWEEP_STATS]
+    cells = [[format_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[index]) for line in cells))
+              for index, column in enumerate(columns)]
+    lines = ["  ".join(column.rjust(width) for column, width in zip(columns, widths))]
+    lines.extend("  ".join(cell.rjust(width) for cell, width in zip(line, widths))
+                 for line in cells)
+    return "\n".join(lines)
+
+
+def format_cell(value) -> str:
+    """
+    :return: the text of a summary table cell
+    """
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def write_sweep_summary(path: str, rows: List[dict], names: Sequence[str]):
+    """
+    Write the summary of a sweep as a CSV file (see format_sweep_table).
+    """
+    with open(path, "w", newline="", encoding="utf-8") as summary:
+        writer = csv.DictWriter(summary, ["name", *names, "runtime", *SWEEP_STATS],
+                                extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+
+import functools
+import os
+import shutil
+
+from qgis.core import (QgsProcessingException,
+                       QgsProcessingOutputFile,
+                       QgsProcessingOutputMultipleLayers,
+                       QgsProcessingParameterFolderDestination,
+                       QgsProcessingParameterMatrix,
+                       QgsProcessingParameterRasterLayer)
+
+from .BulldozerDtmProvider_Batch_algorithm import BulldozerDtmProviderBatchAlgorithm
+from .BulldozerDtmProvider_Cache import (get_cache_key,
+                                         get_result_cache,
+                                         get_stage_store_options,
+                                         link_or_copy,
+                                         CACHED_PRODUCTS,
+                                         NON_RESULT_PARAMS)
+from .BulldozerDtmProvider_Metrics import (record_cache,
+                                           record_input,
+                                           record_run_metrics,
+                                           record_workers)
+from .BulldozerDtmProvider_Params import get_params_registry
+from .BulldozerDtmProvider_Progress import ScaledFeedback
+from .BulldozerDtmProvider_Roi import crop_products, write_roi_inputs, ROI_DIR
+from .BulldozerDtmProvider_Sweep import (format_sweep_table,
+                                         get_combinations,
+                                         get_raster_stats,
+                                         parse_sweep_values,
+                                         run_sweep_job,
+                                         write_sweep_summary,
+                                         SWEEP_SUMMARY_FILE)
+from .BulldozerDtmProvider_Worker import split_worker_budget
+
+
+class BulldozerDtmProviderSweepAlgorithm(BulldozerDtmProviderBatchAlgorithm):
+    """
+    Processing algorithm that runs Bulldozer with every combination of a set of parameter
+    values, in a process pool, and summarizes the runtime and the DTM of each combination.
+    """
+
+    OUTPUT = 'OUTPUT'
+    INPUT = 'INPUT'
+    SWEEP = 'SWEEP'
+    SUMMARY = 'SUMMARY'
+
+    def initAlgorithm(self, config):
+        """
+        Define the inputs, output and properties of the algorithm
+        """
+        self.addParameter(QgsProcessingParameterRasterLayer(self.INPUT,
+                                                            self.tr('Input DSM')
+                                                            )
+                          )
+
+        self.addParameter(QgsProcessingParameterMatrix(self.SWEEP,
+                                                       self.tr('Swept parameters (values: '
+                                                               '"1, 2, 4" or "start:stop:step")'),
+                                                       numberRows=1,
+                                                       hasFixedNumberRows=False,
+                                                       headers=[self.tr('Parameter'),
+                                                                self.tr('Values')]))
+
+        self.add_bulldozer_parameters()
+
+        self.add_roi_parameters()
+
+        self.add_pool_parameters()
+
+        self.addParameter(QgsProcessingParameterFolderDestination(self.OUTPUT_DIR,
+                                                                  self.tr('Output directory')))
+
+        self.addOutput(QgsProcessingOutputMultipleLayers(self.OUTPUT, self.tr('DTMs')))
+        self.addOutput(QgsProcessingOutputFile(self.SUMMARY, self.tr('Summary')))
+
+    def get_sweep(self, parameters, context):
+        """
+        Get the values of each swept parameter
+        """
+        registry = get_params_registry()
+        matrix = self.parameterAsMatrix(parameters, self.SWEEP, context)
+        sweep = {}
+        for name, values in zip(matrix[::2], matrix[1::2]):
+            name = str(name).strip()
+            if not name:
+                continue
+            if name not in registry or name in NON_RESULT_PARAMS or name.endswith("_path"):
+                raise QgsProcessingException(f"Parameter cannot be swept: {name}")
+            try:
+                sweep[name] = parse_sweep_values(str(values), registry[name].param_type)
+            except ValueError as e:
+                raise QgsProcessingException(f"Invalid values of {name}: {e}") from e
+        if not sweep:
+            raise QgsProcessingException(self.tr('No swept parameter'))
+        return sweep
+
+    def run_combinations(self, job_params, job_rows, parameters, context, feedback,
+                         cache, options, dsm_path, roi):
+        """
+        Run the combinations in a process pool, fill the runtime of their row and store
+        their products in the result cache
+        """
+        concurrent_jobs, workers_per_job = split_worker_budget(
+            len(job_params),
+            self.parameterAsInt(parameters, self.WORKER_BUDGET, context),
+            self.parameterAsInt(parameters, self.CONCURRENT_JOBS, context),
+            job_params[0].get("nb_max_workers"))
+        for params in job_params:
+            params["nb_max_workers"] = workers_per_job
+        feedback.pushInfo(f"{len(job_params)} run(s): {concurrent_jobs} concurrent job(s) "
+                          f"with {workers_per_job} worker(s) each")
+        record_workers(concurrent_jobs * workers_per_job)
+
+        # With the stage store, a first combination computes the stages shared by all the
+        # combinations, which are then loaded by the others instead of computed concurrently
+        stage_store = get_stage_store_options()
+        function = functools.partial(run_sweep_job, stage_store=stage_store)
+        if stage_store is not None and len(job_params) > 1:
+            first_end = 100 / len(job_params)
+            pools = [(job_params[:1], ScaledFeedback(feedback, 0, first_end)),
+                     (job_params[1:], ScaledFeedback(feedback, first_end, 100))]
+        else:
+            pools = [(job_params, feedback)]
+
+        results = (result for pool_params, pool_feedback in pools
+                   for result in self.run_pool(function, pool_params, concurrent_jobs,
+                                               pool_feedback))
+        for params, runtime, error in results:
+            cache_key, row = job_rows[params["output_dir"]]
+            if error is not None:
+                feedback.reportError(f"Bulldozer failed on {row['name']}: {error}")
+                continue
+            if roi is not None:
+                roi_in_run_dsm, roi_geometries = roi
+                crop_products(params["output_dir"], roi_in_run_dsm, params["output_dir"],
+                              roi_geometries)
+            row["runtime"] = runtime
+            feedback.pushInfo(f"{row['name']} done in {runtime:.1f} s")
+            if cache is not None:
+                cache.store(cache_key, params["output_dir"],
+                            {"params": dict(params, dsm_path=dsm_path), "options": options})
+
+    @record_run_metrics
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Call Bulldozer with each combination of parameters, in a process pool
+        """
+        base_params = self.get_params_for_bulldozer(parameters, context, feedback)
+        dsm_path = base_params["dsm_path"]
+        output_dir = base_params["output_dir"]
+        record_input(dsm_path)
+        sweep = self.get_sweep(parameters, context)
+        combinations = get_combinations(sweep)
+        feedback.pushInfo(f"{len(combinations)} combination(s) of {', '.join(sweep)}")
+
+        roi = self.get_roi(parameters, context, dsm_path)
+        options = self.get_ground_mask_options()
+        run_dsm_path = dsm_path
+        if roi is not None:
+            # The region is extracted once for all the combinations, with the largest margin
+            roi_window, roi_geometries = roi
+            max_object_size = base_params.get("max_object_size",
+                                              get_params_registry()["max_object_size"]
+                                              .default_value)
+            max_object_size = max(combination.get("max_object_size", max_object_size)
+                                  for combination in combinations)
+            options.update(self.get_roi_options(roi))
+            options["roi_max_object_size"] = max_object_size
+            os.makedirs(os.path.join(output_dir, ROI_DIR), exist_ok=True)
+            roi_params, roi_window = write_roi_inputs(dict(base_params,
+                                                           max_object_size=max_object_size),
+                                                      roi_window, None,
+                                                      os.path.join(output_dir, ROI_DIR))
+            run_dsm_path = roi_params["dsm_path"]
+            # The region of interest in the extracted DSM replaces the one in the DSM
+            roi = (roi_window, roi_geometries)
+
+        # Identical combinations (e.g. a default value given explicitly) are run once,
+        # combinations already computed are restored from the result cache
+        cache = get_result_cache()
+        rows = []
+        jobs = {}
+        duplicates = []
+        for index, combination in enumerate(combinations, 1):
+            params_for_bulldozer = dict(base_params, **combination)
+            params_for_bulldozer["output_dir"] = os.path.join(output_dir,
+                                                              f"combination_{index:03d}")
+            self.check_params_for_bulldozer(params_for_bulldozer, feedback)
+            os.makedirs(params_for_bulldozer["output_dir"], exist_ok=True)
+            row = dict(combination, name=os.path.basename(params_for_bulldozer["output_dir"]))
+            rows.append(row)
+
+            cache_key = get_cache_key(params_for_bulldozer, options)
+            combination_dir = params_for_bulldozer["output_dir"]
+            if cache_key in jobs:
+                duplicates.append((row, jobs[cache_key]))
+            elif cache is not None and cache.restore(cache_key, combination_dir):
+                record_cache(True)
+                feedback.pushInfo(f"{row['name']}: result found in the cache")
+            else:
+                if cache is not None:
+                    record_cache(False)
+                jobs[cache_key] = (row, dict(params_for_bulldozer, dsm_path=run_dsm_path))
+
+        job_rows = {params["output_dir"]: (cache_key, row)
+                    for cache_key, (row, params) in jobs.items()}
+        job_params = [params for _, params in jobs.values()]
+        try:
+            if job_params:
+                self.run_combinations(job_params, job_rows, parameters, context, feedback,
+                                      cache, options, dsm_path, roi)
+        finally:
+            if roi is not None and not base_params.get("developer_mode"):
+                shutil.rmtree(os.path.join(output_dir, ROI_DIR), ignore_errors=True)
+        if feedback.isCanceled():
+            return {}
+
+        for row, (source_row, params) in duplicates:
+            for product in CACHED_PRODUCTS:
+                product_path = os.path.join(params["output_dir"], product)
+                if os.path.isfile(product_path):
+                    link_or_copy(product_path, os.path.join(output_dir, row["name"], product))
+            row["runtime"] = source_row.get("runtime")
+
+        dtm_paths = []
+        for row in rows:
+            dtm_path = os.path.join(output_dir, row["name"], "dtm.tif")
+            if os.path.isfile(dtm_path):
+                row.update(get_raster_stats(dtm_path))
+                dtm_paths.append(dtm_path)
+        if not dtm_paths:
+            raise QgsProcessingException(self.tr('Bulldozer failed on all the combinations'))
+
+        summary_path = os.path.join(output_dir, SWEEP_SUMMARY_FILE)
+        write_sweep_summary(summary_path, rows, list(sweep))
+        feedback.pushInfo(format_sweep_table(rows, list(sweep)))
+
+        self.dtm_paths = dtm_paths
+        return {self.OUTPUT: dtm_paths,
+                self.SUMMARY: summary_path,
+                self.OUTPUT_DIR: output_dir}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm.
+        """
+        return 'Bulldozer (Parameter sweep)'
+
+    def createInstance(self):
+        """
+        Create a new instance of the algorithm.
+        """
+        return BulldozerDtmProviderSweepAlgorithm()
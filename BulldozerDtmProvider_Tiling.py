@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Window-by-window execution of the Bulldozer pipeline.
+
+The input DSM is split into overlapping windows. Each window is copied in a small
+GeoTIFF file and given to Bulldozer, then only the core of each resulting DTM is
+written into the final mosaic: the overlapping margins are cropped away.
+The peak memory is therefore bounded by the tile size instead of the scene size.
+
+Each finished tile is checkpointed: its core is flushed in the mosaics and the tile is
+recorded in a manifest of the output directory, with the hash of its input window and
+of the parameters. A run interrupted by a failure, a crash or a cancel is resumed by
+running the same job again: the tiles already done are skipped.
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+from typing import Callable, List, Optional, TYPE_CHECKING
+
+from .BulldozerDtmProvider_Cache import get_cache_key
+from .BulldozerDtmProvider_Progress import ScaledFeedback
+
+# Default tile side (in pixels) used by the tiled mode
+DEFAULT_TILE_SIZE = 4096
+# Smallest tile side accepted by the tiled mode
+MIN_TILE_SIZE = 256
+# Bulldozer products that are mosaicked in tiled mode
+TILED_PRODUCTS = ("dtm.tif", "ndsm.tif")
+# Manifest of the tiles already done, in the output directory during a tiled run
+CHECKPOINT_FILE = "bulldozer_checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+# rasterio is imported on first use: this module is imported when the algorithms are registered
+if TYPE_CHECKING:
+    import rasterio
+    from rasterio.windows import Window
+
+
+class BulldozerTile:
+    """
+    Processing window of the tiled mode.
+
+    The core window is the part of the DTM written in the mosaic, the padded window
+    is the part of the DSM read by Bulldozer (core window + margin, clipped to the raster).
+    """
+
+    def __init__(self, index: int, core: "Window", padded: "Window"):
+        self.index = index
+        self.core = core
+        self.padded = padded
+
+    def core_in_padded(self) -> "Window":
+        """
+        :return: the core window expressed in the padded window referential
+        """
+        from rasterio.windows import Window  # pylint: disable=import-outside-toplevel
+        return Window(self.core.col_off - self.padded.col_off,
+                      self.core.row_off - self.padded.row_off,
+                      self.core.width,
+                      self.core.height)
+
+    def __repr__(self):
+        return f"BulldozerTile(index={self.index}, core={self.core}, padded={self.padded})"
+
+
+def compute_tiles(width: int, height: int, tile_size: int, margin: int) -> List[BulldozerTile]:
+    """
+    Split a raster into tiles.
+
+    :param width: raster width (pixels)
+    :param height: raster height (pixels)
+    :param tile_size: side of the core windows (pixels)
+    :param margin: overlap added around each core window (pixels)
+    :return: the list of tiles, row by row
+    """
+    from rasterio.windows import Window  # pylint: disable=import-outside-toplevel
+
+    tile_size = max(int(tile_size), MIN_TILE_SIZE)
+    margin = max(int(margin), 0)
+
+    tiles = []
+    for row_off in range(0, height, tile_size):
+        core_height = min(tile_size, height - row_off)
+        for col_off in range(0, width, tile_size):
+            core_width = min(tile_size, width - col_off)
+            core = Window(col_off, row_off, core_width, core_height)
+            tiles.append(BulldozerTile(len(tiles), core, pad_window(core, margin, width, height)))
+    return tiles
+
+
+def pad_window(window: "Window", margin: int, width: int, height: int) -> "Window":
+    """
+    Add a margin around a window, clipped to the raster.
+
+    :param window: window to pad
+    :param margin: margin added on each side (pixels)
+    :param width: raster width (pixels)
+    :param height: raster height (pixels)
+    :return: the padded window
+    """
+    from rasterio.windows import Window  # pylint: disable=import-outside-toplevel
+
+    left = max(int(window.col_off) - margin, 0)
+    top = max(int(window.row_off) - margin, 0)
+    right = min(int(window.col_off + window.width) + margin, width)
+    bottom = min(int(window.row_off + window.height) + margin, height)
+    return Window(left, top, right - left, bottom - top)
+
+
+def get_auto_margin(max_object_size: Optional[float], resolution: float) -> int:
+    """
+    Compute the default overlap between tiles.
+
+    Bulldozer needs to see a whole object to remove it: the margin is twice the
+    maximum object size, converted in pixels.
+
+    :param max_object_size: Bulldozer max_object_size parameter (meters)
+    :param resolution: planimetric resolution of the DSM (meters)
+    :return: the margin in pixels
+    """
+    if not max_object_size:
+        max_object_size = 16
+    return int(math.ceil(2 * float(max_object_size) / abs(resolution)))
+
+
+def get_tile_profile(dsm_profile: dict, window: "Window", transform) -> dict:
+    """
+    Build the GeoTIFF profile of a window of the DSM.
+
+    Bulldozer writes its products with the profile of its input DSM, so the tiles
+    are plain tiled GeoTIFF files whatever the input format.
+
+    :param dsm_profile: profile of the input DSM
+    :param window: window of the DSM
+    :param transform: affine transform of the window
+    :return: the window profile
+    """
+    profile = dsm_profile.copy()
+    for key in ("blockxsize", "blockysize", "tiled", "interleave", "compress", "photometric"):
+        profile.pop(key, None)
+    profile.update(driver="GTiff",
+                   width=int(window.width),
+                   height=int(window.height),
+                   transform=transform,
+                   tiled=True,
+                   blockxsize=256,
+                   blockysize=256)
+    return profile
+
+
+def write_window(src_path: str, window: "Window", dst_path: str):
+    """
+    Copy a window of a raster into a GeoTIFF file, block by block: the window can be
+    most of the raster (valid data footprint), the memory only depends on the block size.
+
+    :param src_path: path of the source raster
+    :param window: window of the source raster to copy
+    :param dst_path: path of the GeoTIFF file to write
+    """
+    # pylint: disable=import-outside-toplevel
+    import rasterio
+    from rasterio.windows import Window
+
+    with rasterio.open(src_path) as src:
+        profile = get_tile_profile(src.profile, window, src.window_transform(window))
+        with rasterio.open(dst_path, "w", **profile) as dst:
+            for _, block in dst.block_windows(1):
+                dst.write(src.read(window=Window(window.col_off + block.col_off,
+                                                 window.row_off + block.row_off,
+                                                 block.width, block.height)),
+                          window=block)
+
+
+def write_window_inputs(params: dict, window: "Window", dst_dir: str) -> dict:
+    """
+    Copy a window of the Bulldozer inputs (DSM and ground mask) into a directory.
+
+    :param params: Bulldozer parameters
+    :param window: window of the DSM to copy
+    :param dst_dir: directory of the window inputs, and output directory of its run
+    :return: the Bulldozer parameters of the window
+    """
+    window_params = dict(params)
+    window_params["dsm_path"] = os.path.join(dst_dir, "dsm.tif")
+    window_params["output_dir"] = dst_dir
+    write_window(params["dsm_path"], window, window_params["dsm_path"])
+    # The ground mask is on the DSM grid (see BulldozerDtmProvider_GroundMask)
+    if params.get("ground_mask_path"):
+        window_params["ground_mask_path"] = os.path.join(dst_dir, "ground_mask.tif")
+        write_window(params["ground_mask_path"], window, window_params["ground_mask_path"])
+    return window_params
+
+
+def create_mosaic(path: str, tile_product: str, dsm_profile: dict) -> "rasterio.io.DatasetWriter":
+    """
+    Create the full scene output raster, based on the profile of a tile product.
+
+    :param path: path of the mosaic to create
+    :param tile_product: path of a product computed on a tile
+    :param dsm_profile: profile of the input DSM (gives the scene grid)
+    :return: the mosaic dataset, opened in write mode
+    """
+    import rasterio  # pylint: disable=import-outside-toplevel
+
+    with rasterio.open(tile_product) as tile:
+        profile = tile.profile.copy()
+    profile.update(driver="GTiff",
+                   width=dsm_profile["width"],
+                   height=dsm_profile["height"],
+                   transform=dsm_profile["transform"],
+                   crs=dsm_profile["crs"],
+                   tiled=True,
+                   blockxsize=256,
+                   blockysize=256,
+                   BIGTIFF="IF_SAFER")
+    return rasterio.open(path, "w", **profile)
+
+
+def read_checkpoint(output_dir: str, checkpoint: dict) -> dict:
+    """
+    Read the checkpoint of a previous run of the same job.
+
+    :param output_dir: output directory of the run
+    :param checkpoint: checkpoint of the new run, without any tile done
+    :return: the input hash of the tiles already done, by index (as a string)
+    """
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as checkpoint_file:
+            previous = json.load(checkpoint_file)
+    except ValueError:
+        return {}
+    for key in ("version", "params_key", "grid", "tile_size", "margin"):
+        if previous.get(key) != checkpoint[key]:
+            return {}
+    # The tiles done are in the mosaics
+    if not all(os.path.isfile(os.path.join(output_dir, product))
+               for product in previous.get("products", ())):
+        return {}
+    checkpoint["products"] = previous.get("products", [])
+    return previous.get("tiles", {})
+
+
+def write_checkpoint(output_dir: str, checkpoint: dict):
+    """
+    Write the checkpoint of a run (the previous one is replaced atomically).
+    """
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(path + ".tmp", path)
+
+
+def run_tiled_dsm_to_dtm(params: dict, run_function: Callable, tile_size: int,
+                         margin: Optional[int], feedback, work_dir: Optional[str] = None) -> str:
+    """
+    Run Bulldozer window by window and mosaic the results, resuming from the checkpoint
+    of a previous run of the same job if there is one.
+
+    :param params: Bulldozer parameters (dsm_path and output_dir are required)
+    :param run_function: function running Bulldozer, called as run_function(feedback, **params),
+                         returning False if the run was canceled
+    :param tile_size: side of the core windows (pixels)
+    :param margin: overlap between windows (pixels), computed from max_object_size if None
+    :param feedback: QGIS processing feedback
+    :param work_dir: directory of the tiles (scratch), the output directory if None
+    :return: the path of the mosaicked DTM
+    """
+    import rasterio  # pylint: disable=import-outside-toplevel
+
+    dsm_path = params["dsm_path"]
+    output_dir = params["output_dir"]
+    keep_tiles = params.get("developer_mode", False)
+
+    with rasterio.open(dsm_path) as dsm:
+        dsm_profile = dsm.profile.copy()
+        resolution = dsm.res[0]
+
+    if margin is None:
+        margin = get_auto_margin(params.get("max_object_size"), resolution)
+
+    tiles = compute_tiles(dsm_profile["width"], dsm_profile["height"], tile_size, margin)
+    feedback.pushInfo(f"Tiled mode: {len(tiles)} tile(s) of {tile_size} pixels "
+                      f"with a {margin} pixels margin")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tiles_dir = os.path.join(work_dir or output_dir, "tiles")
+    os.makedirs(tiles_dir, exist_ok=True)
+
+    # The DSM is identified by the content of the tiles: a resumed run is not
+    # invalidated by a copy or a touch of the DSM
+    checkpoint = {"version": CHECKPOINT_VERSION,
+                  "params_key": get_cache_key(dict(params, dsm_path=None)),
+                  "grid": [dsm_profile["width"], dsm_profile["height"],
+                           list(dsm_profile["transform"])[:6]],
+                  "tile_size": tile_size,
+                  "margin": margin,
+                  "products": [],
+                  "tiles": {}}
+    tiles_done = read_checkpoint(output_dir, checkpoint)
+    if tiles_done:
+        feedback.pushInfo(f"Resuming a previous run: {len(tiles_done)} tile(s) already done")
+
+    try:
+        with rasterio.open(dsm_path) as dsm:
+            for tile in tiles:
+                if feedback.isCanceled():
+                    break
+
+                input_hash = hashlib.sha256(dsm.read(window=tile.padded).tobytes()).hexdigest()
+                if tiles_done.get(str(tile.index)) == input_hash:
+                    checkpoint["tiles"][str(tile.index)] = input_hash
+                    feedback.setProgress(100 * (tile.index + 1) / len(tiles))
+                    continue
+
+                # Run Bulldozer on the padded window
+                tile_dir = os.path.join(tiles_dir, f"tile_{tile.index:04d}")
+                os.makedirs(tile_dir, exist_ok=True)
+                tile_params = write_window_inputs(params, tile.padded, tile_dir)
+                completed = run_function(ScaledFeedback(feedback,
+                                                        100 * tile.index / len(tiles),
+                                                        100 * (tile.index + 1) / len(tiles)),
+                                         **tile_params)
+                # A canceled tile is not recorded: the resumed run computes it again
+                if completed is False or feedback.isCanceled():
+                    break
+                if not os.path.isfile(os.path.join(tile_dir, "dtm.tif")):
+                    raise RuntimeError(f"Bulldozer did not write the DTM of tile {tile.index}")
+
+                # Crop the margins and write the core in the mosaic, which is closed
+                # (flushed) before the tile is recorded in the checkpoint
+                for product in TILED_PRODUCTS:
+                    tile_product = os.path.join(tile_dir, product)
+                    if not os.path.isfile(tile_product):
+                        continue
+                    mosaic_path = os.path.join(output_dir, product)
+                    if product not in checkpoint["products"]:
+                        create_mosaic(mosaic_path, tile_product, dsm_profile).close()
+                        checkpoint["products"].append(product)
+                    with rasterio.open(tile_product) as src:
+                        data = src.read(window=tile.core_in_padded())
+                    with rasterio.open(mosaic_path, "r+") as mosaic:
+                        mosaic.write(data, window=tile.core)
+                checkpoint["tiles"][str(tile.index)] = input_hash
+                write_checkpoint(output_dir, checkpoint)
+
+                if not keep_tiles:
+                    shutil.rmtree(tile_dir, ignore_errors=True)
+
+                feedback.setProgress(100 * (tile.index + 1) / len(tiles))
+    finally:
+        if not keep_tiles:
+            shutil.rmtree(tiles_dir, ignore_errors=True)
+
+    # The checkpoint is only kept to resume an unfinished run
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if len(checkpoint["tiles"]) == len(tiles) and os.path.isfile(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return os.path.join(output_dir, "dtm.tif")
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+"""
+Code executed in the worker processes running Bulldozer outside of the QGIS process.
+
+This module must not import QGIS: it is imported by plain Python interpreters.
+It is also the entry point of the worker subprocess (see BulldozerDtmProvider_Engine):
+
+    python -m <plugin package>.BulldozerDtmProvider_Worker
+
+reads a JSON job on its standard input and writes JSON events, one per line,
+on its standard output.
+"""
+
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import traceback
+from typing import Optional, Tuple
+
+from .BulldozerDtmProvider_Profiling import RunProfiler
+from .BulldozerDtmProvider_Progress import StageMonitor
+from .import_bulldozer import get_dsm_to_dtm
+
+
+def get_python_executable() -> str:
+    """
+    Get the Python interpreter used to start worker processes.
+
+    Inside QGIS, sys.executable is the QGIS binary, not a Python interpreter.
+
+    :return: path of the Python interpreter
+    """
+    if os.name == "nt":
+        # nt = windows
+        return os.path.join(sys.exec_prefix, "python.exe")
+    if os.path.basename(sys.executable).startswith("python"):
+        return sys.executable
+    python_executable = os.path.join(sys.exec_prefix, "bin", "python3")
+    if os.path.isfile(python_executable):
+        return python_executable
+    return shutil.which("python3") or "python3"
+
+
+def get_mp_context():
+    """
+    Get the multiprocessing context used for the worker pools.
+
+    Workers are spawned (not forked from the QGIS process) with a real Python interpreter.
+
+    :return: the multiprocessing context
+    """
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(get_python_executable())
+    return context
+
+
+def init_pool_process():
+    """
+    Initializer of the job pool processes: each one leads its own process group, with the
+    Bulldozer processes it starts (see kill_pool_process).
+    """
+    if os.name != "nt":
+        os.setsid()
+
+
+def kill_pool_process(process):
+    """
+    Kill a job pool process and the Bulldozer processes it started.
+
+    :param process: the pool process (multiprocessing.Process)
+    """
+    if not process.is_alive():
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False,
+                       creationflags=subprocess.CREATE_NO_WINDOW)
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        # Killed before its initializer created the group
+        process.kill()
+
+
+def get_cpu_count() -> int:
+    """
+    :return: the number of cores available for the current process
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def split_worker_budget(nb_jobs: int, worker_budget: int, concurrent_jobs: int = 0,
+                        workers_per_job: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Share a global number of workers between concurrent Bulldozer jobs.
+
+    The returned values always satisfy concurrent_jobs * workers_per_job <= worker_budget.
+
+    :param nb_jobs: number of jobs to run
+    :param worker_budget: total number of workers (0 or less = all the available cores)
+    :param concurrent_jobs: number of jobs run at the same time (0 or less = automatic)
+    :param workers_per_job: number of Bulldozer workers requested for each job (None = automatic)
+    :return: the number of concurrent jobs and the number of Bulldozer workers per job
+    """
+    if worker_budget is None or worker_budget <= 0:
+        worker_budget = get_cpu_count()
+    nb_jobs = max(nb_jobs, 1)
+
+    if concurrent_jobs and concurrent_jobs > 0:
+        concurrent_jobs = min(concurrent_jobs, nb_jobs, worker_budget)
+        max_workers_per_job = worker_budget // concurrent_jobs
+        if workers_per_job:
+            workers_per_job = min(workers_per_job, max_workers_per_job)
+        else:
+            workers_per_job = max_workers_per_job
+    elif workers_per_job:
+        workers_per_job = min(workers_per_job, worker_budget)
+        concurrent_jobs = min(worker_budget // workers_per_job, nb_jobs)
+    else:
+        # As many concurrent jobs as possible, the remaining cores go to the jobs
+        concurrent_jobs = min(nb_jobs, worker_budget)
+        workers_per_job = worker_budget // concurrent_jobs
+
+    return max(concurrent_jobs, 1), max(workers_per_job, 1)
+
+
+def run_job(params: dict, stage_store: Optional[dict] = None) -> str:
+    """
+    Run the Bulldozer pipeline in a worker process.
+
+    :param params: Bulldozer parameters
+    :param stage_store: arguments of the store of the stage products (see
+                        BulldozerDtmProvider_Stages), None to run the Bulldozer pipeline as is
+    :return: path of the computed DTM
+    """
+    # Worker processes started from the QGIS GUI may have no standard streams
+    if sys.stdout is None:
+        sys.stdout = open(os.devnull, "w", encoding="utf-8")
+    if sys.stderr is None:
+        sys.stderr = open(os.devnull, "w", encoding="utf-8")
+
+    if stage_store is None:
+        get_dsm_to_dtm()(**params)
+    else:
+        # pylint: disable=import-outside-toplevel
+        from .BulldozerDtmProvider_Stages import run_staged_dsm_to_dtm, StageStore
+        run_staged_dsm_to_dtm(params, StageStore(**stage_store))
+    return os.path.join(params["output_dir"], "dtm.tif")
+
+
+class EventWriter:
+    """
+    Write the JSON events of the worker subprocess on the protocol stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def send(self, event: str, **data):
+        """
+        Write one event.
+
+        :param event: event type
+        :param data: event content (JSON serializable)
+        """
+        data["event"] = event
+        self.stream.write(json.dumps(data) + "\n")
+        self.stream.flush()
+
+
+class EventLogHandler(logging.Handler):
+    """
+    Forward the Bulldozer log records to the parent process.
+    """
+
+    def __init__(self, writer: EventWriter):
+        super().__init__(logging.DEBUG)
+        self.writer = writer
+        self.addFilter(logging.Filter("bulldozer"))
+
+    def emit(self, record):
+        try:
+            self.writer.send("log", level=record.levelname, message=record.getMessage())
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+
+
+def main():
+    """
+    Entry point of the worker subprocess.
+    """
+    job = json.load(sys.stdin)
+
+    # The standard output is kept for the events: everything else printed
+    # (Bulldozer, tqdm, ...) goes to the standard error
+    writer = EventWriter(sys.stdout)
+    sys.stdout = sys.stderr
+
+    # Attached to the root logger: Bulldozer removes its own handlers at the end of a run
+    handler = EventLogHandler(writer)
+    logging.getLogger().addHandler(handler)
+    profiler = RunProfiler(**job["profile"]) if job.get("profile") else contextlib.nullcontext()
+    try:
+        if job.get("config_path"):
+            with profiler, StageMonitor(writer.send):
+                get_dsm_to_dtm()(config_path=job["config_path"])
+            writer.send("result")
+        else:
+            with profiler, StageMonitor(writer.send):
+                dtm_path = run_job(job["params"], job.get("stage_store"))
+            writer.send("result", dtm_path=dtm_path)
+    except BaseException as e:  # pylint: disable=broad-except
+        writer.send("error", message=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+        sys.exit(1)
+    finally:
+        logging.getLogger().removeHandler(handler)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,17 +19,47 @@
 # See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
 # more details.
 
-import sys
 import contextlib
+import functools
+import os
+import sys
 
 from qgis.PyQt.QtCore import QCoreApplication
 from qgis.PyQt.QtGui import QIcon
 from qgis.core import (QgsProcessingAlgorithm,
-                       QgsRasterLayer,
-                       QgsProject)
+                       QgsProcessingContext,
+                       QgsProcessingException,
+                       QgsProcessingParameterBoolean,
+                       QgsProcessingParameterDefinition,
+                       QgsProcessingParameterNumber)
+
+from .BulldozerDtmProvider_Footprint import get_run_footprint
+from .BulldozerDtmProvider_Queue import get_job_queue
+from .BulldozerDtmProvider_Scratch import (check_free_space,
+                                           get_scratch_root,
+                                           make_work_dir)
+
+
+def is_headless():
+    """
+    :return: True if QGIS runs without its desktop interface (qgis_process, scripts)
+    """
+    from qgis import utils  # pylint: disable=import-outside-toplevel
+
+    return utils.iface is None
+
+
+@functools.lru_cache(maxsize=None)
+def get_plugin_icon():
+    """
+    :return: the icon of the plugin, the Qt resources are only loaded with the interface
+    """
+    if is_headless():
+        return QIcon()
+    # Initialize Qt resources from file resources.py
+    from . import resources  # pylint: disable=import-outside-toplevel,unused-import
+    return QIcon(':/plugins/bulldozerdtmprovider/img/bulldozer_logo.png')
 
-# Initialize Qt resources from file resources.py
-from .resources import *
 
 #TODO: remove suppress_stdout_if_none, suppress_stderr_if_none when tqdm bug on windows gui is fixed
 #TODO: See https://github.com/tqdm/tqdm/issues/794 for more information
@@ -72,6 +102,18 @@ class BulldozerDtmProviderAlgorithm(QgsProcessingAlgorithm):
     class.
     """
 
+    SUBMIT = 'SUBMIT'
+    PRIORITY = 'PRIORITY'
+    HEADLESS = 'HEADLESS'
+    CROP_FOOTPRINT = 'CROP_FOOTPRINT'
+    PROFILE = 'PROFILE'
+    PROFILE_MEMORY = 'PROFILE_MEMORY'
+
+    # Identifiers of the jobs submitted to the job queue by the run
+    queued_jobs = ()
+    # No output is added to the map (see prepareAlgorithm)
+    headless = False
+
     def displayName(self):
         """
         Returns the translated algorithm name, which should be used for any
@@ -95,9 +137,142 @@ class BulldozerDtmProviderAlgorithm(QgsProcessingAlgorithm):
     def createInstance(self):
         return BulldozerDtmProviderAlgorithm()
 
+    def add_headless_parameter(self):
+        """
+        Add the parameter disabling the addition of the outputs to the map
+        """
+        headless = QgsProcessingParameterBoolean(self.HEADLESS,
+                                                 self.tr('Headless run (do not add the DTM to '
+                                                         'the map)'),
+                                                 defaultValue=False,
+                                                 optional=True)
+        headless.setFlags(headless.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(headless)
+
+    def add_footprint_parameter(self):
+        """
+        Add the parameter cropping the DSM to its valid data before the run
+        """
+        footprint = QgsProcessingParameterBoolean(self.CROP_FOOTPRINT,
+                                                  self.tr('Only process the valid data footprint '
+                                                          'of the DSM (DTM padded with nodata)'),
+                                                  defaultValue=False,
+                                                  optional=True)
+        footprint.setFlags(footprint.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(footprint)
+
+    def add_profile_parameters(self):
+        """
+        Add the parameters profiling the run (see BulldozerDtmProvider_Profiling)
+        """
+        profile = QgsProcessingParameterBoolean(self.PROFILE,
+                                                self.tr('Profile the run (cProfile reports in '
+                                                        'the profile folder of the output)'),
+                                                defaultValue=False,
+                                                optional=True)
+        profile.setFlags(profile.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(profile)
+
+        profile_memory = QgsProcessingParameterBoolean(self.PROFILE_MEMORY,
+                                                       self.tr('Profile the allocations too '
+                                                               '(tracemalloc, slower)'),
+                                                       defaultValue=False,
+                                                       optional=True)
+        profile_memory.setFlags(profile_memory.flags()
+                                | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(profile_memory)
+
+    def get_footprint_options(self, parameters, context):
+        """
+        Get the execution options of a run on the valid data footprint of the DSM
+        (part of the cache key), empty if the whole DSM is processed. The footprint
+        itself is only computed on a cache miss (see get_run_footprint).
+        """
+        if not self.parameterAsBool(parameters, self.CROP_FOOTPRINT, context):
+            return {}
+        return {"crop_footprint": True}
+
+    @staticmethod
+    def get_run_footprint(dsm_path, execution_options, feedback):
+        """
+        Scan the DSM for the footprint of a run which is not restored from the cache
+
+        :return: the footprint window, None if the whole DSM is processed
+        """
+        footprint = get_run_footprint(dsm_path, execution_options)
+        if footprint is None and execution_options.get("crop_footprint"):
+            feedback.pushDebugInfo("Valid data footprint: the whole DSM is processed")
+        return footprint
+
+    def prepareAlgorithm(self, parameters, context, feedback):
+        """
+        Detect the headless runs: qgis_process, scripts or explicit parameter
+        """
+        self.headless = is_headless() or self.parameterAsBool(parameters, self.HEADLESS, context)
+        return True
+
+    def add_queue_parameters(self):
+        """
+        Add the parameters submitting the run to the job queue instead of running it
+        """
+        submit = QgsProcessingParameterBoolean(self.SUBMIT,
+                                               self.tr('Submit to the job queue instead of '
+                                                       'running now (see "Run job queue")'),
+                                               defaultValue=False,
+                                               optional=True)
+        submit.setFlags(submit.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(submit)
+
+        priority = QgsProcessingParameterNumber(self.PRIORITY,
+                                                self.tr('Job queue priority (highest first)'),
+                                                type=QgsProcessingParameterNumber.Integer,
+                                                defaultValue=0,
+                                                optional=True)
+        priority.setFlags(priority.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(priority)
+
+    def submit_jobs(self, parameters, context, jobs, feedback):
+        """
+        Submit jobs to the job queue
+
+        :param jobs: list of (Bulldozer parameters, execution options)
+        """
+        for params_for_bulldozer, _ in jobs:
+            # The temporary outputs are removed when QGIS closes
+            if "processing_" in params_for_bulldozer["output_dir"]:
+                raise QgsProcessingException(self.tr('An output directory is required to '
+                                                     'submit to the job queue'))
+
+        queue = get_job_queue()
+        priority = self.parameterAsInt(parameters, self.PRIORITY, context)
+        self.queued_jobs = [queue.submit(params_for_bulldozer, options, priority)
+                            for params_for_bulldozer, options in jobs]
+        feedback.pushInfo(f"{len(self.queued_jobs)} job(s) submitted to the job queue "
+                          f"{queue.db_path} with the priority {priority}: "
+                          f"{', '.join(str(job_id) for job_id in self.queued_jobs)}")
+
+    @staticmethod
+    def make_work_dir(params_for_bulldozer, execution_options=None):
+        """
+        Create the scratch directory of a run (see BulldozerDtmProvider_Scratch), after
+        checking the free space. The developer mode keeps everything in the output directory.
+
+        :return: a context manager giving the scratch directory, None without scratch folder
+        """
+        execution_options = execution_options or {}
+        scratch_root = None
+        if not params_for_bulldozer.get("developer_mode"):
+            scratch_root = get_scratch_root()
+        try:
+            check_free_space(params_for_bulldozer, scratch_root,
+                             execution_options.get("tile_size"),
+                             max(execution_options.get("tile_margin", 0), 0))
+        except ValueError as e:
+            raise QgsProcessingException(str(e)) from e
+        return make_work_dir(scratch_root)
 
     def icon(self):
-        return QIcon(':/plugins/bulldozerdtmprovider/img/bulldozer_logo.png')
+        return get_plugin_icon()
 
     def tags(self):
         return ['3d', 'bulldozer']
@@ -126,13 +301,15 @@ If you want to contribute or report an issue in the plugin, here is the reposito
 
     def postProcessAlgorithm(self, context, feedback):
         """
-        Add the DTM to the map
+        Add the DTM to the map: it is loaded by the Processing interface at the end of the
+        run (by the batches if requested), nothing is opened in headless runs
         """
-        rlayer = QgsRasterLayer(self.OUTPUT, "DTM")
-
-        if not rlayer.isValid():
-            print("Layer failed to load!")
+        if self.queued_jobs or self.headless or not os.path.isfile(self.OUTPUT):
+            return {}
 
-        QgsProject.instance().addMapLayer(rlayer)
+        context.addLayerToLoadOnCompletion(self.OUTPUT,
+                                           QgsProcessingContext.LayerDetails("DTM",
+                                                                             context.project(),
+                                                                             self.OUTPUT))
 
         return {self.OUTPUT: self.OUTPUT}
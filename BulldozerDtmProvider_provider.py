@@ -19,17 +19,23 @@
 # See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
 # more details.
 
-from qgis.core import QgsProcessingProvider
-from qgis.PyQt.QtGui import QIcon
+from qgis.core import Qgis, QgsMessageLog, QgsProcessingProvider
 from processing.core.ProcessingConfig import (ProcessingConfig, Setting)
 
+from .BulldozerDtmProvider_Cache import get_result_cache, DEFAULT_CACHE_SIZE
+
 from .BulldozerDtmProvider_Advanced_algorithm import BulldozerDtmProviderAdvancedAlgorithm
 from .BulldozerDtmProviderSettings import BulldozerDtmProviderSettings
 from .BulldozerDtmProvider_ConfigFile_algorithm import BulldozerDtmProviderConfigFileAlgorithm
 from .BulldozerDtmProvider_GenerateConfigFile import BulldozerDtmProviderGenerateConfigFile
-
-# Initialize Qt resources from file resources.py
-from .resources import *
+from .BulldozerDtmProvider_Batch_algorithm import BulldozerDtmProviderBatchAlgorithm
+from .BulldozerDtmProvider_Preview_algorithm import BulldozerDtmProviderPreviewAlgorithm
+from .BulldozerDtmProvider_Sweep_algorithm import BulldozerDtmProviderSweepAlgorithm
+from .BulldozerDtmProvider_RunQueue_algorithm import BulldozerDtmProviderRunQueueAlgorithm
+from .BulldozerDtmProvider_JobQueue_algorithm import BulldozerDtmProviderJobQueueAlgorithm
+from .BulldozerDtmProvider_Install_algorithm import BulldozerDtmProviderInstallAlgorithm
+from .BulldozerDtmProvider_algorithm import get_plugin_icon
+from .import_bulldozer import is_bulldozer_installed, NOT_INSTALLED_MESSAGE
 
 
 class BulldozerDtmProviderProvider(QgsProcessingProvider):
@@ -55,10 +61,69 @@ class BulldozerDtmProviderProvider(QgsProcessingProvider):
         ProcessingConfig.settingIcons[group] = self.icon()
         ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.ACTIVATE,
                                             self.tr('Activate'), True))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.SUBPROCESS,
+                                            self.tr('Run Bulldozer in a separate process '
+                                                    '(responsive and cancelable)'), True))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.CACHE_ACTIVATE,
+                                            self.tr('Reuse the results of identical runs '
+                                                    '(result cache)'), False))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.CACHE_FOLDER,
+                                            self.tr('Result cache folder (empty = QGIS profile)'),
+                                            '', valuetype=Setting.FOLDER))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.CACHE_MAX_SIZE,
+                                            self.tr('Result cache maximum size (MB)'),
+                                            DEFAULT_CACHE_SIZE))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.STAGES_ACTIVATE,
+                                            self.tr('Reuse the products of the pipeline stages '
+                                                    'whose parameters did not change '
+                                                    '(in the cache folder)'), False))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.QUEUE_FOLDER,
+                                            self.tr('Job queue folder (empty = QGIS profile)'),
+                                            '', valuetype=Setting.FOLDER))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.SCRATCH_FOLDER,
+                                            self.tr('Scratch folder of the intermediate files, '
+                                                    'e.g. on a fast local disk '
+                                                    '(empty = output directory)'),
+                                            '', valuetype=Setting.FOLDER))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.METRICS_FILE,
+                                            self.tr('Run metrics file (JSON lines, empty = '
+                                                    'BULLDOZER_METRICS_FILE environment '
+                                                    'variable)'),
+                                            '', valuetype=Setting.FILE))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.PROMETHEUS_FILE,
+                                            self.tr('Run metrics Prometheus textfile (*.prom, '
+                                                    'empty = BULLDOZER_PROMETHEUS_FILE '
+                                                    'environment variable)'),
+                                            '', valuetype=Setting.FILE))
+        ProcessingConfig.addSetting(Setting(group, BulldozerDtmProviderSettings.CACHE_PURGE,
+                                            self.tr('Purge the result cache'), False))
+        ProcessingConfig.readSettings()
+        self.purge_result_cache()
 
         self.addAlgorithm(BulldozerDtmProviderAdvancedAlgorithm())
         self.addAlgorithm(BulldozerDtmProviderConfigFileAlgorithm())
         self.addAlgorithm(BulldozerDtmProviderGenerateConfigFile())
+        self.addAlgorithm(BulldozerDtmProviderBatchAlgorithm())
+        self.addAlgorithm(BulldozerDtmProviderPreviewAlgorithm())
+        self.addAlgorithm(BulldozerDtmProviderSweepAlgorithm())
+        self.addAlgorithm(BulldozerDtmProviderRunQueueAlgorithm())
+        self.addAlgorithm(BulldozerDtmProviderJobQueueAlgorithm())
+        self.addAlgorithm(BulldozerDtmProviderInstallAlgorithm())
+
+        # Bulldozer itself is only imported by the first run
+        if not is_bulldozer_installed():
+            QgsMessageLog.logMessage(NOT_INSTALLED_MESSAGE, self.name(), Qgis.Warning)
+
+    @staticmethod
+    def purge_result_cache():
+        """
+        Purge the result cache if it has been requested in the settings
+        (the algorithms are reloaded when the settings are applied)
+        """
+        if not ProcessingConfig.getSetting(BulldozerDtmProviderSettings.CACHE_PURGE):
+            return
+        get_result_cache(force=True).purge()
+        ProcessingConfig.setSettingValue(BulldozerDtmProviderSettings.CACHE_PURGE, False)
 
     def validateBulldozerInstall(self, folder):
         """
@@ -91,7 +156,7 @@ class BulldozerDtmProviderProvider(QgsProcessingProvider):
         the Processing toolbox.
         """
 
-        return QIcon(':/plugins/bulldozerdtmprovider/img/bulldozer_logo.png')
+        return get_plugin_icon()
 
     def longName(self):
         """
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+End-to-end benchmark of the plugin.
+
+Synthetic DSMs of several sizes are generated, then the processing algorithms of
+the plugin are run headlessly through the QGIS processing registry. The wall-clock
+time, the peak resident memory (QGIS process and Bulldozer workers), a checksum of
+each DTM and its error against the synthetic terrain are written in a JSON report,
+which can be compared with the report of another commit. Run it with the Python
+interpreter of QGIS:
+
+    python benchmark/run_benchmark.py --sizes 1000,5000 --output report.json
+    python benchmark/run_benchmark.py --output new.json --compare old.json
+    python benchmark/run_benchmark.py --algorithms advanced,advanced_pyramid
+
+The plugin folder must be named as the plugin package (BulldozerDtmProvider).
+"""
+
+import argparse
+import datetime
+import hashlib
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic_dsm import generate_dsm, get_terrain
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_PACKAGE = os.path.basename(PLUGIN_DIR)
+
+DEFAULT_SIZES = (1000, 5000, 10000, 20000)
+# Benchmarked algorithms: name -> processing algorithm name
+ALGORITHMS = {
+    "advanced": "Bulldozer",
+    "generate_config": "Bulldozer (Generate config file)",
+    "config_file": "Bulldozer (Using config file)",
+    "advanced_pyramid": "Bulldozer",
+}
+# Parameters of the benchmarked algorithms, in addition to the input and output
+ALGORITHM_PARAMETERS = {
+    "advanced_pyramid": {"PYRAMID_LEVELS": 2},
+}
+# Delay between two memory measurements (seconds)
+SAMPLING_DELAY = 0.2
+
+
+class PeakRssSampler:
+    """
+    Measure the peak resident memory of the process and of its children in a thread.
+    """
+
+    def __init__(self, get_rss):
+        self.get_rss = get_rss
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self.get_rss())
+            self._stop.wait(SAMPLING_DELAY)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+
+def get_raster_checksum(path):
+    """
+    :return: SHA-256 of the pixel values of a raster (independent of the file metadata)
+    """
+    import rasterio  # pylint: disable=import-outside-toplevel
+
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with rasterio.open(path) as src:
+        for _, window in src.block_windows(1):
+            digest.update(src.read(window=window).tobytes())
+    return digest.hexdigest()
+
+
+def get_dtm_rmse(path):
+    """
+    :return: root mean square error of a DTM against the terrain of the synthetic DSM (m)
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import rasterio
+
+    if not os.path.isfile(path):
+        return None
+    squared_error, count = 0.0, 0
+    with rasterio.open(path) as src:
+        resolution = src.res[0]
+        for _, window in src.block_windows(1):
+            dtm = src.read(1, window=window, masked=True)
+            x = (np.arange(window.col_off, window.col_off + window.width,
+                           dtype=np.float32) * resolution)[None, :]
+            y = (np.arange(window.row_off, window.row_off + window.height,
+                           dtype=np.float32) * resolution)[:, None]
+            error = dtm - get_terrain(x, y)
+            squared_error += float((error ** 2).sum())
+            count += int(error.count())
+    return (squared_error / count) ** 0.5 if count else None
+
+
+def get_commit():
+    """
+    :return: the current git commit of the plugin, None outside of a git repository
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PLUGIN_DIR, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_qgis():
+    """
+    Start a headless QGIS application with the processing framework and the plugin provider.
+
+    :return: the QGIS application, the plugin modules and the provider registration time
+    """
+    # pylint: disable=import-outside-toplevel
+    from qgis.core import QgsApplication
+
+    if os.environ.get("QGIS_PREFIX_PATH"):
+        QgsApplication.setPrefixPath(os.environ["QGIS_PREFIX_PATH"], True)
+    application = QgsApplication([], False)
+    application.initQgis()
+    sys.path.append(os.path.join(QgsApplication.pkgDataPath(), "python", "plugins"))
+    from processing.core.Processing import Processing
+    Processing.initialize()
+
+    # Plugin bootstrap: import and registration of the provider
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    start = time.perf_counter()
+    provider_module = importlib.import_module(f"{PLUGIN_PACKAGE}.BulldozerDtmProvider_provider")
+    provider = provider_module.BulldozerDtmProviderProvider()
+    QgsApplication.processingRegistry().addProvider(provider)
+    startup = time.perf_counter() - start
+
+    progress_module = importlib.import_module(f"{PLUGIN_PACKAGE}.BulldozerDtmProvider_Progress")
+    return application, provider, progress_module, startup
+
+
+def run_algorithm(provider, name, parameters, get_rss):
+    """
+    Run a processing algorithm of the plugin and measure it.
+
+    :return: the algorithm results, the wall-clock time and the peak resident memory
+    """
+    # pylint: disable=import-outside-toplevel
+    import processing
+    from qgis.core import QgsProcessingFeedback
+
+    algorithm_id = f"{provider.id()}:{ALGORITHMS[name]}"
+    with PeakRssSampler(get_rss) as sampler:
+        start = time.perf_counter()
+        results = processing.run(algorithm_id, parameters, feedback=QgsProcessingFeedback())
+        wall = time.perf_counter() - start
+    return results, wall, sampler.peak_rss
+
+
+def run_benchmark(sizes, algorithms, work_dir):
+    """
+    Run the benchmark.
+
+    :param sizes: sizes of the synthetic DSMs (pixels)
+    :param algorithms: names of the benchmarked algorithms (see ALGORITHMS)
+    :param work_dir: folder of the DSMs and of the outputs
+    :return: the report
+    """
+    application, provider, progress_module, startup = start_qgis()
+    get_rss = progress_module.get_rss
+
+    report = {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+              "commit": get_commit(),
+              "platform": platform.platform(),
+              "python": platform.python_version(),
+              "cpu_count": os.cpu_count(),
+              "startup": startup,
+              "results": []}
+
+    for size in sizes:
+        dsm_path = os.path.join(work_dir, f"dsm_{size}.tif")
+        if not os.path.isfile(dsm_path):
+            print(f"Generating a {size}x{size} DSM")
+            generate_dsm(dsm_path, size)
+
+        config_path = os.path.join(work_dir, f"config_{size}.yaml")
+        for name in algorithms:
+            output_dir = os.path.join(work_dir, f"{name}_{size}")
+            os.makedirs(output_dir, exist_ok=True)
+            if name == "config_file":
+                if not os.path.isfile(config_path):
+                    raise RuntimeError("The config_file benchmark needs the generate_config one")
+                parameters = {"INPUT": config_path}
+            else:
+                parameters = {"INPUT": dsm_path, "OUTPUT_DIR": output_dir}
+                parameters.update(ALGORITHM_PARAMETERS.get(name, {}))
+                if name == "generate_config":
+                    parameters["CONFIG_FILE"] = config_path
+
+            print(f"Running {name} on the {size}x{size} DSM")
+            _, wall, peak_rss = run_algorithm(provider, name, parameters, get_rss)
+            dtm_checksum, dtm_rmse = None, None
+            if name != "generate_config":
+                dtm_output_dir = os.path.join(work_dir, f"generate_config_{size}") \
+                    if name == "config_file" else output_dir
+                dtm_checksum = get_raster_checksum(os.path.join(dtm_output_dir, "dtm.tif"))
+                dtm_rmse = get_dtm_rmse(os.path.join(dtm_output_dir, "dtm.tif"))
+            report["results"].append({"algorithm": name,
+                                      "size": size,
+                                      "wall": wall,
+                                      "peak_rss": peak_rss,
+                                      "dtm_checksum": dtm_checksum,
+                                      "dtm_rmse": dtm_rmse})
+
+    application.exitQgis()
+    return report
+
+
+def print_report(report):
+    """
+    Print the runtime and the accuracy of the runs of a report (e.g. the pyramid mode
+    against the single level runs).
+    """
+    print(f"{'Algorithm':<18}{'Size':>8}{'Wall (s)':>12}{'RMSE (m)':>12}")
+    for result in report["results"]:
+        rmse = result.get("dtm_rmse")
+        print(f"{result['algorithm']:<18}{result['size']:>8}{result['wall']:>12.1f}"
+              f"{rmse if rmse is not None else float('nan'):>12.3f}")
+
+
+def compare_reports(previous, current):
+    """
+    Print the differences between two benchmark reports.
+    """
+    print(f"Startup: {previous['startup']:.3f} s -> {current['startup']:.3f} s")
+    previous_results = {(result["algorithm"], result["size"]): result
+                        for result in previous["results"]}
+    print(f"{'Algorithm':<18}{'Size':>8}{'Wall ratio':>12}{'RSS ratio':>12}  Same DTM")
+    for result in current["results"]:
+        old = previous_results.get((result["algorithm"], result["size"]))
+        if old is None:
+            continue
+        print(f"{result['algorithm']:<18}{result['size']:>8}"
+              f"{result['wall'] / max(old['wall'], 1e-9):>12.2f}"
+              f"{result['peak_rss'] / max(old['peak_rss'], 1):>12.2f}"
+              f"  {result['dtm_checksum'] == old['dtm_checksum']}")
+
+
+def main():
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Benchmark of the Bulldozer QGIS plugin")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma separated sizes of the synthetic DSMs (pixels)")
+    parser.add_argument("--algorithms", default=",".join(ALGORITHMS),
+                        help=f"comma separated algorithms among {', '.join(ALGORITHMS)}")
+    parser.add_argument("--work-dir", help="folder of the DSMs and outputs (default: temporary)")
+    parser.add_argument("--output", default="benchmark_report.json", help="JSON report")
+    parser.add_argument("--compare", help="previous JSON report to compare with")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    algorithms = [name for name in args.algorithms.split(",") if name]
+    for name in algorithms:
+        if name not in ALGORITHMS:
+            parser.error(f"Unknown algorithm {name}")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bulldozer_benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    report = run_benchmark(sizes, algorithms, work_dir)
+
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Report written in {args.output}")
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare) as previous:
+            compare_reports(json.load(previous), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# coding: utf8
+#
+# Copyright (c) 2023-2025 Centre National d'Etudes Spatiales (CNES).
+#
+# This file is part of Bulldozer
+# (see https://github.com/CNES/bulldozer-qgis-plugin).
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
+# more details.
+
+
+"""
+Synthetic DSM generator for the benchmarks.
+
+The DSM is a smooth terrain with rectangular buildings and round trees, written
+block by block so that large scenes (20k x 20k pixels) need little memory. A given
+size and seed always give the same DSM.
+
+    python synthetic_dsm.py <size> <output.tif> [--seed <seed>]
+"""
+
+import argparse
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+NODATA = -32768.0
+# Objects density (one per area, in square meters)
+BUILDING_AREA = 4000
+TREE_AREA = 3000
+
+
+def get_terrain(x, y):
+    """
+    :return: terrain elevation at the given coordinates (meters)
+    """
+    return (100 + 20 * np.sin(x / 500) * np.cos(y / 700) + 0.01 * x).astype(np.float32)
+
+
+def generate_dsm(path: str, size: int, resolution: float = 1.0, seed: int = 0,
+                 block_rows: int = 512):
+    """
+    Write a synthetic DSM.
+
+    :param path: path of the GeoTIFF to write
+    :param size: width and height of the DSM (pixels)
+    :param resolution: pixel size (meters)
+    :param seed: random seed
+    :param block_rows: number of rows generated at once
+    """
+    rng = np.random.default_rng(seed)
+    area = (size * resolution) ** 2
+
+    nb_buildings = int(area // BUILDING_AREA)
+    buildings = np.stack([rng.integers(0, size, nb_buildings),                    # column
+                          rng.integers(0, size, nb_buildings),                    # row
+                          rng.integers(8, 40, nb_buildings) / resolution,         # width
+                          rng.integers(8, 40, nb_buildings) / resolution,         # height
+                          rng.uniform(5, 30, nb_buildings)], axis=1)              # elevation
+
+    nb_trees = int(area // TREE_AREA)
+    trees = np.stack([rng.integers(0, size, nb_trees),                            # column
+                      rng.integers(0, size, nb_trees),                            # row
+                      rng.integers(2, 6, nb_trees) / resolution,                  # radius
+                      rng.uniform(4, 15, nb_trees)], axis=1)                      # elevation
+
+    profile = {"driver": "GTiff", "width": size, "height": size, "count": 1,
+               "dtype": "float32", "nodata": NODATA, "crs": "EPSG:32631",
+               "transform": from_origin(500000, 4800000, resolution, resolution),
+               "tiled": True, "blockxsize": 512, "blockysize": 512, "compress": "deflate",
+               "BIGTIFF": "IF_SAFER"}
+
+    x = (np.arange(size, dtype=np.float32) * resolution)[None, :]
+    with rasterio.open(path, "w", **profile) as dst:
+        for row_off in range(0, size, block_rows):
+            rows = min(block_rows, size - row_off)
+            y = (np.arange(row_off, row_off + rows, dtype=np.float32) * resolution)[:, None]
+            ground = get_terrain(x, y)
+            block = ground.copy()
+
+            for col, row, width, height, elevation in buildings[
+                    (buildings[:, 1] < row_off + rows)
+                    & (buildings[:, 1] + buildings[:, 3] > row_off)]:
+                rows_slice = slice(max(int(row) - row_off, 0),
+                                   max(int(row + height) - row_off, 0))
+                cols_slice = slice(int(col), int(col + width))
+                block[rows_slice, cols_slice] = np.maximum(block[rows_slice, cols_slice],
+                                                           ground[rows_slice, cols_slice]
+                                                           + elevation)
+
+            for col, row, radius, elevation in trees[(trees[:, 1] - trees[:, 2] < row_off + rows)
+                                                     & (trees[:, 1] + trees[:, 2] > row_off)]:
+                top, bottom = int(row - radius), int(row + radius) + 1
+                left, right = max(int(col - radius), 0), min(int(col + radius) + 1, size)
+                rows_slice = slice(max(top - row_off, 0), max(min(bottom - row_off, rows), 0))
+                rr, cc = np.ogrid[rows_slice, left:right]
+                canopy = elevation * (1 - ((rr + row_off - row) ** 2 + (cc - col) ** 2)
+                                      / radius ** 2)
+                block[rows_slice, left:right] = np.maximum(block[rows_slice, left:right],
+                                                           ground[rows_slice, left:right]
+                                                           + canopy)
+
+            block += rng.normal(0, 0.1, block.shape).astype(np.float32)
+            dst.write(block, 1, window=Window(0, row_off, size, rows))
+
+
+def main():
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Generate a synthetic DSM")
+    parser.add_argument("size", type=int, help="width and height (pixels)")
+    parser.add_argument("output", help="output GeoTIFF")
+    parser.add_argument("--resolution", type=float, default=1.0, help="pixel size (meters)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+    generate_dsm(args.output, args.size, args.resolution, args.seed)
+
+
+if __name__ == "__main__":
+    main()
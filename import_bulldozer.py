@@ -19,90 +19,111 @@
 # See https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html for
 # more details.
 
+"""
+Lazy access to the Bulldozer package.
+
+Importing Bulldozer pulls numpy, rasterio and the whole pipeline: it is done on the
+first run of an algorithm, never when QGIS loads the plugin. If Bulldozer is not
+available in the QGIS Python environment, it is looked for in the plugin folder,
+where the "Install Bulldozer" algorithm installs it.
+"""
+
+import functools
 import importlib
+import importlib.util
 import os
-import subprocess
 import sys
-import pip
-
-
-def setup_bulldozer():
+from typing import List
+
+from .BulldozerDtmProvider_ParamsCatalogue import get_catalogue_mismatch, BULLDOZER_VERSION
+
+# Name of the Bulldozer package on PyPI
+BULLDOZER_PACKAGE = "bulldozer-dtm"
+# Version installed by the "Install Bulldozer" algorithm: the one of the parameter catalogue
+BULLDOZER_REQUIREMENT = f"{BULLDOZER_PACKAGE}=={BULLDOZER_VERSION}"
+NOT_INSTALLED_MESSAGE = ("Bulldozer is not installed: run the \"Install Bulldozer\" algorithm "
+                         "of the Bulldozer provider")
+
+
+def get_venv_folder() -> str:
+    """
+    :return: folder where the plugin installs Bulldozer
+    """
+    return os.path.join(os.path.dirname(__file__), "bulldozer-dtm_venv")
+
+
+def add_venv_to_path():
+    """
+    Make the Bulldozer installed in the plugin folder importable. An installation
+    in the QGIS Python environment keeps the priority.
+    """
+    venv_folder = get_venv_folder()
+    if venv_folder in sys.path:
+        return
+    scripts_folder = os.path.join(venv_folder, "Scripts" if os.name == "nt" else "local/bin")
+    os.environ["PATH"] += os.pathsep + scripts_folder
+    sys.path.append(venv_folder)
+
+
+def is_bulldozer_installed() -> bool:
+    """
+    Check that Bulldozer can be imported, without importing it.
+    """
+    add_venv_to_path()
+    importlib.invalidate_caches()
+    return importlib.util.find_spec("bulldozer") is not None
+
+
+def import_bulldozer_module(module_name: str):
+    """
+    Import a Bulldozer module.
+
+    :param module_name: module name, e.g. "bulldozer.utils.config_parser"
+    :return: the module
+    """
+    add_venv_to_path()
     try:
-        from bulldozer.pipeline.bulldozer_pipeline import dsm_to_dtm
-        return dsm_to_dtm
-    except ImportError:
-        print("Bulldozer not found in current python path, trying to find it...")
-        venv_folder = os.path.join(os.path.dirname(__file__), "bulldozer-dtm_venv")
-
-        scripts_folder = os.path.join(venv_folder, "Scripts" if os.name == "nt" else "local/bin")
-
-        # Ajouter le dossier venv au PATH et à sys.path
-        os.environ["PATH"] += os.pathsep + scripts_folder
-
-        # Ajouter le chemin au sys.path si nécessaire
-        if venv_folder not in sys.path:
-            sys.path.insert(0, venv_folder)
-
-        try:
-            from bulldozer.pipeline.bulldozer_pipeline import dsm_to_dtm
-            print("Import Bulldozer-dtm OK")
-            return dsm_to_dtm
-        except (ImportError, ModuleNotFoundError):
-
-            print("Bulldozer not found in bulldozer-dtm subdir, trying to install it...")
-            os.makedirs(venv_folder, exist_ok=True)
-
-
-            python_executable = os.path.join(sys.prefix, "python.exe") if os.name == "nt" else "python"
-            # nt = windows
-            if os.name == "nt":
-
-                subprocess.check_call([
-                    python_executable,
-                    "-m",
-                    "pip",
-                    "install",
-                    "--target",
-                    venv_folder,
-                    "bulldozer-dtm"
-                ])
-
-            else:
-                pip.main(["install", "--target", venv_folder, "bulldozer-dtm"])
-
-            # Forcer le rechargement des modules
-            importlib.invalidate_caches()
-            if "bulldozer" in sys.modules:
-                del sys.modules["bulldozer"]
-            sys.path.insert(0, venv_folder)
-
-            try:
-                from bulldozer.pipeline.bulldozer_pipeline import dsm_to_dtm
-                print("Import Bulldozer-dtm OK")
-                return dsm_to_dtm
-            except (ImportError, ModuleNotFoundError):
-
-                print("Can't import bulldozer from new installation in bulldozer-dtm, "
-                    "trying force it...")
-
-                spec = importlib.util.spec_from_file_location("bulldozer",
-                                                              os.path.join(venv_folder,
-                                                                           "bulldozer",
-                                                                           "__init__.py"))
-                foo = importlib.util.module_from_spec(spec)
-                sys.modules["bulldozer"] = foo
-
-                # Forcer le rechargement des modules
-                importlib.invalidate_caches()
-                spec.loader.exec_module(foo)
-                try:
-                    import bulldozer
-                    from bulldozer.pipeline.bulldozer_pipeline import dsm_to_dtm
-                    print("Import Bulldozer-dtm OK")
-                    return dsm_to_dtm
-                except ImportError:
-                    print("Failed to import Bulldozer even after installation.")
-                    raise
-
-# Initialiser Bulldozer
-dsm_to_dtm = setup_bulldozer()
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise ImportError(f"{NOT_INSTALLED_MESSAGE} ({e})") from e
+
+
+@functools.lru_cache(maxsize=None)
+def import_bulldozer_pipeline():
+    """
+    Import the Bulldozer pipeline, once per process, after checking that the installed
+    Bulldozer has the parameters of the plugin catalogue (see BulldozerDtmProvider_ParamsCatalogue).
+
+    :return: the bulldozer.pipeline.bulldozer_pipeline module
+    :raise ImportError: if Bulldozer is not installed or if its parameters do not match
+    """
+    pipeline = import_bulldozer_module("bulldozer.pipeline.bulldozer_pipeline")
+    installed = import_bulldozer_module("bulldozer.pipeline.bulldozer_parameters")
+    mismatch = get_catalogue_mismatch(installed.bulldozer_pipeline_params)
+    if mismatch:
+        version = getattr(import_bulldozer_module("bulldozer"), "__version__", "unknown")
+        raise ImportError(f"The installed Bulldozer (version {version}) does not match the "
+                          f"parameters of the plugin, those of Bulldozer {BULLDOZER_VERSION} "
+                          f"(different parameters: {', '.join(mismatch)}): run the \"Install "
+                          f"Bulldozer\" algorithm with {BULLDOZER_REQUIREMENT}")
+    return pipeline
+
+
+def get_dsm_to_dtm():
+    """
+    Import the Bulldozer pipeline, once per process.
+
+    :return: the bulldozer dsm_to_dtm function
+    """
+    return import_bulldozer_pipeline().dsm_to_dtm
+
+
+def get_install_command(python_executable: str,
+                        package: str = BULLDOZER_REQUIREMENT) -> List[str]:
+    """
+    :param python_executable: Python interpreter running pip
+    :param package: pip requirement to install (e.g. "bulldozer-dtm==1.3.1")
+    :return: the command line installing Bulldozer in the plugin folder
+    """
+    return [python_executable, "-m", "pip", "install", "--upgrade", "--no-input",
+            "--disable-pip-version-check", "--target", get_venv_folder(), package]
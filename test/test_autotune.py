@@ -0,0 +1,43 @@
+# coding=utf-8
+"""Tests for the automatic execution settings."""
+
+import unittest
+
+from ..BulldozerDtmProvider_AutoTune import auto_tune, MIN_TILE_SIZE
+
+GB = 2 ** 30
+
+
+class AutoTuneTest(unittest.TestCase):
+    """Test the choice of the number of workers and of the tiling"""
+
+    def test_small_dsm_uses_all_cores(self):
+        """A DSM fitting in memory is not tiled and uses all the cores"""
+        decision = auto_tune(2000, 2000, 4, 64, cpu_count=16, available_memory=32 * GB)
+        self.assertEqual(decision.nb_workers, 16)
+        self.assertFalse(decision.tiled)
+        self.assertLessEqual(decision.estimated_memory, decision.memory_budget)
+
+    def test_large_dsm_is_tiled_under_budget(self):
+        """A DSM too large for the memory is tiled, within the memory budget"""
+        decision = auto_tune(40000, 40000, 4, 64, cpu_count=16, available_memory=16 * GB)
+        self.assertTrue(decision.tiled)
+        self.assertEqual(decision.tile_size % MIN_TILE_SIZE, 0)
+        self.assertGreaterEqual(decision.tile_size, MIN_TILE_SIZE)
+        self.assertLessEqual(decision.estimated_memory, decision.memory_budget)
+
+    def test_low_memory_reduces_workers(self):
+        """Worker overheads cannot exhaust a small memory"""
+        decision = auto_tune(1000, 1000, 4, 64, cpu_count=64, available_memory=2 * GB)
+        self.assertLess(decision.nb_workers, 64)
+        self.assertGreaterEqual(decision.nb_workers, 1)
+
+    def test_unknown_memory(self):
+        """Without memory information, all the cores are used without tiling"""
+        decision = auto_tune(40000, 40000, 4, 64, cpu_count=8, available_memory=None)
+        self.assertEqual(decision.nb_workers, 8)
+        self.assertFalse(decision.tiled)
+
+
+if __name__ == '__main__':
+    unittest.main()
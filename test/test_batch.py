@@ -0,0 +1,75 @@
+# coding=utf-8
+"""Tests for the batch algorithm."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from .. import BulldozerDtmProvider_RunQueue_algorithm
+from ..BulldozerDtmProvider_Batch_algorithm import BulldozerDtmProviderBatchAlgorithm
+from ..BulldozerDtmProvider_Queue import BulldozerJobQueue
+from ..BulldozerDtmProvider_RunQueue_algorithm import BulldozerDtmProviderRunQueueAlgorithm
+from .test_tiling import DummyFeedback
+
+
+def mock_parameters(algorithm):
+    """Read the parameters of the algorithm from a dict, without a processing context"""
+    for method, default in (("parameterAsBool", False),
+                            ("parameterAsInt", 0),
+                            ("parameterAsString", "")):
+        setattr(algorithm, method,
+                lambda params, name, context, default=default: params.get(name, default))
+
+
+class BatchAlgorithmTest(unittest.TestCase):
+    """Test the outputs of the batch algorithm"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_outputs(self):
+        """The DTMs of the successful jobs are returned under the output id"""
+        algorithm = BulldozerDtmProviderBatchAlgorithm()
+        parameters = {algorithm.OUTPUT_DIR: self.tmp_dir}
+        mock_parameters(algorithm)
+        jobs = [{"dsm_path": os.path.join(self.tmp_dir, f"dsm_{index}.tif"),
+                 "nb_max_workers": 2} for index in range(3)]
+
+        def run_pool(function, jobs, concurrent_jobs, feedback):
+            for index, job in enumerate(jobs):
+                if index == 1:
+                    yield job, None, RuntimeError("broken")
+                else:
+                    yield job, job["dsm_path"].replace("dsm", "dtm"), None
+
+        with mock.patch.object(algorithm, "get_jobs", return_value=jobs), \
+                mock.patch.object(algorithm, "run_pool", run_pool):
+            results = algorithm.processAlgorithm(parameters, None, DummyFeedback())
+
+        dtm_paths = [os.path.join(self.tmp_dir, "dtm_0.tif"),
+                     os.path.join(self.tmp_dir, "dtm_2.tif")]
+        self.assertEqual(algorithm.OUTPUT, "OUTPUT")
+        self.assertEqual(results, {"OUTPUT": dtm_paths, algorithm.OUTPUT_DIR: self.tmp_dir})
+        self.assertEqual(algorithm.postProcessAlgorithm(None, DummyFeedback()),
+                         {"OUTPUT": dtm_paths})
+
+    def test_empty_queue(self):
+        """Running an empty job queue returns no DTM"""
+        algorithm = BulldozerDtmProviderRunQueueAlgorithm()
+        mock_parameters(algorithm)
+        queue = BulldozerJobQueue(os.path.join(self.tmp_dir, "queue.sqlite"))
+        with mock.patch.object(BulldozerDtmProvider_RunQueue_algorithm, "get_job_queue",
+                               return_value=queue):
+            results = algorithm.processAlgorithm({}, None, DummyFeedback())
+
+        self.assertEqual(results, {"OUTPUT": []})
+        self.assertEqual(algorithm.postProcessAlgorithm(None, DummyFeedback()), {"OUTPUT": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# coding=utf-8
+"""Tests for the result cache."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from ..BulldozerDtmProvider_Cache import BulldozerResultCache, get_cache_key
+
+
+class CacheTest(unittest.TestCase):
+    """Test the result cache"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        with open(self.dsm_path, "wb") as dsm:
+            dsm.write(b"dsm")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_output(self, name, size):
+        """Create an output directory containing a fake DTM"""
+        output_dir = os.path.join(self.tmp_dir, name)
+        os.makedirs(output_dir)
+        with open(os.path.join(output_dir, "dtm.tif"), "wb") as dtm:
+            dtm.write(b"0" * size)
+        return output_dir
+
+    def test_key_normalization(self):
+        """Default values, number types and execution parameters do not change the key"""
+        params = {"dsm_path": self.dsm_path, "output_dir": "a"}
+        key = get_cache_key(params)
+        self.assertEqual(key, get_cache_key(dict(params, output_dir="b", nb_max_workers=2)))
+        self.assertEqual(key, get_cache_key(dict(params, max_object_size=16)))
+        self.assertNotEqual(key, get_cache_key(dict(params, max_object_size=32)))
+        self.assertNotEqual(key, get_cache_key(params, {"tile_size": 1024}))
+
+    def test_key_changes_with_dsm(self):
+        """Modifying the DSM changes the key"""
+        params = {"dsm_path": self.dsm_path}
+        key = get_cache_key(params)
+        with open(self.dsm_path, "ab") as dsm:
+            dsm.write(b"modified")
+        self.assertNotEqual(key, get_cache_key(params))
+
+    def test_key_of_written_ground_mask(self):
+        """The ground mask written in the output directory is given by its key, not its path"""
+        path_keys, keys = [], []
+        for name in ("a", "b"):
+            output_dir = self.write_output(name, 1)
+            mask_path = os.path.join(output_dir, "input_ground_mask.tif")
+            with open(mask_path, "wb") as mask:
+                mask.write(name.encode("utf8"))
+            params = {"dsm_path": self.dsm_path, "output_dir": output_dir,
+                      "ground_mask_path": mask_path}
+            path_keys.append(get_cache_key(params))
+            keys.append(get_cache_key(params, {"ground_mask": "mask"}))
+        self.assertNotEqual(path_keys[0], path_keys[1])
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], get_cache_key(params, {"ground_mask": "other"}))
+
+    def test_store_restore(self):
+        """A stored result is restored in another output directory"""
+        cache = BulldozerResultCache(os.path.join(self.tmp_dir, "cache"), 2 ** 20)
+        self.assertEqual(cache.restore("abcd", os.path.join(self.tmp_dir, "out")), [])
+        cache.store("abcd", self.write_output("run", 10))
+        restored = cache.restore("abcd", os.path.join(self.tmp_dir, "out"))
+        self.assertEqual(restored, [os.path.join(self.tmp_dir, "out", "dtm.tif")])
+        self.assertEqual(os.path.getsize(restored[0]), 10)
+
+    def test_lru_eviction(self):
+        """The least recently used entries are evicted when the cache is full"""
+        cache = BulldozerResultCache(os.path.join(self.tmp_dir, "cache"), 2500)
+        cache.store("aaaa", self.write_output("run_a", 1000))
+        cache.store("bbbb", self.write_output("run_b", 1000))
+        # "aaaa" becomes the most recently used entry
+        time.sleep(0.01)
+        cache.restore("aaaa", os.path.join(self.tmp_dir, "out"))
+        cache.store("cccc", self.write_output("run_c", 1000))
+        entries = sorted(os.path.basename(entry) for _, _, entry in cache.get_entries())
+        self.assertEqual(entries, ["aaaa", "cccc"])
+
+        cache.purge()
+        self.assertEqual(cache.get_entries(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
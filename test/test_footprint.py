@@ -0,0 +1,115 @@
+# coding=utf-8
+"""Tests for the extraction on the valid data footprint."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from ..BulldozerDtmProvider_Footprint import (get_footprint_window,
+                                              get_run_footprint,
+                                              get_valid_window,
+                                              run_footprint_dsm_to_dtm,
+                                              FOOTPRINT_DIR)
+from ..BulldozerDtmProvider_Tiling import run_tiled_dsm_to_dtm, CHECKPOINT_FILE
+from .test_tiling import DummyFeedback, copy_dsm_as_dtm
+
+NODATA = -32768
+
+
+class FootprintTest(unittest.TestCase):
+    """Test the extraction on the valid data footprint"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        self.data = np.full((1, 700, 400), NODATA, dtype=np.float32)
+        self.data[0, 530:610, 100:220] = np.random.default_rng(0).random((80, 120))
+        self.data[0, 530, 250] = 1
+        self.write_dsm(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_dsm(self, data):
+        """Write the test DSM, in strips of 16 rows"""
+        with rasterio.open(self.dsm_path, "w", driver="GTiff", width=400, height=700, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=NODATA, blockysize=16,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(data)
+
+    def test_valid_window(self):
+        """The window is the bounding box of the valid pixels"""
+        self.assertEqual(get_valid_window(self.dsm_path), Window(100, 530, 151, 80))
+        self.assertEqual(get_footprint_window(self.dsm_path), Window(100, 530, 151, 80))
+
+    def test_not_worth_it(self):
+        """Nothing is cropped from a DSM which is mostly valid, or which has no valid pixel"""
+        data = np.ones((1, 700, 400), dtype=np.float32)
+        data[0, :, 0] = NODATA
+        self.write_dsm(data)
+        self.assertIsNone(get_footprint_window(self.dsm_path))
+        self.write_dsm(np.full((1, 700, 400), NODATA, dtype=np.float32))
+        self.assertIsNone(get_valid_window(self.dsm_path))
+
+    def test_run_footprint(self):
+        """The footprint is scanned from the DSM when the crop flag of the options is set"""
+        self.assertIsNone(get_run_footprint(self.dsm_path, {}))
+        self.assertEqual(get_run_footprint(self.dsm_path, {"crop_footprint": True}),
+                         [100, 530, 151, 80])
+        # Window of the jobs queued before the crop flag
+        self.assertEqual(get_run_footprint(self.dsm_path, {"footprint": [0, 0, 10, 10]}),
+                         [0, 0, 10, 10])
+
+    def test_padded_products(self):
+        """The DTM covers the whole DSM grid, nodata outside of the footprint"""
+        output_dir = os.path.join(self.tmp_dir, "out")
+        window = get_footprint_window(self.dsm_path)
+        dtm_path = run_footprint_dsm_to_dtm({"dsm_path": self.dsm_path, "output_dir": output_dir},
+                                            copy_dsm_as_dtm,
+                                            [window.col_off, window.row_off,
+                                             window.width, window.height],
+                                            DummyFeedback())
+
+        with rasterio.open(dtm_path) as src:
+            np.testing.assert_array_equal(src.read(), self.data)
+            self.assertEqual(src.transform, from_origin(500000, 4800000, 1, 1))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, FOOTPRINT_DIR)))
+
+    def test_resume_tiled_run(self):
+        """A failed tiled run keeps its checkpoint in the output directory, even with its
+        tiles in a scratch directory, and is resumed"""
+        output_dir = os.path.join(self.tmp_dir, "out")
+        work_dir = os.path.join(self.tmp_dir, "scratch")
+        window = [0, 300, 400, 400]
+        runs = []
+
+        def run_tiles(feedback, fail=False, **params):
+            def run_tile(tile_feedback, **tile_params):
+                if fail and len(runs) == 1:
+                    raise RuntimeError("Failure")
+                runs.append(tile_params["output_dir"])
+                copy_dsm_as_dtm(tile_feedback, **tile_params)
+            return run_tiled_dsm_to_dtm(params, run_tile, 256, 16, feedback, work_dir)
+
+        params = {"dsm_path": self.dsm_path, "output_dir": output_dir}
+        with self.assertRaises(RuntimeError):
+            run_footprint_dsm_to_dtm(dict(params, fail=True), run_tiles, window,
+                                     DummyFeedback())
+        self.assertTrue(os.path.isfile(os.path.join(output_dir, FOOTPRINT_DIR,
+                                                    CHECKPOINT_FILE)))
+
+        runs.clear()
+        dtm_path = run_footprint_dsm_to_dtm(params, run_tiles, window, DummyFeedback())
+        self.assertEqual(len(runs), 3)
+        with rasterio.open(dtm_path) as src:
+            np.testing.assert_array_equal(src.read()[:, 300:], self.data[:, 300:])
+
+
+if __name__ == "__main__":
+    unittest.main()
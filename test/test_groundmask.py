@@ -0,0 +1,145 @@
+# coding=utf-8
+"""Tests for the ground mask."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from ..BulldozerDtmProvider_Advanced_algorithm import BulldozerDtmProviderAdvancedAlgorithm
+from ..BulldozerDtmProvider_Cache import BulldozerResultCache
+from ..BulldozerDtmProvider_GroundMask import (get_cached_ground_mask,
+                                               get_ground_mask_key,
+                                               index_geometries,
+                                               write_ground_mask)
+from ..BulldozerDtmProvider_Tiling import write_window_inputs
+from .test_batch import mock_parameters
+
+
+def box(xmin, ymin, xmax, ymax):
+    """GeoJSON polygon of a rectangle"""
+    return {"type": "Polygon", "coordinates": [[(xmin, ymin), (xmax, ymin), (xmax, ymax),
+                                                (xmin, ymax), (xmin, ymin)]]}
+
+
+class GroundMaskTest(unittest.TestCase):
+    """Test the ground mask"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        self.transform = from_origin(500000, 4800000, 1, 1)
+        with rasterio.open(self.dsm_path, "w", driver="GTiff", width=300, height=200, count=1,
+                           dtype="float32", crs="EPSG:32631",
+                           transform=self.transform) as dst:
+            dst.write(np.zeros((1, 200, 300), dtype=np.float32))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_index(self):
+        """A geometry is indexed in the blocks its bounds intersect"""
+        geometries = [box(500010, 4799990, 500020, 4799980),
+                      box(500090, 4799990, 500110, 4799880),
+                      box(400000, 4799990, 400010, 4799980)]
+        index = index_geometries(geometries, self.transform, 300, 200, 100)
+        self.assertEqual(index, {(0, 0): [0, 1], (0, 1): [1], (1, 0): [1], (1, 1): [1]})
+
+    def test_vector_mask(self):
+        """The pixels inside the polygons are ground, whatever the block"""
+        mask_path = os.path.join(self.tmp_dir, "mask.tif")
+        write_ground_mask(self.dsm_path, mask_path,
+                          geometries=[box(500050, 4799950, 500250, 4799900)], block_size=64)
+
+        expected = np.zeros((200, 300), dtype=np.uint8)
+        expected[50:100, 50:250] = 1
+        with rasterio.open(mask_path) as src:
+            np.testing.assert_array_equal(src.read(1), expected)
+            self.assertEqual(src.transform, self.transform)
+
+    def test_raster_mask(self):
+        """A raster mask is warped onto the DSM grid and united with the polygons"""
+        raster_path = os.path.join(self.tmp_dir, "raster.tif")
+        data = np.zeros((100, 150), dtype=np.uint8)
+        data[:, :25] = 3
+        data[0, 0] = 255
+        with rasterio.open(raster_path, "w", driver="GTiff", width=150, height=100, count=1,
+                           dtype="uint8", crs="EPSG:32631", nodata=255,
+                           transform=from_origin(500000, 4800000, 2, 2)) as dst:
+            dst.write(data, 1)
+
+        mask_path = os.path.join(self.tmp_dir, "mask.tif")
+        write_ground_mask(self.dsm_path, mask_path, raster_path,
+                          [box(500250, 4799810, 500300, 4799800)], block_size=64)
+
+        expected = np.zeros((200, 300), dtype=np.uint8)
+        expected[:, :50] = 1
+        expected[:2, :2] = 0
+        expected[190:, 250:] = 1
+        with rasterio.open(mask_path) as src:
+            np.testing.assert_array_equal(src.read(1), expected)
+
+    def test_cache(self):
+        """The mask is written once per layer and DSM grid, each run gets its own file"""
+        cache = BulldozerResultCache(os.path.join(self.tmp_dir, "cache"), 2 ** 30)
+        written = []
+
+        def write_mask(path):
+            written.append(path)
+            write_ground_mask(self.dsm_path, path, geometries=[box(500000, 4800000, 500010,
+                                                                   4799990)])
+
+        key = get_ground_mask_key(self.dsm_path, vector_fingerprint="layer")
+        first_path = os.path.join(self.tmp_dir, "first", "mask.tif")
+        second_path = os.path.join(self.tmp_dir, "second", "mask.tif")
+        self.assertEqual(get_cached_ground_mask(cache, key, write_mask, first_path),
+                         (first_path, False))
+        self.assertEqual(get_cached_ground_mask(cache, key, write_mask, second_path),
+                         (second_path, True))
+        self.assertEqual(written, [first_path])
+        self.assertNotEqual(get_ground_mask_key(self.dsm_path, vector_fingerprint="other"), key)
+
+        # The masks of the runs are kept when the cache is purged
+        cache.purge()
+        for path in (first_path, second_path):
+            with rasterio.open(path) as src:
+                self.assertEqual(src.read(1)[0, 0], 1)
+        self.assertEqual(get_cached_ground_mask(cache, key, write_mask, first_path),
+                         (first_path, False))
+
+    def test_window_inputs(self):
+        """The ground mask of a window is cropped with the DSM"""
+        mask_path = os.path.join(self.tmp_dir, "mask.tif")
+        write_ground_mask(self.dsm_path, mask_path,
+                          geometries=[box(500050, 4799950, 500250, 4799900)])
+        window_dir = os.path.join(self.tmp_dir, "window")
+        os.makedirs(window_dir)
+        window_params = write_window_inputs({"dsm_path": self.dsm_path,
+                                             "ground_mask_path": mask_path},
+                                            Window(40, 90, 100, 50), window_dir)
+
+        self.assertEqual(window_params["output_dir"], window_dir)
+        with rasterio.open(window_params["ground_mask_path"]) as src:
+            self.assertEqual((src.width, src.height), (100, 50))
+            self.assertEqual(src.read(1)[:10, 10:].min(), 1)
+            self.assertEqual(src.read(1)[10:].max(), 0)
+            self.assertEqual(src.read(1)[:, :10].max(), 0)
+
+    def test_mask_without_anchors(self):
+        """A ground mask without the ground anchors is rejected, not silently changed"""
+        algorithm = BulldozerDtmProviderAdvancedAlgorithm()
+        mock_parameters(algorithm)
+        with_mask = {algorithm.GROUND_MASK_VECTOR: "water.gpkg"}
+        self.assertTrue(algorithm.has_ground_mask_without_anchors(with_mask, None))
+        self.assertFalse(algorithm.has_ground_mask_without_anchors(
+            dict(with_mask, ACTIVATE_GROUND_ANCHORS=True), None))
+        self.assertFalse(algorithm.has_ground_mask_without_anchors({}, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# coding=utf-8
+"""Tests for the incremental mode."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from ..BulldozerDtmProvider_Incremental import run_incremental_dsm_to_dtm
+from .test_tiling import DummyFeedback, copy_dsm_as_dtm
+
+
+class IncrementalTest(unittest.TestCase):
+    """Test the incremental mode"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        self.output_dir = os.path.join(self.tmp_dir, "out")
+        self.data = np.random.default_rng(0).random((1, 1024, 1024)).astype(np.float32)
+        self.write_dsm()
+        self.runs = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_dsm(self):
+        """Write the DSM"""
+        with rasterio.open(self.dsm_path, "w", driver="GTiff", width=1024, height=1024, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(self.data)
+
+    def run_incremental(self):
+        """Run the incremental mode with an identity pipeline, counting the Bulldozer runs"""
+        def run_function(feedback, **params):
+            self.runs.append(params["dsm_path"])
+            copy_dsm_as_dtm(feedback, **params)
+
+        self.runs = []
+        return run_incremental_dsm_to_dtm({"dsm_path": self.dsm_path,
+                                           "output_dir": self.output_dir},
+                                          run_function, 256, 16, "params", DummyFeedback())
+
+    def test_only_modified_tiles_are_recomputed(self):
+        """A local modification of the DSM recomputes one tile and patches the DTM"""
+        dtm_path = self.run_incremental()
+        self.assertEqual(len(self.runs), 16)
+
+        # The DTM is shared with another file (e.g. the result cache)
+        link_path = os.path.join(self.tmp_dir, "cached_dtm.tif")
+        os.link(dtm_path, link_path)
+
+        self.run_incremental()
+        self.assertEqual(self.runs, [])
+
+        self.data[:, 300:310, 600:620] += 10
+        self.write_dsm()
+        self.run_incremental()
+        self.assertEqual(len(self.runs), 1)
+        with rasterio.open(dtm_path) as src:
+            np.testing.assert_array_equal(src.read(), self.data)
+        with rasterio.open(link_path) as src:
+            self.assertFalse(np.array_equal(src.read(), self.data))
+
+    def test_changed_parameters_recompute_everything(self):
+        """A run with other parameters is a full run"""
+        self.run_incremental()
+        run_incremental_dsm_to_dtm({"dsm_path": self.dsm_path, "output_dir": self.output_dir},
+                                   copy_dsm_as_dtm, 256, 16, "other params", DummyFeedback())
+        self.run_incremental()
+        self.assertEqual(len(self.runs), 16)
+
+    def test_canceled_update_is_followed_by_a_full_run(self):
+        """A cancel during the last modified tile writes no manifest: the next run is full"""
+        self.run_incremental()
+        self.data[:, 300:310, 600:620] += 10
+        self.write_dsm()
+
+        feedback = DummyFeedback()
+
+        def cancel(tile_feedback, **params):
+            # The engine stops Bulldozer before it writes its products
+            feedback.isCanceled = lambda: True
+            return False
+
+        run_incremental_dsm_to_dtm({"dsm_path": self.dsm_path, "output_dir": self.output_dir},
+                                   cancel, 256, 16, "params", feedback)
+        dtm_path = self.run_incremental()
+        self.assertEqual(len(self.runs), 16)
+        with rasterio.open(dtm_path) as src:
+            np.testing.assert_array_equal(src.read(), self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# coding=utf-8
+"""Tests for the Bulldozer jobs read from config files."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from .. import BulldozerDtmProvider_Job
+from ..BulldozerDtmProvider_Job import get_job, load_job, validate_config_files
+from ..BulldozerDtmProvider_Params import BulldozerParameterException
+
+
+class JobTest(unittest.TestCase):
+    """Test the parsing and the validation of the config files"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        with open(self.dsm_path, "wb"):
+            pass
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_config(self, name, lines):
+        """Write a config file in the temporary directory"""
+        config_path = os.path.join(self.tmp_dir, name)
+        with open(config_path, "w", encoding="utf8") as f:
+            f.write("\n".join(lines) + "\n")
+        return config_path
+
+    def test_load_job(self):
+        """The parameters are typed and the output paths are resolved"""
+        output_dir = os.path.join(self.tmp_dir, "out")
+        config_path = self.write_config("config.yaml", [
+            f"dsm_path: {self.dsm_path}",
+            f"output_dir: {output_dir}",
+            "max_object_size: 16",
+            "dsm_z_accuracy: 1e-3",
+            "generate_ndsm: true",
+            "config_file: ignored.yaml"])
+        job = load_job(config_path)
+        self.assertEqual(job.output_dir, output_dir)
+        self.assertEqual(job.dtm_path, os.path.join(output_dir, "dtm.tif"))
+        self.assertEqual(job.params["dsm_z_accuracy"], 0.001)
+        self.assertIs(job.params["generate_ndsm"], True)
+        self.assertNotIn("config_file", job.params)
+        with self.assertRaises(TypeError):
+            job.params["max_object_size"] = 8
+
+    def test_job_parsed_once(self):
+        """The job of a config file is parsed once, and again when the file changes"""
+        output_dir = os.path.join(self.tmp_dir, "out")
+        lines = [f"dsm_path: {self.dsm_path}", f"output_dir: {output_dir}"]
+        config_path = self.write_config("config.yaml", lines)
+        with mock.patch.object(BulldozerDtmProvider_Job, "load_job",
+                               wraps=load_job) as parse:
+            job = get_job(config_path)
+            self.assertIs(get_job(config_path).params, job.params)
+            self.assertEqual(parse.call_count, 1)
+
+            self.write_config("config.yaml", lines + ["max_object_size: 8"])
+            os.utime(config_path, ns=(0, os.stat(config_path).st_mtime_ns + 10 ** 9))
+            self.assertEqual(get_job(config_path).params["max_object_size"], 8)
+            self.assertEqual(parse.call_count, 2)
+        self.assertEqual(job.config_path, config_path)
+
+    def test_all_errors(self):
+        """All the errors of a config file are reported at once"""
+        config_path = self.write_config("config.yaml", [
+            f"dsm_path: {os.path.join(self.tmp_dir, 'missing.tif')}",
+            "max_object_sise: 16",
+            "nb_max_workers: 0",
+            "generate_ndsm: maybe"])
+        with self.assertRaises(BulldozerParameterException) as raised:
+            load_job(config_path)
+        message = str(raised.exception)
+        self.assertIn("Missing parameter output_dir", message)
+        self.assertIn("did you mean max_object_size?", message)
+        self.assertIn("nb_max_workers", message)
+        self.assertIn("generate_ndsm", message)
+        self.assertIn("missing.tif does not exist", message)
+
+    def test_invalid_files(self):
+        """Files which are not YAML mappings are rejected"""
+        for name, lines in (("config.txt", ["a: 1"]),
+                            ("list.yaml", ["- a", "- b"]),
+                            ("broken.yaml", ["a: [1"])):
+            with self.assertRaises(BulldozerParameterException):
+                load_job(self.write_config(name, lines))
+        with self.assertRaises(BulldozerParameterException):
+            load_job(os.path.join(self.tmp_dir, "missing.yaml"))
+
+    def test_validate_config_files(self):
+        """Many config files are validated in bulk, quickly"""
+        config_paths = [self.write_config(f"config_{index}.yaml", [
+            f"dsm_path: {self.dsm_path}",
+            f"output_dir: {self.tmp_dir}",
+            f"max_object_size: {index + 1}"]) for index in range(200)]
+        config_paths.append(self.write_config("invalid.yaml", ["output_dir: 1"]))
+
+        start = time.perf_counter()
+        results = validate_config_files(config_paths)
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertFalse(any(results[path] for path in config_paths[:-1]))
+        self.assertEqual(len(results[config_paths[-1]]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
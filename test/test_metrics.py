@@ -0,0 +1,134 @@
+# coding=utf-8
+"""Tests for the run metrics."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import rasterio
+
+from .. import BulldozerDtmProvider_Metrics
+from ..BulldozerDtmProviderSettings import BulldozerDtmProviderSettings
+from ..BulldozerDtmProvider_Metrics import (append_record,
+                                            get_current_run,
+                                            read_prometheus,
+                                            record_cache,
+                                            record_input,
+                                            record_run_metrics,
+                                            record_stages,
+                                            update_prometheus,
+                                            RunMetrics)
+from .test_tiling import DummyFeedback
+
+
+def stage(name, wall, peak_rss=2 ** 20):
+    """Stage measures, as recorded by StageMonitor"""
+    return {"name": name, "wall": wall, "cpu": 2 * wall, "peak_rss": peak_rss}
+
+
+class DummyAlgorithm:
+    """Algorithm whose run is measured"""
+
+    def __init__(self, dsm_path):
+        self.dsm_path = dsm_path
+
+    def name(self):
+        return "dummy"
+
+    @record_run_metrics
+    def processAlgorithm(self, parameters, context, feedback):  # pylint: disable=invalid-name
+        record_input(self.dsm_path)
+        record_cache(False)
+        record_stages([stage("drape-cloth", 1.5)])
+        if parameters.get("fail"):
+            raise ValueError("broken")
+        return {}
+
+
+class MetricsTest(unittest.TestCase):
+    """Test the run metrics"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        with rasterio.open(self.dsm_path, "w", driver="GTiff", width=30, height=20, count=1,
+                           dtype="float32") as dst:
+            dst.write(np.zeros((1, 20, 30), dtype=np.float32))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_record(self):
+        """The stages of the tiles are summed, the throughput is computed from the pixels"""
+        run = RunMetrics("advanced")
+        run.add_input(self.dsm_path)
+        run.add_input(os.path.join(self.tmp_dir, "missing.tif"))
+        run.add_stages([stage("preprocess", 1), stage("drape-cloth", 2, 2 ** 30)])
+        run.add_stages([stage("preprocess", 1)])
+        record = run.get_record("success")
+
+        self.assertEqual(record["input_pixels"], 600)
+        self.assertEqual(len(record["dsm_paths"]), 2)
+        self.assertEqual(record["stages"]["preprocess"], {"wall": 2, "cpu": 4})
+        self.assertGreaterEqual(record["peak_rss"], 2 ** 30)
+        self.assertAlmostEqual(record["pixels_per_second"], 600 / record["duration"])
+        self.assertEqual(json.loads(json.dumps(record))["status"], "success")
+
+    def test_prometheus(self):
+        """The counters are summed over the runs, the gauges are the ones of the last run"""
+        path = os.path.join(self.tmp_dir, "bulldozer.prom")
+        run = RunMetrics("advanced")
+        run.add_stages([stage("preprocess", 1), stage("drape-cloth", 2)])
+        update_prometheus(path, run.get_record("success"))
+        run = RunMetrics("advanced")
+        run.input_pixels = 123456789
+        run.add_stages([stage("drape-cloth", 3)])
+        update_prometheus(path, run.get_record("failed", "broken"))
+
+        samples = read_prometheus(path)
+        self.assertEqual(samples[("bulldozer_runs_total",
+                                  '{algorithm="advanced",status="success"}')], 1)
+        self.assertEqual(samples[("bulldozer_runs_total",
+                                  '{algorithm="advanced",status="failed"}')], 1)
+        self.assertEqual(samples[("bulldozer_input_pixels_total", '{algorithm="advanced"}')],
+                         123456789)
+        stages = {labels: value for (name, labels), value in samples.items()
+                  if name == "bulldozer_last_run_stage_seconds"}
+        self.assertEqual(stages, {'{algorithm="advanced",stage="drape-cloth"}': 3})
+        with open(path, encoding="utf8") as textfile:
+            self.assertIn("# TYPE bulldozer_runs_total counter", textfile.read())
+
+    def test_decorator(self):
+        """Every run writes one record, whatever its exit status"""
+        path = os.path.join(self.tmp_dir, "metrics", "runs.jsonl")
+        algorithm = DummyAlgorithm(self.dsm_path)
+        settings = {BulldozerDtmProviderSettings.METRICS_FILE: path}
+        with mock.patch.object(BulldozerDtmProvider_Metrics, "get_setting_path", settings.get):
+            algorithm.processAlgorithm({}, None, DummyFeedback())
+            with self.assertRaises(ValueError):
+                algorithm.processAlgorithm({"fail": True}, None, DummyFeedback())
+        self.assertIsNone(get_current_run())
+
+        with open(path, encoding="utf8") as records:
+            records = [json.loads(line) for line in records]
+        self.assertEqual([record["status"] for record in records], ["success", "failed"])
+        self.assertEqual(records[1]["error"], "ValueError: broken")
+        self.assertEqual(records[0]["input_pixels"], 600)
+        self.assertEqual(records[0]["cache_misses"], 1)
+        self.assertEqual(records[0]["stages"]["drape-cloth"]["wall"], 1.5)
+
+    def test_append(self):
+        """The records are appended, one JSON object per line"""
+        path = os.path.join(self.tmp_dir, "runs.jsonl")
+        append_record(path, {"run": 1})
+        append_record(path, {"run": 2})
+        with open(path, encoding="utf8") as records:
+            self.assertEqual([json.loads(line)["run"] for line in records], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# coding=utf-8
+"""Tests for the output formatting."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from ..BulldozerDtmProvider_Output import convert_to_cog, get_cog_options
+
+
+class OutputTest(unittest.TestCase):
+    """Test the Cloud Optimized GeoTIFF outputs"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dtm_path = os.path.join(self.tmp_dir, "dtm.tif")
+        self.data = np.random.default_rng(0).random((1, 1200, 1000)).astype(np.float32)
+        with rasterio.open(self.dtm_path, "w", driver="GTiff", width=1000, height=1200, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cog_options(self):
+        """The predictor is only used with DEFLATE and ZSTD, the error only with LERC"""
+        self.assertEqual(get_cog_options("ZSTD")["PREDICTOR"], "YES")
+        self.assertNotIn("PREDICTOR", get_cog_options("LERC"))
+        self.assertEqual(get_cog_options("LERC", max_z_error=0.01)["MAX_Z_ERROR"], 0.01)
+        self.assertEqual(get_cog_options(overviews=False)["OVERVIEWS"], "NONE")
+
+    def test_convert_to_cog(self):
+        """The converted DTM is a tiled, compressed COG with overviews and the same values"""
+        link_path = os.path.join(self.tmp_dir, "cached_dtm.tif")
+        os.link(self.dtm_path, link_path)
+
+        convert_to_cog(self.dtm_path, compression="DEFLATE")
+
+        with rasterio.open(self.dtm_path) as src:
+            self.assertEqual(src.tags(ns="IMAGE_STRUCTURE").get("LAYOUT"), "COG")
+            self.assertEqual(src.compression.name, "deflate")
+            self.assertEqual(src.block_shapes[0], (512, 512))
+            self.assertTrue(src.overviews(1))
+            np.testing.assert_array_equal(src.read(), self.data)
+        # A hard link to the original file (e.g. in the result cache) is not modified
+        with rasterio.open(link_path) as src:
+            self.assertIsNone(src.compression)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["cached_dtm.tif", "dtm.tif"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# coding=utf-8
+"""Tests for the Bulldozer parameter registry."""
+
+import tempfile
+import timeit
+import unittest
+
+from ..BulldozerDtmProvider_Params import (check_params,
+                                           get_from_params_base,
+                                           get_params_registry,
+                                           BulldozerParameterException)
+from ..BulldozerDtmProvider_ParamsCatalogue import (bulldozer_pipeline_params,
+                                                    get_catalogue_mismatch,
+                                                    BulldozerParam,
+                                                    OPT_PARAM_KEY)
+
+# Maximum time of one check of a full set of parameters (seconds)
+MAX_CHECK_DURATION = 1e-4
+
+
+class ParamsTest(unittest.TestCase):
+    """Test the parameter registry and the parameter checks"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def test_registry_is_memoized_and_immutable(self):
+        """The registry is built once and cannot be modified"""
+        registry = get_params_registry()
+        self.assertIs(registry, get_params_registry())
+        with self.assertRaises(TypeError):
+            registry["dsm_path"] = None
+        with self.assertRaises(AttributeError):
+            registry["max_object_size"].default_value = 0
+
+    def test_lookup(self):
+        """Parameters are found by name, unknown names are rejected"""
+        self.assertEqual(get_from_params_base("max_object_size").param_type, float)
+        with self.assertRaises(BulldozerParameterException):
+            get_from_params_base("unknown")
+
+    def test_bounds_and_choices(self):
+        """Out of bounds values and unknown choices are rejected"""
+        check_params(output_dir=self.output_dir, num_outer_iter=3, max_ground_slope=10.0)
+        with self.assertRaises(BulldozerParameterException):
+            check_params(num_outer_iter=0)
+        with self.assertRaises(BulldozerParameterException):
+            check_params(max_object_size=-1.0)
+        with self.assertRaises(BulldozerParameterException):
+            check_params(mp_context="unknown")
+
+    def test_check_params_benchmark(self):
+        """Checking a full set of parameters stays cheap"""
+        params = {name: spec.default_value
+                  for name, spec in get_params_registry().items()
+                  if spec.default_value is not None}
+        params["output_dir"] = self.output_dir
+        number = 1000
+        duration = timeit.timeit(lambda: check_params(**params), number=number) / number
+        self.assertLess(duration, MAX_CHECK_DURATION)
+
+    def test_catalogue_mismatch(self):
+        """The parameters added, removed or changed by another Bulldozer version are found"""
+        self.assertEqual(get_catalogue_mismatch(bulldozer_pipeline_params), [])
+        installed = {group: list(params) for group, params in bulldozer_pipeline_params.items()}
+        changed = installed[OPT_PARAM_KEY].pop(1)
+        installed[OPT_PARAM_KEY].append(BulldozerParam(changed.name, changed.alias, changed.label,
+                                                       changed.description, changed.param_type,
+                                                       changed.default_value * 2))
+        installed[OPT_PARAM_KEY].append(BulldozerParam("new_param", "new", "New", "New.", int, 0))
+        del installed[OPT_PARAM_KEY][0]
+        self.assertEqual(get_catalogue_mismatch(installed),
+                         sorted(["generate_ndsm", changed.name, "new_param"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# coding=utf-8
+"""Tests for the low resolution preview."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from ..BulldozerDtmProvider_Preview import (rescale_params,
+                                            run_preview_dsm_to_dtm,
+                                            PREVIEW_DIR)
+from .test_tiling import DummyFeedback, copy_dsm_as_dtm
+
+
+class PreviewTest(unittest.TestCase):
+    """Test the low resolution preview"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_rescale_params(self):
+        """Pixel parameters are divided by the factor, meter parameters are kept"""
+        params = rescale_params({"max_object_size": 40, "prevent_unhook_iter": 10}, 4, 0.5)
+        # Bulldozer default: max_object_size / 4
+        self.assertEqual(params["reg_filtering_iter"], 2)
+        self.assertEqual(params["prevent_unhook_iter"], 2)
+        self.assertEqual(params["max_object_size"], 40)
+        self.assertEqual(params["dsm_z_accuracy"], 1.0)
+
+        params = rescale_params({"reg_filtering_iter": 0, "prevent_unhook_iter": 3,
+                                 "dsm_z_accuracy": 3.0}, 8, 0.5)
+        self.assertEqual(params["reg_filtering_iter"], 0)
+        self.assertEqual(params["prevent_unhook_iter"], 1)
+        self.assertEqual(params["dsm_z_accuracy"], 3.0)
+
+    def test_preview_resolution(self):
+        """The preview DTM is the DSM at the coarse resolution"""
+        dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        data = np.random.default_rng(0).random((1, 400, 320)).astype(np.float32)
+        with rasterio.open(dsm_path, "w", driver="GTiff", width=320, height=400, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 0.5, 0.5)) as dst:
+            dst.write(data)
+
+        output_dir = os.path.join(self.tmp_dir, "out")
+        os.makedirs(output_dir)
+        dtm_path = run_preview_dsm_to_dtm({"dsm_path": dsm_path, "output_dir": output_dir},
+                                          copy_dsm_as_dtm, 4, DummyFeedback())
+
+        with rasterio.open(dtm_path) as src:
+            self.assertEqual((src.width, src.height), (80, 100))
+            self.assertEqual(src.transform, from_origin(500000, 4800000, 2, 2))
+            self.assertTrue(np.isin(src.read(1), data).all())
+        self.assertFalse(os.path.exists(os.path.join(output_dir, PREVIEW_DIR)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# coding=utf-8
+"""Tests for the profiling of the runs."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..BulldozerDtmProvider_Profiling import (format_hotspots,
+                                              get_worker_profile,
+                                              profile_run,
+                                              set_profile_dir,
+                                              RunProfiler,
+                                              PROFILE_DIR)
+from .test_tiling import DummyFeedback
+
+
+def allocate_arrays():
+    """Code to profile"""
+    return [np.ones((256, 256)) for _ in range(20)]
+
+
+class DummyAlgorithm:
+    """Algorithm with the profile parameters"""
+
+    PROFILE = 'PROFILE'
+    PROFILE_MEMORY = 'PROFILE_MEMORY'
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.worker_profiles = []
+
+    def parameterAsBool(self, parameters, name, context):  # pylint: disable=invalid-name
+        return bool(parameters.get(name))
+
+    @profile_run
+    def processAlgorithm(self, parameters, context, feedback):  # pylint: disable=invalid-name
+        set_profile_dir(self.output_dir)
+        allocate_arrays()
+        self.worker_profiles = [get_worker_profile(), get_worker_profile()]
+        return {}
+
+
+class ProfilingTest(unittest.TestCase):
+    """Test the profiling of the runs"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_reports(self):
+        """The statistics and the allocations are written, the hotspots are summarized"""
+        with RunProfiler(self.tmp_dir, "plugin", trace_memory=True) as profiler:
+            arrays = allocate_arrays()
+        del arrays
+
+        self.assertIn("allocate_arrays", format_hotspots([profiler.get_stats_path()]))
+        with open(os.path.join(self.tmp_dir, "plugin_allocations.txt"), encoding="utf8") as report:
+            self.assertIn("Peak traced memory", report.readline())
+
+    def test_algorithm(self):
+        """A profiled run writes its reports in the output directory, with one name per
+        Bulldozer call"""
+        algorithm = DummyAlgorithm(self.tmp_dir)
+        algorithm.processAlgorithm({}, None, DummyFeedback())
+        self.assertEqual(algorithm.worker_profiles, [None, None])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, PROFILE_DIR)))
+
+        algorithm.processAlgorithm({"PROFILE": True}, None, DummyFeedback())
+        profile_dir = os.path.join(self.tmp_dir, PROFILE_DIR)
+        self.assertEqual([profile["name"] for profile in algorithm.worker_profiles],
+                         ["worker_001", "worker_002"])
+        self.assertEqual(algorithm.worker_profiles[0]["profile_dir"], profile_dir)
+        self.assertEqual(os.listdir(profile_dir), ["plugin.prof"])
+        self.assertIsNone(get_worker_profile())
+
+
+if __name__ == "__main__":
+    unittest.main()
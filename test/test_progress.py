@@ -0,0 +1,62 @@
+# coding=utf-8
+"""Tests for the progress reporting of the Bulldozer pipeline."""
+
+import logging
+import unittest
+
+from ..BulldozerDtmProvider_Progress import (StageMonitor,
+                                             ScaledFeedback,
+                                             format_stage_table)
+
+
+class ProgressTest(unittest.TestCase):
+    """Test the stage monitor"""
+
+    def test_stages_from_log(self):
+        """Stages are detected from the Bulldozer log messages and only move forward"""
+        events = []
+        logger = logging.getLogger("bulldozer")
+        logger.setLevel(logging.INFO)
+        with StageMonitor(lambda event, **data: events.append((event, data))):
+            logger.info("Raw regular mask processing...")
+            logger.info("Horizontal nodata mask processing...")
+            logger.info("Main pass of a drape cloth filter: Starting...")
+            # Already passed stage: ignored
+            logger.info("Raw regular mask processing...")
+            logger.info("Pits removal: Starting...")
+            logging.getLogger("other").info("Main pass of a drape cloth filter: Starting...")
+
+        stages = [data["name"] for event, data in events if event == "stage"]
+        self.assertEqual(stages, ["preprocess", "regular-mask", "dsm-filling",
+                                  "drape-cloth", "postprocess"])
+        progress = [data["progress"] for event, data in events if "progress" in data]
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(progress[-1], 100)
+
+        timings = [data["stages"] for event, data in events if event == "timings"][0]
+        self.assertEqual([stage["name"] for stage in timings], stages)
+        table = format_stage_table(timings)
+        self.assertIn("drape-cloth", table)
+        self.assertIn("total", table)
+
+    def test_scaled_feedback(self):
+        """A sub-task progress is mapped into its range"""
+        reported = []
+
+        class Feedback:
+            """Stand-in for QgsProcessingFeedback"""
+            def setProgress(self, progress):  # pylint: disable=invalid-name
+                reported.append(progress)
+
+            def isCanceled(self):  # pylint: disable=invalid-name
+                return False
+
+        feedback = ScaledFeedback(Feedback(), 50, 75)
+        feedback.setProgress(0)
+        feedback.setProgress(100)
+        self.assertEqual(reported, [50, 75])
+        self.assertFalse(feedback.isCanceled())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# coding=utf-8
+"""Tests for the coarse-to-fine extraction."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from ..BulldozerDtmProvider_Pyramid import (get_fine_params,
+                                            get_level_factors,
+                                            run_pyramid_dsm_to_dtm,
+                                            write_constrained_dsm,
+                                            PYRAMID_DIR)
+from .test_tiling import DummyFeedback, copy_dsm_as_dtm
+
+NODATA = -32768
+
+
+class PyramidTest(unittest.TestCase):
+    """Test the coarse-to-fine extraction"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        self.data = np.full((1, 64, 64), 100, dtype=np.float32)
+        self.data[0, 20:30, 20:30] = 120
+        self.data[0, 0, 0] = NODATA
+        self.profile = {"driver": "GTiff", "width": 64, "height": 64, "count": 1,
+                        "dtype": "float32", "crs": "EPSG:32631", "nodata": NODATA,
+                        "transform": from_origin(500000, 4800000, 1, 1)}
+        with rasterio.open(self.dsm_path, "w", **self.profile) as dst:
+            dst.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_levels(self):
+        """The levels go from the coarsest to the full resolution, with fewer iterations"""
+        self.assertEqual(get_level_factors(2), [16, 4, 1])
+        self.assertEqual(get_fine_params({"num_outer_iter": 25})["num_outer_iter"], 5)
+        self.assertEqual(get_fine_params({})["num_outer_iter"], 5)
+
+    def test_constrained_dsm(self):
+        """The pixels above the coarse DTM are clipped"""
+        coarse_dtm = os.path.join(self.tmp_dir, "coarse_dtm.tif")
+        profile = dict(self.profile, width=16, height=16, transform=from_origin(500000, 4800000,
+                                                                                4, 4))
+        with rasterio.open(coarse_dtm, "w", **profile) as dst:
+            dst.write(np.full((1, 16, 16), 100, dtype=np.float32))
+        constrained_path = os.path.join(self.tmp_dir, "constrained_dsm.tif")
+        write_constrained_dsm(self.dsm_path, coarse_dtm, 0.5, constrained_path)
+
+        with rasterio.open(constrained_path) as src:
+            constrained = src.read(1)
+        self.assertEqual(constrained[40, 40], 100)
+        self.assertEqual(constrained[25, 25], 100.5)
+        self.assertEqual(constrained[0, 0], NODATA)
+
+    def test_run_levels(self):
+        """Each level is run, the finer ones on the DSM constrained by the coarser one"""
+        runs = []
+
+        def run_function(feedback, **params):
+            runs.append(params)
+            copy_dsm_as_dtm(feedback, **params)
+
+        output_dir = os.path.join(self.tmp_dir, "out")
+        os.makedirs(output_dir)
+        dtm_path = run_pyramid_dsm_to_dtm({"dsm_path": self.dsm_path, "output_dir": output_dir},
+                                          run_function, 1, DummyFeedback())
+
+        self.assertEqual(len(runs), 2)
+        self.assertNotIn("num_outer_iter", runs[0])
+        self.assertEqual(runs[1]["num_outer_iter"], 5)
+        self.assertEqual(os.path.basename(runs[1]["dsm_path"]), "constrained_dsm.tif")
+        # The fake DTM of the coarse level is the coarse DSM: the finer level only clips
+        # the building edges, smoothed by the upsampling
+        with rasterio.open(dtm_path) as src:
+            dtm = src.read()
+        self.assertTrue((dtm <= self.data).all())
+        np.testing.assert_array_equal(dtm[:, 32:, :], self.data[:, 32:, :])
+        self.assertFalse(os.path.exists(os.path.join(output_dir, PYRAMID_DIR)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# coding=utf-8
+"""Tests for the persistent job queue."""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from ..BulldozerDtmProvider_Queue import (BulldozerJobQueue,
+                                          format_job_table,
+                                          get_owner,
+                                          parse_job_ids,
+                                          CANCELED,
+                                          DONE,
+                                          FAILED,
+                                          QUEUED,
+                                          RUNNING)
+
+
+class JobQueueTest(unittest.TestCase):
+    """Test the persistent job queue"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "queue", "queue.sqlite")
+        self.queue = BulldozerJobQueue(self.db_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def submit(self, name, priority=0, options=None):
+        """Submit a job on a fake DSM"""
+        return self.queue.submit({"dsm_path": f"{name}.tif", "output_dir": name},
+                                 options, priority)
+
+    def test_priorities(self):
+        """The jobs run by priority, then in submission order"""
+        low = self.submit("low", -1)
+        first = self.submit("first")
+        urgent = self.submit("urgent", 5, {"tile_size": 1024})
+        second = self.submit("second")
+
+        job = self.queue.claim(get_owner())
+        self.assertEqual(job.job_id, urgent)
+        self.assertEqual(job.status, RUNNING)
+        self.assertEqual(job.options, {"tile_size": 1024})
+        self.assertEqual(job.params["dsm_path"], "urgent.tif")
+        order = [self.queue.claim(get_owner()).job_id for _ in range(3)]
+        self.assertEqual(order, [first, second, low])
+        self.assertIsNone(self.queue.claim(get_owner()))
+
+    def test_persistence(self):
+        """The jobs and their status are kept by the queue file"""
+        job_id = self.submit("dsm")
+        self.queue.finish(self.queue.claim(get_owner()).job_id, FAILED, "Error")
+        jobs = BulldozerJobQueue(self.db_path).get_jobs()
+        self.assertEqual([(job.job_id, job.status, job.message) for job in jobs],
+                         [(job_id, FAILED, "Error")])
+        self.assertIsNotNone(jobs[0].finished)
+
+    def test_recover_interrupted(self):
+        """The jobs of a process which no longer exists are queued again"""
+        self.submit("alive")
+        self.submit("dead")
+        self.queue.claim(get_owner())
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        self.queue.claim(get_owner().rsplit(":", 1)[0] + f":{process.pid}")
+        # Another host: the job is assumed to be running
+        self.submit("remote")
+        self.queue.claim("remote-host:1")
+
+        self.assertEqual(self.queue.recover_interrupted(), 1)
+        counts = self.queue.count_jobs()
+        self.assertEqual(counts[RUNNING], 2)
+        self.assertEqual(counts[QUEUED], 1)
+        self.assertEqual(self.queue.claim(get_owner()).params["dsm_path"], "dead.tif")
+
+    def test_manage(self):
+        """Jobs can be canceled, queued again, reprioritized and purged"""
+        job_ids = [self.submit(f"dsm_{index}") for index in range(4)]
+        self.assertEqual(self.queue.cancel(job_ids[:2]), 2)
+        self.assertEqual(self.queue.set_priority(job_ids[3:], 3), 1)
+        self.assertEqual(self.queue.claim(get_owner()).job_id, job_ids[3])
+        self.queue.finish(job_ids[3], DONE)
+        self.assertEqual(self.queue.retry(job_ids[:1]), 1)
+        self.assertEqual(self.queue.purge(), 2)
+        self.assertEqual([(job.job_id, job.status) for job in self.queue.get_jobs()],
+                         [(job_ids[0], QUEUED), (job_ids[2], QUEUED)])
+        self.assertEqual(self.queue.cancel(), 2)
+        self.assertEqual(self.queue.count_jobs()[CANCELED], 2)
+
+    def test_concurrent_claims(self):
+        """Two processes never run the same job"""
+        for index in range(40):
+            self.submit(f"dsm_{index}")
+        claimed = []
+
+        def claim_all():
+            queue = BulldozerJobQueue(self.db_path)
+            while True:
+                job = queue.claim(get_owner())
+                if job is None:
+                    return
+                claimed.append(job.job_id)
+
+        threads = [threading.Thread(target=claim_all) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), list(range(1, 41)))
+
+    def test_parse_job_ids(self):
+        """Job identifiers are given as a comma separated list"""
+        self.assertIsNone(parse_job_ids(" "))
+        self.assertEqual(parse_job_ids("1, 4;7,"), [1, 4, 7])
+        with self.assertRaises(ValueError):
+            parse_job_ids("1, a")
+
+    def test_format_job_table(self):
+        """The job table has one line per job"""
+        self.submit("dsm")
+        table = format_job_table(self.queue.get_jobs()).splitlines()
+        self.assertEqual(len(table), 2)
+        self.assertIn("dsm.tif", table[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# coding=utf-8
+"""Tests for the region of interest extraction."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from ..BulldozerDtmProvider_Roi import get_roi_window, run_roi_dsm_to_dtm, ROI_DIR
+from .test_tiling import DummyFeedback, copy_dsm_as_dtm
+
+
+class RoiTest(unittest.TestCase):
+    """Test the region of interest extraction"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        self.data = np.random.default_rng(0).random((1, 300, 400)).astype(np.float32)
+        with rasterio.open(self.dsm_path, "w", driver="GTiff", width=400, height=300, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_roi_window(self):
+        """Bounds are rounded outwards and clipped to the DSM"""
+        window = get_roi_window(self.dsm_path, (500010.5, 4799900, 500050, 4799980.2))
+        self.assertEqual(window, Window(10, 19, 40, 81))
+        window = get_roi_window(self.dsm_path, (500350, 4799700, 500500, 4799800))
+        self.assertEqual(window, Window(350, 200, 50, 100))
+        with self.assertRaises(ValueError):
+            get_roi_window(self.dsm_path, (0, 0, 10, 10))
+
+    def test_roi_extent(self):
+        """The DTM covers the region of interest only"""
+        output_dir = os.path.join(self.tmp_dir, "out")
+        window = Window(100, 50, 120, 80)
+        dtm_path = run_roi_dsm_to_dtm({"dsm_path": self.dsm_path, "output_dir": output_dir},
+                                      copy_dsm_as_dtm, window, 16, DummyFeedback())
+
+        with rasterio.open(dtm_path) as src:
+            np.testing.assert_array_equal(src.read(), self.data[:, 50:130, 100:220])
+            self.assertEqual(src.transform, from_origin(500100, 4799950, 1, 1))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, ROI_DIR)))
+
+    def test_roi_polygon(self):
+        """Pixels outside of the region polygons are nodata"""
+        output_dir = os.path.join(self.tmp_dir, "out")
+        polygon = {"type": "Polygon",
+                   "coordinates": [[(500100, 4799950), (500140, 4799950), (500140, 4799910),
+                                    (500100, 4799910), (500100, 4799950)]]}
+        window = Window(100, 50, 60, 60)
+        dtm_path = run_roi_dsm_to_dtm({"dsm_path": self.dsm_path, "output_dir": output_dir},
+                                      copy_dsm_as_dtm, window, 0, DummyFeedback(), [polygon])
+
+        with rasterio.open(dtm_path) as src:
+            dtm = src.read(1)
+        np.testing.assert_array_equal(dtm[:40, :40], self.data[0, 50:90, 100:140])
+        self.assertTrue(np.all(dtm[40:, :] == -32768))
+        self.assertTrue(np.all(dtm[:, 40:] == -32768))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# coding=utf-8
+"""Tests for the scratch directory of the runs."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from ..BulldozerDtmProvider_Scratch import (check_free_space,
+                                            make_work_dir,
+                                            run_in_work_dir)
+from ..BulldozerDtmProvider_Tiling import run_tiled_dsm_to_dtm
+from .test_tiling import DummyFeedback, copy_dsm_as_dtm
+
+
+def write_products(feedback, dsm_path, output_dir, **kwargs):
+    """Fake pipeline writing a product, masks and temporary files"""
+    copy_dsm_as_dtm(feedback, dsm_path, output_dir)
+    for sub_dir in ("masks", "tmp"):
+        os.makedirs(os.path.join(output_dir, sub_dir))
+        with open(os.path.join(output_dir, sub_dir, "file.tif"), "w", encoding="utf8") as file:
+            file.write(sub_dir)
+    return True
+
+
+class ScratchTest(unittest.TestCase):
+    """Test the scratch directory of the runs"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        with rasterio.open(self.dsm_path, "w", driver="GTiff", width=100, height=80, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(np.ones((1, 80, 100), dtype=np.float32))
+        self.output_dir = os.path.join(self.tmp_dir, "out")
+        self.scratch_root = os.path.join(self.tmp_dir, "scratch")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_products_moved(self):
+        """Only the products are moved to the output directory, the scratch is removed"""
+        os.makedirs(os.path.join(self.output_dir, "masks"))
+        with make_work_dir(self.scratch_root) as work_dir:
+            self.assertTrue(run_in_work_dir({"dsm_path": self.dsm_path,
+                                             "output_dir": self.output_dir},
+                                            write_products, work_dir, DummyFeedback()))
+        self.assertEqual(sorted(os.listdir(self.output_dir)), ["dtm.tif", "masks"])
+        self.assertEqual(os.listdir(os.path.join(self.output_dir, "masks")), ["file.tif"])
+        self.assertEqual(os.listdir(self.scratch_root), [])
+
+    def test_scratch_removed_on_failure(self):
+        """The scratch directory is removed if the run fails"""
+        with self.assertRaises(RuntimeError):
+            with make_work_dir(self.scratch_root) as work_dir:
+                raise RuntimeError(work_dir)
+        self.assertEqual(os.listdir(self.scratch_root), [])
+
+    def test_tiles_in_scratch(self):
+        """The tiles are written in the scratch directory"""
+        params = {"dsm_path": self.dsm_path, "output_dir": self.output_dir}
+        with make_work_dir(self.scratch_root) as work_dir:
+            run_tiled_dsm_to_dtm(params, copy_dsm_as_dtm, 32, 4, DummyFeedback(), work_dir)
+        self.assertEqual(os.listdir(self.output_dir), ["dtm.tif"])
+
+    def test_no_scratch(self):
+        """Without scratch folder, Bulldozer runs in the output directory"""
+        with make_work_dir(None) as work_dir:
+            self.assertIsNone(work_dir)
+
+    def test_free_space(self):
+        """The runs needing more than the free space are rejected"""
+        params = {"dsm_path": self.dsm_path, "output_dir": self.output_dir}
+        check_free_space(params, self.scratch_root)
+        with mock.patch("shutil.disk_usage", return_value=mock.Mock(free=1000)):
+            with self.assertRaises(ValueError):
+                check_free_space(params, self.scratch_root)
+
+
+if __name__ == "__main__":
+    unittest.main()
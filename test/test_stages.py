@@ -0,0 +1,87 @@
+# coding=utf-8
+"""Tests for the memoization of the pipeline stages."""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from ..BulldozerDtmProvider_Stages import (get_stage_keys,
+                                           run_staged_dsm_to_dtm,
+                                           StageStore)
+
+PARAMS = {"max_ground_slope": 20.0, "dsm_z_accuracy": 1.0, "max_object_size": 16,
+          "reg_filtering_iter": None, "activate_ground_anchors": False,
+          "ground_mask_path": None, "prevent_unhook_iter": 10, "num_outer_iter": 25,
+          "num_inner_iter": 5}
+
+
+class StagesTest(unittest.TestCase):
+    """Test the memoization of the pipeline stages"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_stage_keys(self):
+        """A parameter change invalidates its stage and the following ones only"""
+        keys = get_stage_keys(PARAMS, "dsm", "1.3.1")
+        self.assertEqual(keys, get_stage_keys(dict(PARAMS, nb_max_workers=4), "dsm", "1.3.1"))
+
+        outer_keys = get_stage_keys(dict(PARAMS, num_outer_iter=10), "dsm", "1.3.1")
+        self.assertEqual(keys["regular-mask"], outer_keys["regular-mask"])
+        self.assertEqual(keys["dsm-filling"], outer_keys["dsm-filling"])
+        self.assertNotEqual(keys["drape-cloth"], outer_keys["drape-cloth"])
+
+        slope_keys = get_stage_keys(dict(PARAMS, max_ground_slope=10.0), "dsm", "1.3.1")
+        self.assertTrue(all(keys[stage] != slope_keys[stage] for stage in keys))
+        other_dsm_keys = get_stage_keys(PARAMS, "other dsm", "1.3.1")
+        self.assertTrue(all(keys[stage] != other_dsm_keys[stage] for stage in keys))
+
+    def test_store(self):
+        """Stored products are loaded back, missing products are None"""
+        store = StageStore(self.tmp_dir, 2 ** 30)
+        self.assertFalse(store.has("abcd"))
+        mask = np.arange(12, dtype=np.uint8).reshape(3, 4)
+        store.save("abcd", "anchors", {"ground_anchors": mask, "other": None})
+        self.assertTrue(store.has("abcd"))
+        np.testing.assert_array_equal(store.load("abcd", "ground_anchors"), mask)
+        self.assertIsNone(store.load("abcd", "other"))
+
+    @unittest.skipUnless(importlib.util.find_spec("bulldozer"), "Bulldozer is not installed")
+    def test_staged_pipeline(self):
+        """The staged pipeline gives the DTM of Bulldozer, also when resumed"""
+        # pylint: disable=import-outside-toplevel
+        from bulldozer.pipeline.bulldozer_pipeline import dsm_to_dtm
+
+        dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        rows, cols = np.mgrid[0:200, 0:200]
+        dsm = (0.05 * rows + 0.02 * cols).astype(np.float32)
+        dsm[50:70, 60:90] += 12
+        with rasterio.open(dsm_path, "w", driver="GTiff", width=200, height=200, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(dsm, 1)
+
+        def read_dtm(name):
+            with rasterio.open(os.path.join(self.tmp_dir, name, "dtm.tif")) as src:
+                return src.read()
+
+        store = StageStore(os.path.join(self.tmp_dir, "store"), 2 ** 30)
+        for name, num_outer_iter in (("first", 25), ("resumed", 10)):
+            params = {"dsm_path": dsm_path, "nb_max_workers": 1, "num_outer_iter": num_outer_iter}
+            dsm_to_dtm(output_dir=os.path.join(self.tmp_dir, f"{name}_reference"), **params)
+            run_staged_dsm_to_dtm(dict(params, output_dir=os.path.join(self.tmp_dir, name)),
+                                  store)
+            np.testing.assert_array_equal(read_dtm(name), read_dtm(f"{name}_reference"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# coding=utf-8
+"""Tests for the plugin startup cost."""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from ..BulldozerDtmProvider_ParamsCatalogue import get_catalogue_mismatch
+
+PLUGIN_PACKAGE = __package__.rsplit(".", 1)[0]
+PLUGIN_PARENT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Imports the provider and all the algorithms in a fresh interpreter, after QGIS
+STARTUP_SCRIPT = f"""
+import json, sys, time
+import qgis.core
+import processing.core.ProcessingConfig
+start = time.perf_counter()
+import {PLUGIN_PACKAGE}.BulldozerDtmProvider_provider
+duration = time.perf_counter() - start
+print(json.dumps({{"duration": duration,
+                  "modules": [name for name in ("bulldozer", "numpy", "rasterio",
+                                                "{PLUGIN_PACKAGE}.resources")
+                              if name in sys.modules]}}))
+"""
+
+# Maximum time to register the provider (seconds): importing Bulldozer takes much longer
+MAX_STARTUP_DURATION = 1.0
+
+
+class StartupTest(unittest.TestCase):
+    """Test that loading the plugin does not load Bulldozer"""
+
+    def test_registration_is_lightweight(self):
+        """Registering the provider imports neither Bulldozer nor numpy nor rasterio,
+        nor the Qt resources"""
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PLUGIN_PARENT_DIR,
+                                                          env.get("PYTHONPATH")]))
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], env=env, check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        startup = json.loads(output.splitlines()[-1])
+        self.assertEqual(startup["modules"], [])
+        self.assertLess(startup["duration"], MAX_STARTUP_DURATION)
+
+    @unittest.skipUnless(importlib.util.find_spec("bulldozer"), "Bulldozer is not installed")
+    def test_catalogue_matches_bulldozer(self):
+        """The parameter catalogue of the plugin is the one of the installed Bulldozer"""
+        # pylint: disable=import-outside-toplevel
+        from bulldozer.pipeline import bulldozer_parameters
+
+        self.assertEqual(get_catalogue_mismatch(bulldozer_parameters.bulldozer_pipeline_params),
+                         [])
+
+
+if __name__ == '__main__':
+    unittest.main()
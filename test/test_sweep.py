@@ -0,0 +1,67 @@
+# coding=utf-8
+"""Tests for the parameter sweep."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from ..BulldozerDtmProvider_Sweep import (format_sweep_table,
+                                          get_combinations,
+                                          get_raster_stats,
+                                          parse_sweep_values)
+
+
+class SweepTest(unittest.TestCase):
+    """Test the parameter sweep"""
+
+    def test_parse_values(self):
+        """Lists and inclusive ranges are parsed with the parameter type"""
+        self.assertEqual(parse_sweep_values("1, 2,4", int), [1, 2, 4])
+        self.assertEqual(parse_sweep_values("8:32:8", int), [8, 16, 24, 32])
+        self.assertEqual(parse_sweep_values("0.5:1.5:0.5", float), [0.5, 1.0, 1.5])
+        self.assertEqual(parse_sweep_values("1:3", int), [1, 2, 3])
+        self.assertEqual(parse_sweep_values("true, False, 1", bool), [True, False])
+        for values, param_type in (("", int), ("1:2:0", int), ("a", int), ("1:2", bool)):
+            with self.assertRaises(ValueError):
+                parse_sweep_values(values, param_type)
+
+    def test_combinations(self):
+        """Every combination is generated, the last parameter varying fastest"""
+        combinations = get_combinations({"max_object_size": [8, 16],
+                                         "num_outer_iter": [10, 25, 50]})
+        self.assertEqual(len(combinations), 6)
+        self.assertEqual(combinations[1], {"max_object_size": 8, "num_outer_iter": 25})
+
+    def test_stats_and_table(self):
+        """Statistics ignore the nodata pixels"""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            dtm_path = os.path.join(tmp_dir, "dtm.tif")
+            data = np.array([[[1, 2], [3, -32768]]], dtype=np.float32)
+            with rasterio.open(dtm_path, "w", driver="GTiff", width=2, height=2, count=1,
+                               dtype="float32", crs="EPSG:32631", nodata=-32768,
+                               transform=from_origin(500000, 4800000, 1, 1)) as dst:
+                dst.write(data)
+            stats = get_raster_stats(dtm_path)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual((stats["min"], stats["max"], stats["mean"]), (1, 3, 2))
+        self.assertEqual(stats["valid"], 0.75)
+
+        table = format_sweep_table([dict(stats, name="combination_001", max_object_size=8,
+                                         runtime=1.5),
+                                    {"name": "combination_002", "max_object_size": 16}],
+                                   ["max_object_size"])
+        lines = table.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("1.500", lines[1])
+        self.assertTrue(lines[2].rstrip().endswith("-"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+# coding=utf-8
+"""Tests for the tiled processing mode."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from ..BulldozerDtmProvider_Tiling import (compute_tiles,
+                                           get_auto_margin,
+                                           run_tiled_dsm_to_dtm,
+                                           write_window,
+                                           CHECKPOINT_FILE,
+                                           MIN_TILE_SIZE)
+
+
+class DummyFeedback:
+    """Minimal stand-in for QgsProcessingFeedback"""
+
+    def __init__(self):
+        self.progress = 0
+
+    def isCanceled(self):  # pylint: disable=invalid-name
+        return False
+
+    def setProgress(self, progress):  # pylint: disable=invalid-name
+        self.progress = progress
+
+    def pushInfo(self, info):  # pylint: disable=invalid-name
+        pass
+
+    def pushDebugInfo(self, info):  # pylint: disable=invalid-name
+        pass
+
+    def reportError(self, error, fatalError=False):  # pylint: disable=invalid-name
+        pass
+
+
+def copy_dsm_as_dtm(feedback, dsm_path, output_dir, **kwargs):
+    """Fake pipeline: the DTM is the DSM"""
+    with rasterio.open(dsm_path) as src:
+        profile = src.profile.copy()
+        profile.update(driver="GTiff")
+        data = src.read()
+    with rasterio.open(os.path.join(output_dir, "dtm.tif"), "w", **profile) as dst:
+        dst.write(data)
+
+
+class TilingTest(unittest.TestCase):
+    """Test the tiled processing mode"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_compute_tiles_cover_raster(self):
+        """Core windows cover the raster exactly once"""
+        width, height = 1000, 700
+        tiles = compute_tiles(width, height, tile_size=300, margin=50)
+        coverage = np.zeros((height, width), dtype=np.uint8)
+        for tile in tiles:
+            core = tile.core
+            coverage[core.row_off:core.row_off + core.height,
+                     core.col_off:core.col_off + core.width] += 1
+            # The padded window contains the core and stays in the raster
+            self.assertLessEqual(tile.padded.col_off, core.col_off)
+            self.assertLessEqual(tile.padded.row_off, core.row_off)
+            self.assertLessEqual(tile.padded.col_off + tile.padded.width, width)
+            self.assertLessEqual(tile.padded.row_off + tile.padded.height, height)
+        self.assertTrue(np.all(coverage == 1))
+        self.assertEqual(len(tiles), 4 * 3)
+
+    def test_compute_tiles_min_size(self):
+        """Tile size is clamped to the minimum tile size"""
+        tiles = compute_tiles(1000, 1000, tile_size=10, margin=0)
+        self.assertEqual(tiles[0].core.width, MIN_TILE_SIZE)
+
+    def test_auto_margin(self):
+        """Margin is twice the max object size in pixels"""
+        self.assertEqual(get_auto_margin(16, 0.5), 64)
+        self.assertEqual(get_auto_margin(None, 2.0), 16)
+
+    def test_mosaic_matches_input(self):
+        """With an identity pipeline, the mosaic is the input DSM"""
+        dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        data = np.random.default_rng(0).random((1, 600, 500)).astype(np.float32)
+        with rasterio.open(dsm_path, "w", driver="GTiff", width=500, height=600, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(data)
+
+        output_dir = os.path.join(self.tmp_dir, "out")
+        dtm_path = run_tiled_dsm_to_dtm({"dsm_path": dsm_path, "output_dir": output_dir},
+                                        copy_dsm_as_dtm, 256, 20, DummyFeedback())
+
+        with rasterio.open(dtm_path) as src:
+            np.testing.assert_array_equal(src.read(), data)
+            self.assertEqual(src.transform, from_origin(500000, 4800000, 1, 1))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, "tiles")))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, CHECKPOINT_FILE)))
+
+    def test_write_window(self):
+        """A window spanning several blocks is copied block by block"""
+        dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        data = np.random.default_rng(0).random((1, 600, 700)).astype(np.float32)
+        with rasterio.open(dsm_path, "w", driver="GTiff", width=700, height=600, count=1,
+                           dtype="float32", crs="EPSG:32631",
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(data)
+
+        window_path = os.path.join(self.tmp_dir, "window.tif")
+        write_window(dsm_path, Window(30, 70, 600, 520), window_path)
+        with rasterio.open(window_path) as src:
+            np.testing.assert_array_equal(src.read(), data[:, 70:590, 30:630])
+            self.assertEqual(src.transform, from_origin(500030, 4799930, 1, 1))
+
+    def test_resume_from_checkpoint(self):
+        """A failed run is resumed from the last tile done"""
+        dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        data = np.random.default_rng(0).random((1, 600, 500)).astype(np.float32)
+        with rasterio.open(dsm_path, "w", driver="GTiff", width=500, height=600, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(data)
+        params = {"dsm_path": dsm_path, "output_dir": os.path.join(self.tmp_dir, "out")}
+        runs = []
+
+        def fail_at_fourth_tile(feedback, **tile_params):
+            if len(runs) == 3:
+                raise RuntimeError("Failure")
+            runs.append(tile_params["output_dir"])
+            copy_dsm_as_dtm(feedback, **tile_params)
+
+        with self.assertRaises(RuntimeError):
+            run_tiled_dsm_to_dtm(params, fail_at_fourth_tile, 256, 20, DummyFeedback())
+        self.assertTrue(os.path.isfile(os.path.join(params["output_dir"], CHECKPOINT_FILE)))
+
+        runs.clear()
+        dtm_path = run_tiled_dsm_to_dtm(params,
+                                        lambda feedback, **tile_params: runs.append(
+                                            copy_dsm_as_dtm(feedback, **tile_params)),
+                                        256, 20, DummyFeedback())
+        # 6 tiles, 3 done by the failed run
+        self.assertEqual(len(runs), 3)
+        with rasterio.open(dtm_path) as src:
+            np.testing.assert_array_equal(src.read(), data)
+        self.assertFalse(os.path.exists(os.path.join(params["output_dir"], CHECKPOINT_FILE)))
+
+        # Other parameters: the whole DTM is computed again
+        runs.clear()
+        with self.assertRaises(RuntimeError):
+            run_tiled_dsm_to_dtm(params, fail_at_fourth_tile, 256, 20, DummyFeedback())
+        runs.clear()
+        run_tiled_dsm_to_dtm(dict(params, max_object_size=8),
+                             lambda feedback, **tile_params: runs.append(
+                                 copy_dsm_as_dtm(feedback, **tile_params)),
+                             256, 20, DummyFeedback())
+        self.assertEqual(len(runs), 6)
+
+    def test_resume_after_cancel(self):
+        """A tile canceled during its run is not recorded, the resumed run computes it"""
+        dsm_path = os.path.join(self.tmp_dir, "dsm.tif")
+        data = np.random.default_rng(0).random((1, 600, 500)).astype(np.float32)
+        with rasterio.open(dsm_path, "w", driver="GTiff", width=500, height=600, count=1,
+                           dtype="float32", crs="EPSG:32631", nodata=-32768,
+                           transform=from_origin(500000, 4800000, 1, 1)) as dst:
+            dst.write(data)
+        params = {"dsm_path": dsm_path, "output_dir": os.path.join(self.tmp_dir, "out")}
+        feedback = DummyFeedback()
+        runs = []
+
+        def cancel_at_third_tile(tile_feedback, **tile_params):
+            runs.append(tile_params["output_dir"])
+            if len(runs) == 3 and not feedback.isCanceled():
+                # The engine stops Bulldozer before it writes its products
+                feedback.isCanceled = lambda: True
+                return False
+            copy_dsm_as_dtm(tile_feedback, **tile_params)
+            return True
+
+        run_tiled_dsm_to_dtm(params, cancel_at_third_tile, 256, 20, feedback)
+        self.assertTrue(os.path.isfile(os.path.join(params["output_dir"], CHECKPOINT_FILE)))
+
+        runs.clear()
+        dtm_path = run_tiled_dsm_to_dtm(params, cancel_at_third_tile, 256, 20, DummyFeedback())
+        self.assertTrue(feedback.isCanceled())
+        # 6 tiles, 2 done before the cancel
+        self.assertEqual(len(runs), 4)
+        with rasterio.open(dtm_path) as src:
+            np.testing.assert_array_equal(src.read(), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# coding=utf-8
+"""Tests for the worker processes helpers."""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+from ..BulldozerDtmProvider_Worker import (init_pool_process,
+                                           kill_pool_process,
+                                           split_worker_budget)
+
+
+def start_job_process(pids):
+    """Pool process starting a child process, as Bulldozer does"""
+    init_pool_process()
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    pids.put(child.pid)
+    child.wait()
+
+
+class WorkerBudgetTest(unittest.TestCase):
+    """Test the split of the worker budget between concurrent jobs"""
+
+    def test_never_oversubscribe(self):
+        """Concurrent jobs times workers per job never exceeds the budget"""
+        for nb_jobs in (1, 3, 10, 500):
+            for budget in (1, 2, 7, 64):
+                for concurrent_jobs in (0, 1, 4, 100):
+                    for workers_per_job in (None, 1, 3, 128):
+                        concurrent, per_job = split_worker_budget(nb_jobs, budget,
+                                                                  concurrent_jobs,
+                                                                  workers_per_job)
+                        self.assertGreaterEqual(concurrent, 1)
+                        self.assertGreaterEqual(per_job, 1)
+                        self.assertLessEqual(concurrent, nb_jobs)
+                        self.assertLessEqual(concurrent * per_job, budget)
+
+    def test_requested_workers_per_job(self):
+        """The requested number of workers per job drives the concurrency"""
+        self.assertEqual(split_worker_budget(100, 64, 0, 4), (16, 4))
+
+    def test_requested_concurrent_jobs(self):
+        """The requested concurrency drives the number of workers per job"""
+        self.assertEqual(split_worker_budget(100, 64, 8), (8, 8))
+
+    def test_automatic(self):
+        """Few jobs share all the cores"""
+        self.assertEqual(split_worker_budget(2, 16), (2, 8))
+
+
+@unittest.skipIf(os.name == "nt", "process groups are POSIX only")
+class PoolProcessTest(unittest.TestCase):
+    """Test the kill of the job pool processes"""
+
+    def test_kill_children(self):
+        """The processes started by a job are killed with its pool process"""
+        context = multiprocessing.get_context("fork")
+        pids = context.Queue()
+        process = context.Process(target=start_job_process, args=(pids,))
+        process.start()
+        child_pid = pids.get(timeout=30)
+        kill_pool_process(process)
+        process.join(timeout=30)
+        self.assertFalse(process.is_alive())
+        # The orphaned child is reaped by init once killed
+        for _ in range(100):
+            try:
+                os.kill(child_pid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.1)
+        else:
+            self.fail("The child process of the job is still running")
+
+
+if __name__ == '__main__':
+    unittest.main()